@@ -0,0 +1,125 @@
+// 記事の全文検索（インデックスは tools/search_index.py が search/ に書き出す）
+// 検索語の先頭の文字に対応する分割ファイルだけを読み込む。
+(function () {
+  "use strict";
+
+  var SEARCH_DIR = "search/";
+  var RESULT_LIMIT = 50;
+  // tools/search_index.py の TOKEN_PATTERN と同じ
+  var TOKEN_PATTERN = /[a-z0-9]+|(?:(?![a-z0-9])[\p{L}\p{N}])+/gu;
+
+  var cache = {};
+
+  function fetchJSON(path) {
+    if (!cache[path]) {
+      cache[path] = fetch(SEARCH_DIR + path).then(function (res) {
+        return res.ok ? res.json() : {};
+      });
+    }
+    return cache[path];
+  }
+
+  function tokenize(text) {
+    var tokens = [];
+    var runs = text.normalize("NFKC").toLowerCase().match(TOKEN_PATTERN) || [];
+    runs.forEach(function (run) {
+      var chars = Array.from(run);
+      if (/^[\x00-\x7f]+$/.test(run) || chars.length === 1) {
+        tokens.push(run);
+      } else {
+        for (var i = 0; i < chars.length - 1; i++) tokens.push(chars[i] + chars[i + 1]);
+      }
+    });
+    return tokens.filter(function (token, i) { return tokens.indexOf(token) === i; });
+  }
+
+  function shardName(meta, token) {
+    return (token.codePointAt(0) >> meta.shard_shift).toString(16);
+  }
+
+  // 語 → {記事ID: 出現回数}。日本語1文字はその文字で始まる語すべて
+  function lookup(meta, token) {
+    return fetchJSON("shards/" + shardName(meta, token) + ".json").then(function (shard) {
+      var prefix = Array.from(token).length === 1 && !/^[\x00-\x7f]$/.test(token);
+      var keys = prefix ? Object.keys(shard).filter(function (key) { return key.indexOf(token) === 0; }) : [token];
+      var found = {};
+      keys.forEach(function (key) {
+        var pairs = shard[key] || [];
+        for (var i = 0; i < pairs.length; i += 2) found[pairs[i]] = (found[pairs[i]] || 0) + pairs[i + 1];
+      });
+      return found;
+    });
+  }
+
+  function search(query) {
+    var tokens = tokenize(query);
+    if (!tokens.length) return Promise.resolve([]);
+    return fetchJSON("meta.json").then(function (meta) {
+      return Promise.all(tokens.map(function (token) { return lookup(meta, token); })).then(function (lists) {
+        // すべての語を含む記事を、出現回数の合計が多い順（同じなら新しい順）に
+        var scores = lists.reduce(function (acc, found) {
+          var next = {};
+          Object.keys(found).forEach(function (id) {
+            if (acc === null || id in acc) next[id] = (acc === null ? 0 : acc[id]) + found[id];
+          });
+          return next;
+        }, null);
+        var ids = Object.keys(scores).sort(function (a, b) {
+          return scores[b] - scores[a] || b - a;
+        }).slice(0, RESULT_LIMIT);
+        return Promise.all(ids.map(function (id) {
+          return fetchJSON("docs/" + Math.floor(id / meta.docs_per_shard) + ".json").then(function (docs) {
+            return docs[id];
+          });
+        }));
+      });
+    }).then(function (docs) {
+      return docs.filter(Boolean);
+    });
+  }
+
+  function render(list, status, docs) {
+    list.textContent = "";
+    docs.forEach(function (doc) {
+      var item = document.createElement("li");
+      var link = document.createElement("a");
+      link.href = doc[0];
+      link.textContent = doc[1];
+      item.appendChild(link);
+      list.appendChild(item);
+    });
+    status.textContent = docs.length ? docs.length + "件" : "見つかりませんでした";
+  }
+
+  document.addEventListener("DOMContentLoaded", function () {
+    var form = document.getElementById("search-form");
+    var input = document.getElementById("search-query");
+    var list = document.getElementById("search-results");
+    var status = document.getElementById("search-status");
+    var latest = 0;
+
+    function run() {
+      var query = input.value.trim();
+      var current = ++latest;
+      history.replaceState(null, "", query ? "?q=" + encodeURIComponent(query) : location.pathname);
+      if (!query) {
+        list.textContent = "";
+        status.textContent = "";
+        return;
+      }
+      status.textContent = "検索中…";
+      search(query).then(function (docs) {
+        if (current === latest) render(list, status, docs);
+      }, function () {
+        if (current === latest) status.textContent = "検索インデックスを読み込めませんでした";
+      });
+    }
+
+    form.addEventListener("submit", function (event) {
+      event.preventDefault();
+      run();
+    });
+    input.value = new URLSearchParams(location.search).get("q") || "";
+    if (input.value) run();
+  });
+})();
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+内容アドレス方式のアセットストア
+
+カード比較サイト（creditcard/）とトップページ（リポジトリ直下）は同じ cards.json・style.css・
+カード画像を公開しています。各生成スクリプトはファイルを直接書かずにこのストアに書き込み、
+ストアは内容のハッシュを名前にした実体（.cache/assets/objects/）を1つだけ保存して、
+公開先のパスにはハードリンク（作れなければコピー）で配置します。
+
+- 同じ内容は1回だけ書き込む（同じ実体を指していれば公開先も書き直さない）
+- 公開先のパス → ハッシュは manifest.json に記録し、publish() でいつでも配置し直せる
+- 正本は creditcard/ 側。手で編集した場合は sync() で取り込んで他のサイトに配置する
+
+使い方:
+    python tools/asset_store.py sync      # creditcard/ の共有ファイルを取り込んで配置
+    python tools/asset_store.py publish   # manifest.json の内容で配置し直す
+    python tools/asset_store.py gc        # どこからも参照されない実体を削除
+"""
+
+import argparse
+import fnmatch
+import glob
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from tracing import count, span
+
+# 設定
+BASE_DIR = Path(__file__).parent.parent
+CACHE_DIR = BASE_DIR / ".cache"
+STORE_DIR = CACHE_DIR / "assets"
+
+# 共有ファイルを公開するサイト（先頭が正本）
+SITE_TREES = ["creditcard", "."]
+# サイト内の相対パスで、すべてのサイトに同じ内容を置くもの
+SHARED_ASSETS = ["cards.json", "style.css", "images/*.png"]
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class AssetStore:
+    """内容アドレス方式のアセットストア"""
+
+    def __init__(self, store_dir: Path = STORE_DIR, base_dir: Path = BASE_DIR):
+        """
+        初期化
+
+        Args:
+            store_dir: 実体と manifest.json を置くディレクトリ
+            base_dir: 公開先のパスの基準（リポジトリのルート）
+        """
+        self.store_dir = Path(store_dir)
+        self.objects_dir = self.store_dir / "objects"
+        self.manifest_path = self.store_dir / "manifest.json"
+        self.base_dir = Path(base_dir)
+        self._lock = threading.Lock()
+        self._manifest = None
+
+    # --- 実体 ---
+
+    def object_path(self, digest: str, suffix: str = "") -> Path:
+        """実体のパス（objects/ab/abcdef….png）"""
+        return self.objects_dir / digest[:2] / f"{digest}{suffix}"
+
+    def put(self, data: bytes, suffix: str = "") -> Path:
+        """
+        内容を保存して実体のパスを返す（同じ内容が既にあれば書き込まない）
+
+        Args:
+            data: 内容
+            suffix: 実体のファイル名に付ける拡張子
+
+        Returns:
+            実体のパス
+        """
+        digest = _sha256(data)
+        path = self.object_path(digest, suffix)
+        try:
+            # 公開先を直接書き換えられると実体も変わるので、念のため内容も確かめる
+            if path.stat().st_size == len(data) and _sha256(path.read_bytes()) == digest:
+                return path
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+    # --- manifest ---
+
+    def manifest(self) -> Dict[str, str]:
+        """公開先のパス（リポジトリからの相対パス）→ 実体のパス（ストアからの相対パス）"""
+        with self._lock:
+            if self._manifest is None:
+                try:
+                    with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                        self._manifest = json.load(f)
+                except (OSError, ValueError):
+                    self._manifest = {}
+            return dict(self._manifest)
+
+    def _record(self, entries: Dict[str, str]):
+        self.manifest()
+        with self._lock:
+            if all(self._manifest.get(key) == value for key, value in entries.items()):
+                return
+            self._manifest.update(entries)
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.manifest_path.with_name(f"manifest.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.manifest_path)
+
+    # --- 公開 ---
+
+    def _relative(self, path: Path) -> str:
+        return os.path.relpath(Path(path).absolute(), self.base_dir.absolute()).replace(os.sep, "/")
+
+    def shared_paths(self, path: Path) -> List[str]:
+        """
+        同じ内容を置く公開先のパス（共有ファイルでなければそのパスだけ）
+
+        Args:
+            path: いずれかのサイト内のパス
+
+        Returns:
+            リポジトリからの相対パスのリスト
+        """
+        rel_path = self._relative(path)
+        for tree in SITE_TREES:
+            prefix = "" if tree == "." else f"{tree}/"
+            if not rel_path.startswith(prefix):
+                continue
+            inner = rel_path[len(prefix):]
+            # 別のサイトの中（creditcard/…）を直下のサイトの共有ファイルと取り違えない
+            if tree == "." and any(inner.startswith(f"{other}/") for other in SITE_TREES if other != "."):
+                continue
+            if any(fnmatch.fnmatch(inner, pattern) for pattern in SHARED_ASSETS):
+                return [(inner if other == "." else f"{other}/{inner}") for other in SITE_TREES]
+        return [rel_path]
+
+    def _materialize(self, rel_path: str, object_path: Path) -> bool:
+        """公開先に実体を配置（既に同じ実体ならなにもしない）。書き込んだら True"""
+        target = self.base_dir / rel_path
+        try:
+            if os.path.samefile(target, object_path):
+                return False
+        except FileNotFoundError:
+            pass
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            os.link(object_path, tmp_path)
+        except OSError:
+            shutil.copyfile(object_path, tmp_path)
+        os.replace(tmp_path, target)
+        return True
+
+    def write(self, path: Path, data: bytes) -> int:
+        """
+        ファイルを書き込む（共有ファイルならすべてのサイトに配置）
+
+        Args:
+            path: 書き込み先（いずれかのサイト内のパス）
+            data: 内容
+
+        Returns:
+            実際に配置し直した公開先の数
+        """
+        object_path = self.put(data, Path(path).suffix)
+        rel_paths = self.shared_paths(path)
+        self._record({rel_path: object_path.relative_to(self.store_dir).as_posix() for rel_path in rel_paths})
+        return sum(self._materialize(rel_path, object_path) for rel_path in rel_paths)
+
+    def publish(self) -> int:
+        """manifest.json の内容で公開先を配置し直す（配置し直した数を返す）"""
+        count = 0
+        for rel_path, object_rel in sorted(self.manifest().items()):
+            object_path = self.store_dir / object_rel
+            if object_path.exists():
+                count += self._materialize(rel_path, object_path)
+        return count
+
+    def sync(self) -> int:
+        """
+        正本のサイト（SITE_TREES の先頭）の共有ファイルを取り込み、他のサイトに配置
+
+        Returns:
+            配置し直した公開先の数
+        """
+        source_tree = self.base_dir / SITE_TREES[0]
+        count = 0
+        for pattern in SHARED_ASSETS:
+            for path in sorted(glob.glob(str(source_tree / pattern))):
+                count += self.write(Path(path), Path(path).read_bytes())
+        return count
+
+    def gc(self) -> int:
+        """どこからも参照されない実体を削除（削除した数を返す）"""
+        referenced = {self.store_dir / object_rel for object_rel in self.manifest().values()}
+        removed = 0
+        for path in self.objects_dir.glob("*/*"):
+            if path not in referenced:
+                path.unlink()
+                removed += 1
+        return removed
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def default_store() -> AssetStore:
+    """プロセス内で共有するストア"""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = AssetStore()
+        return _default_store
+
+
+def write_asset(path: Path, data: bytes, store: Optional[AssetStore] = None) -> int:
+    """
+    生成スクリプトからの書き込み口
+
+    リポジトリの外（ベンチマークの一時ディレクトリなど）へはそのまま書き込む。
+
+    Args:
+        path: 書き込み先
+        data: 内容
+        store: 使うストア（省略時は default_store()）
+
+    Returns:
+        実際に書き込んだ公開先の数
+    """
+    store = store or default_store()
+    try:
+        Path(path).absolute().relative_to(store.base_dir.absolute())
+    except ValueError:
+        Path(path).write_bytes(data)
+        written = 1
+    else:
+        with span("asset_store.write"):
+            written = store.write(path, data)
+    if written:
+        # 共有ファイルは実体1つをハードリンクで配置するので、内容のバイト数は1回分
+        count("bytes_written", len(data), kind="asset")
+        count("files_written", written, kind="asset")
+    else:
+        count("files_skipped", kind="asset")
+    return written
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="内容アドレス方式のアセットストア")
+    parser.add_argument("command", choices=["sync", "publish", "gc"])
+    args = parser.parse_args()
+
+    store = default_store()
+    if args.command == "sync":
+        print(f"配置: {store.sync()}件")
+    elif args.command == "publish":
+        print(f"配置: {store.publish()}件")
+    else:
+        print(f"削除: {store.gc()}件")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,553 @@
+#!/usr/bin/env python3
+"""
+ベンチマークスクリプト
+
+大規模な合成データ（1万件の記事・1万枚のカード・長いナレーション原稿）を一時ディレクトリに作り、
+各生成処理の所要時間を計測します。結果は JSON で保存し、基準の結果と比べて遅くなった項目を検出できます。
+
+使い方:
+    python tools/benchmark.py suite                              # 全項目を計測して .cache/benchmarks/ に保存
+    python tools/benchmark.py suite --only render_post update_index
+    python tools/benchmark.py suite --save-baseline              # 結果を基準として保存
+    python tools/benchmark.py suite --baseline                   # 基準と比べる（遅くなったら終了コード 1）
+    python tools/benchmark.py compare 基準.json 結果.json
+    python tools/benchmark.py renditions --duration 60 --audio wav
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from media_config import CACHE_DIR, has_capability, require_capability
+from youtube_video_generator import JST, VideoGenerator
+
+BENCHMARK_DIR = CACHE_DIR / "benchmarks"
+BASELINE_FILE = BENCHMARK_DIR / "baseline.json"
+RESULT_FORMAT_VERSION = 1
+
+# 合成データの規模（コマンドラインで変更できる）
+SUITE_DEFAULTS = {
+    'posts': 10000,
+    'cards': 10000,
+    'card_images': 200,
+    'thumbnails': 20,
+    'index_appends': 100,
+    'narration_chars': 20000,
+    'odds_races': 48,
+    'odds_rows': 120,
+    'repeat': 3,
+}
+
+# 日本語ナレーションの読み上げ速度（文字/秒）。原稿の長さから音声の長さを見積もる
+NARRATION_CHARS_PER_SECOND = 7.0
+
+# 基準より何割遅くなったら劣化とみなすか
+REGRESSION_THRESHOLD = 0.10
+# これより短い計測は誤差が大きいので劣化の判定に使わない（秒）
+MIN_COMPARABLE_SECONDS = 0.005
+
+
+def make_test_audio(output_path: Path, duration: float) -> bool:
+    """計測用の音声（サイン波）を生成。拡張子が .wav ならPCMで出力"""
+    if output_path.suffix == '.wav':
+        codec_args = ['-c:a', 'pcm_s16le']
+    else:
+        codec_args = ['-c:a', 'libmp3lame', '-q:a', '5']
+    cmd = [
+        'ffmpeg',
+        '-y',
+        '-f', 'lavfi',
+        '-i', f"sine=frequency=440:duration={duration}",
+        *codec_args,
+        str(output_path)
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"音声生成エラー: {result.stderr}")
+        return False
+    return True
+
+
+def bench_renditions(duration: float, repeat: int = 1, audio_format: str = 'mp3') -> dict:
+    """
+    1回のffmpeg実行で全レンディションを出力する場合と、
+    レンディションごとに別々に実行する場合の所要時間を比較
+
+    Args:
+        duration: 音声の長さ（秒）
+        repeat: 計測回数（最小値を採用）
+        audio_format: 'mp3'（音声はコピー）または 'wav'（音声をAACにエンコード）
+
+    Returns:
+        計測結果の辞書（秒）
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        image_path = work_dir / "thumbnail.png"
+        audio_path = work_dir / f"audio.{audio_format}"
+
+        generator = VideoGenerator()
+        if not generator.create_thumbnail("競艇予想", "2026-01-01", image_path):
+            raise RuntimeError("サムネイル生成に失敗しました")
+        if not make_test_audio(audio_path, duration):
+            raise RuntimeError("音声生成に失敗しました")
+
+        single_pass = []
+        separate = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            if generator.create_renditions(image_path, audio_path, work_dir / "single.mp4") is None:
+                raise RuntimeError("動画生成に失敗しました")
+            single_pass.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for name, size in generator.renditions.items():
+                one = VideoGenerator(renditions={name: size})
+                if one.create_renditions(image_path, audio_path, work_dir / f"separate-{name}.mp4") is None:
+                    raise RuntimeError("動画生成に失敗しました")
+            separate.append(time.perf_counter() - start)
+
+    return {
+        'renditions': list(generator.renditions),
+        'duration': duration,
+        'audio_format': audio_format,
+        'single_pass': min(single_pass),
+        'separate': min(separate),
+    }
+
+
+# --- 合成データ ---
+
+def make_post_dates(count: int) -> List[str]:
+    """記事の日付（2000-01-01 から1日ずつ）"""
+    start = date(2000, 1, 1)
+    return [(start + timedelta(days=i)).isoformat() for i in range(count)]
+
+
+def make_cards(count: int) -> List[dict]:
+    """カード情報（既定のカードを元に ID と名前を変えて増やす）"""
+    from generate_creditcard import CreditCardData
+
+    templates = CreditCardData.get_default_cards(None)
+    cards = []
+    for i in range(count):
+        card = dict(templates[i % len(templates)])
+        card['id'] = f"bench-{i:05d}"
+        card['name'] = f"{card['name']} {i}"
+        cards.append(card)
+    return cards
+
+
+def make_narration(chars: int) -> str:
+    """ナレーション原稿（記事の要点と買い目の読み上げを繰り返す）"""
+    sentences = [
+        "本日の競艇予想をお届けします。",
+        "この記事は自動更新の動作確認用テンプレです。",
+        "現時点では断定表現を避け、一般的傾向の整理に留めます。",
+        "買い目は、1-2-3、1-3-2、2-1-3です。",
+        "直前のオッズや気象など当日の変動要素にご注意ください。",
+    ]
+    parts = []
+    length = 0
+    i = 0
+    while length < chars:
+        sentence = sentences[i % len(sentences)]
+        parts.append(sentence)
+        length += len(sentence)
+        i += 1
+    return "".join(parts)
+
+
+@contextlib.contextmanager
+def _working_directory(path: Path):
+    """generate.py はカレントディレクトリの index.html を書き換えるので一時的に移動する"""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+@contextlib.contextmanager
+def _module_attribute(module, name: str, value):
+    """出力先などのモジュール定数を計測中だけ差し替える"""
+    previous = getattr(module, name)
+    setattr(module, name, value)
+    try:
+        yield
+    finally:
+        setattr(module, name, previous)
+
+
+# --- 各項目 ---
+
+def _measure(func: Callable[[], None], repeat: int, setup: Optional[Callable[[], None]] = None) -> List[float]:
+    """func を repeat 回実行して所要時間（秒）のリストを返す（setup は計測に含めない）"""
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def bench_render_post(work_dir: Path, params: dict) -> dict:
+    """render_post(): 全記事の HTML を生成"""
+    import generate
+
+    dates = make_post_dates(params['posts'])
+    runs = _measure(lambda: [generate.render_post(d) for d in dates], params['repeat'])
+    return {'runs': runs, 'items': len(dates)}
+
+
+def bench_update_index(work_dir: Path, params: dict) -> dict:
+    """update_index(): posts 件がリンク済みの一覧に index_appends 件を追記"""
+    import generate
+
+    base_html = (Path(__file__).parent.parent / "index.html").read_text(encoding='utf-8')
+    marker = "<!-- AUTO_POSTS -->"
+    existing = "".join(f'      <li><a href="posts/{d}.html">{d} の記事</a></li>\n'
+                       for d in make_post_dates(params['posts']))
+    if marker in base_html:
+        html = base_html.replace(marker, existing + "      " + marker, 1)
+    else:
+        html = base_html.replace("</body>", f'<ul>\n{existing}      {marker}\n</ul>\n</body>', 1)
+    new_dates = [f"2100-{1 + i // 28:02d}-{1 + i % 28:02d}" for i in range(params['index_appends'])]
+    index_dir = work_dir / "site"
+    index_dir.mkdir(exist_ok=True)
+
+    def setup():
+        (index_dir / "index.html").write_text(html, encoding='utf-8')
+
+    def run():
+        for d in new_dates:
+            generate.update_index(f"posts/{d}.html", d)
+
+    with _working_directory(index_dir):
+        runs = _measure(run, params['repeat'], setup)
+    return {'runs': runs, 'items': len(new_dates)}
+
+
+def bench_generate_index_html(work_dir: Path, params: dict) -> dict:
+    """HTMLGenerator.generate_index_html(): cards 枚のカード比較ページ"""
+    import generate_creditcard
+    from generate_creditcard import CreditCardData, HTMLGenerator
+
+    # cards.json を読まずに合成データを使う
+    card_data = CreditCardData.__new__(CreditCardData)
+    card_data.cards = make_cards(params['cards'])
+    out_dir = work_dir / "creditcard"
+    with _module_attribute(generate_creditcard, 'CREDIT_DIR', out_dir), \
+            contextlib.redirect_stdout(open(os.devnull, 'w')):
+        runs = _measure(lambda: HTMLGenerator(card_data).generate_index_html(), params['repeat'])
+    return {'runs': runs, 'items': len(card_data.cards)}
+
+
+def bench_create_card_image(work_dir: Path, params: dict) -> dict:
+    """create_card_image(): card_images 枚のカード画像"""
+    from generate_card_images import create_card_image
+
+    cards = make_cards(params['card_images'])
+    out_dir = work_dir / "card_images"
+    out_dir.mkdir(exist_ok=True)
+
+    def run():
+        for card in cards:
+            create_card_image(card, out_dir / f"{card['id']}.png")
+
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        runs = _measure(run, params['repeat'])
+    return {'runs': runs, 'items': len(cards)}
+
+
+def bench_create_thumbnail(work_dir: Path, params: dict) -> dict:
+    """VideoGenerator.create_thumbnail(): thumbnails 枚のサムネイル"""
+    generator = VideoGenerator()
+    dates = make_post_dates(params['thumbnails'])
+
+    def run():
+        for d in dates:
+            generator.create_thumbnail(f"{d}｜競艇予想", d, work_dir / f"thumb-{d}.png")
+
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        runs = _measure(run, params['repeat'])
+    return {'runs': runs, 'items': len(dates)}
+
+
+def bench_narration_split(work_dir: Path, params: dict) -> dict:
+    """tts.split_sentences(): 長いナレーション原稿の分割"""
+    from tts import split_sentences
+
+    script = make_narration(params['narration_chars'])
+    runs = _measure(lambda: split_sentences(script), params['repeat'])
+    return {'runs': runs, 'items': len(script)}
+
+
+def bench_odds_read(work_dir: Path, params: dict) -> dict:
+    """OddsStore: odds_races レース × odds_rows 行の記録から最新オッズ全件と各レース1組み合わせの時系列を読む"""
+    import random
+    from odds_store import COMBINATIONS, OddsStore
+
+    store = OddsStore(work_dir / "odds")
+    rng = random.Random(0)
+    races = [f"{1 + i // 12:02d}R{1 + i % 12:02d}" for i in range(params['odds_races'])]
+    for race in races:
+        odds = [rng.randint(15, 30000) / 10 for _ in COMBINATIONS]
+        for minute in range(params['odds_rows']):
+            odds = [max(1.0, value + rng.randint(-5, 5) / 10) for value in odds]
+            store.append("2100-01-01", race, 4102412400 + minute * 60, odds)
+        store.flush("2100-01-01", race)
+
+    def run():
+        store.latest_all("2100-01-01")
+        for race in races:
+            store.series("2100-01-01", race, COMBINATIONS[0])
+
+    runs = _measure(run, params['repeat'])
+    return {'runs': runs, 'items': len(races)}
+
+
+def bench_still_encode(work_dir: Path, params: dict) -> dict:
+    """
+    create_video(): ナレーション原稿の長さの音声で静止画動画を生成
+
+    'cold' は映像トラックのキャッシュがない初回（画像ごとに別のキャッシュになる）、
+    'warm' はキャッシュ済みの2回目。
+    """
+    generator = VideoGenerator()
+    duration = params['narration_chars'] / NARRATION_CHARS_PER_SECOND
+    audio_path = work_dir / "narration.mp3"
+    if not make_test_audio(audio_path, duration):
+        raise RuntimeError("音声生成に失敗しました")
+
+    cold, warm = [], []
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        for i in range(params['repeat']):
+            # 計測のたびに別の画像にして、映像トラックのキャッシュに当たらないようにする
+            image_path = work_dir / f"still-{i}.png"
+            generator.create_thumbnail("競艇予想", f"bench-{time.time_ns()}", image_path)
+            for runs in (cold, warm):
+                start = time.perf_counter()
+                if not generator.create_video(image_path, audio_path, work_dir / "still.mp4"):
+                    raise RuntimeError("動画生成に失敗しました")
+                runs.append(time.perf_counter() - start)
+            # 計測用の映像トラックをキャッシュに残さない
+            track_path = generator.get_still_track(image_path)
+            if track_path:
+                track_path.unlink(missing_ok=True)
+    return {'runs': cold, 'items': 1, 'warm_runs': warm, 'audio_seconds': duration}
+
+
+# 項目名 → (計測関数, 必要な機能)
+BENCHMARKS = {
+    'render_post': (bench_render_post, []),
+    'update_index': (bench_update_index, []),
+    'generate_index_html': (bench_generate_index_html, []),
+    'create_card_image': (bench_create_card_image, ['pil']),
+    'create_thumbnail': (bench_create_thumbnail, ['pil']),
+    'narration_split': (bench_narration_split, []),
+    'odds_read': (bench_odds_read, []),
+    'still_encode': (bench_still_encode, ['pil', 'ffmpeg']),
+}
+
+
+def run_suite(params: dict, only: Optional[List[str]] = None) -> dict:
+    """
+    ベンチマークを実行
+
+    Args:
+        params: 合成データの規模（SUITE_DEFAULTS と同じキー）
+        only: 実行する項目名（省略時はすべて）
+
+    Returns:
+        JSON に保存する結果（'results' は項目名 → 'seconds'（最小値）・'per_item'・'runs' など）
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (func, capabilities) in BENCHMARKS.items():
+            if only and name not in only:
+                continue
+            missing = [c for c in capabilities if not has_capability(c)]
+            if missing:
+                print(f"{name}: スキップ（{', '.join(missing)} が利用できません）")
+                results[name] = {'skipped': f"{', '.join(missing)} が利用できません"}
+                continue
+            work_dir = Path(tmp) / name
+            work_dir.mkdir()
+            print(f"{name}: 計測中...", end="", flush=True)
+            entry = func(work_dir, params)
+            entry['seconds'] = min(entry['runs'])
+            entry['per_item'] = entry['seconds'] / entry['items'] if entry['items'] else None
+            if 'warm_runs' in entry:
+                entry['warm_seconds'] = min(entry['warm_runs'])
+            results[name] = entry
+            print(f"\r{name}: {entry['seconds']:.3f}s")
+
+    return {
+        'version': RESULT_FORMAT_VERSION,
+        'created': datetime.now(JST).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'params': params,
+        'results': results,
+    }
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = REGRESSION_THRESHOLD) -> List[dict]:
+    """
+    基準と比べた変化
+
+    Args:
+        baseline: 基準の結果
+        current: 今回の結果
+        threshold: 劣化とみなす遅くなった割合
+
+    Returns:
+        項目ごとの {'name', 'baseline', 'current', 'ratio', 'status'}。
+        status は 'regressed'・'improved'・'same'・'skipped'（片方にない・短すぎる・規模が違う）
+    """
+    rows = []
+    same_params = baseline.get('params') == current.get('params')
+    for name, entry in current['results'].items():
+        base = baseline['results'].get(name, {})
+        row = {'name': name, 'baseline': base.get('seconds'), 'current': entry.get('seconds'),
+               'ratio': None, 'status': 'skipped'}
+        if row['baseline'] and row['current'] and same_params \
+                and max(row['baseline'], row['current']) >= MIN_COMPARABLE_SECONDS:
+            row['ratio'] = row['current'] / row['baseline']
+            if row['ratio'] > 1 + threshold:
+                row['status'] = 'regressed'
+            elif row['ratio'] < 1 - threshold:
+                row['status'] = 'improved'
+            else:
+                row['status'] = 'same'
+        rows.append(row)
+    return rows
+
+
+def print_comparison(rows: List[dict]) -> bool:
+    """比較結果を表示し、劣化した項目があれば True を返す"""
+    labels = {'regressed': "劣化", 'improved': "改善", 'same': "変化なし", 'skipped': "比較なし"}
+    width = max([len(row['name']) for row in rows] + [4])
+    print(f"{'項目':<{width - 2}}  {'基準':>9}  {'今回':>9}  {'比':>6}")
+    for row in rows:
+        baseline = f"{row['baseline']:.3f}s" if row['baseline'] else "-"
+        current = f"{row['current']:.3f}s" if row['current'] else "-"
+        ratio = f"{row['ratio']:.2f}x" if row['ratio'] else "-"
+        print(f"{row['name']:<{width}}  {baseline:>9}  {current:>9}  {ratio:>6}  {labels[row['status']]}")
+    regressed = [row['name'] for row in rows if row['status'] == 'regressed']
+    if regressed:
+        print(f"\n劣化した項目: {', '.join(regressed)}")
+    return bool(regressed)
+
+
+def load_results(path: Path) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_results(results: dict, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def print_results(results: dict):
+    """結果の表を表示"""
+    rows = results['results']
+    width = max(len(name) for name in rows)
+    print(f"\n{'項目':<{width - 2}}  {'最小':>9}  {'件数':>6}  {'1件あたり':>10}")
+    for name, entry in rows.items():
+        if 'skipped' in entry:
+            print(f"{name:<{width}}  スキップ（{entry['skipped']}）")
+            continue
+        per_item = entry['per_item']
+        per_item_text = f"{per_item * 1000:.3f}ms" if per_item is not None else "-"
+        print(f"{name:<{width}}  {entry['seconds']:>8.3f}s  {entry['items']:>6}  {per_item_text:>10}")
+        if 'warm_seconds' in entry:
+            print(f"{'':<{width}}  {entry['warm_seconds']:>8.3f}s  （キャッシュ済み、音声 {entry['audio_seconds']:.0f} 秒）")
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="生成処理のベンチマーク")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    suite = sub.add_parser("suite", help="合成データで各生成処理を計測")
+    suite.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="計測する項目")
+    for key, value in SUITE_DEFAULTS.items():
+        suite.add_argument(f"--{key.replace('_', '-')}", type=int, default=value, dest=key,
+                           help=f"（既定: {value}）")
+    suite.add_argument("--output", type=Path, help="結果の保存先（省略時は .cache/benchmarks/日時.json）")
+    suite.add_argument("--save-baseline", action="store_true", help=f"結果を基準として保存（{BASELINE_FILE}）")
+    suite.add_argument("--baseline", nargs="?", type=Path, const=BASELINE_FILE,
+                       help="基準の結果と比べる（パス省略時は保存済みの基準）")
+    suite.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                       help="劣化とみなす遅くなった割合（既定: 0.10）")
+
+    compare = sub.add_parser("compare", help="保存済みの2つの結果を比べる")
+    compare.add_argument("baseline", type=Path)
+    compare.add_argument("current", type=Path)
+    compare.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+
+    renditions = sub.add_parser("renditions", help="複数レンディション出力の比較")
+    renditions.add_argument("--duration", type=float, default=60.0, help="音声の長さ（秒）")
+    renditions.add_argument("--repeat", type=int, default=3, help="計測回数")
+    renditions.add_argument("--audio", choices=["mp3", "wav"], default="mp3",
+                            help="入力音声の形式（wav は AAC エンコードを含めて計測）")
+
+    args = parser.parse_args()
+
+    if args.command == "suite":
+        print("=== ベンチマーク ===\n")
+        params = {key: getattr(args, key) for key in SUITE_DEFAULTS}
+        results = run_suite(params, args.only)
+        print_results(results)
+
+        output = args.output or BENCHMARK_DIR / f"{datetime.now(JST).strftime('%Y%m%d-%H%M%S')}.json"
+        save_results(results, output)
+        print(f"\n結果を保存しました: {output}")
+        if args.save_baseline:
+            save_results(results, BASELINE_FILE)
+            print(f"基準として保存しました: {BASELINE_FILE}")
+        if args.baseline:
+            if not args.baseline.exists():
+                print(f"エラー: 基準の結果が見つかりません: {args.baseline}")
+                sys.exit(1)
+            print()
+            if print_comparison(compare_results(load_results(args.baseline), results, args.threshold)):
+                sys.exit(1)
+
+    elif args.command == "compare":
+        if print_comparison(compare_results(load_results(args.baseline), load_results(args.current),
+                                            args.threshold)):
+            sys.exit(1)
+
+    elif args.command == "renditions":
+        if not require_capability('ffmpeg', "ffmpeg") or not require_capability('pil', "Pillow"):
+            raise SystemExit(1)
+        print("=== レンディション出力ベンチマーク ===\n")
+        result = bench_renditions(args.duration, args.repeat, args.audio)
+        print(f"\nレンディション: {', '.join(result['renditions'])}")
+        print(f"音声: {result['audio_format']}, {result['duration']:.0f} 秒")
+        print(f"1回の実行で出力: {result['single_pass']:.2f} 秒")
+        print(f"個別に実行:       {result['separate']:.2f} 秒")
+        print(f"速度比: {result['separate'] / result['single_pass']:.2f} 倍")
+
+
+if __name__ == "__main__":
+    main()
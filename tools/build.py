@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+サイト全体のビルドスクリプト
+
+各ツール（generate.py・generate_card_images.py・generate_creditcard.py・
+youtube_video_generator.py）の生成物をターゲットの依存グラフとして扱い、
+入力の内容ハッシュが前回から変わったターゲットだけを作り直します。
+依存関係のないターゲットは pipeline.py で並行に実行します。
+
+    cards.json → カード画像（1枚ずつ） → カード比較ページ
+    creditcard/ の共有ファイル → トップページ側への配置（asset_store.py）
+    記事テンプレート → 当日の記事 → トップページの記事一覧 → 動画（--video）
+    記事一覧・カード比較ページ → サイトマップ・フィード（feeds.py、公開URLが分かるときだけ）
+    当日の記事 → 全文検索インデックス（search_index.py）
+
+前回のハッシュは build_state.json に保存します（CI でも前回の状態を引き継げるようコミットする）。
+
+使い方:
+    python tools/build.py              # 古いターゲットだけ作り直す
+    python tools/build.py --dry-run    # 作り直すターゲットを表示するだけ
+    python tools/build.py --force      # すべて作り直す
+    python tools/build.py --touch      # 作り直さずに現在の状態を最新として記録
+    python tools/build.py --check      # ビルド後にリンク・画像をチェック
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+from pipeline import Stage, StageError, run_pipeline
+
+# 設定
+BASE_DIR = Path(__file__).parent.parent
+TOOLS_DIR = Path(__file__).parent
+BUILD_STATE_FILE = BASE_DIR / "build_state.json"
+CREDIT_DIR = BASE_DIR / "creditcard"
+CARDS_JSON = CREDIT_DIR / "cards.json"
+POSTS_DIR = BASE_DIR / "posts"
+
+# ハッシュの計算方法を変えたら上げる（前回の状態をすべて無効にするため）
+BUILD_STATE_VERSION = 1
+
+
+class Target:
+    """ビルドの1ターゲット"""
+
+    def __init__(self, name: str, action: Callable[[], object], inputs: Iterable[Path] = (),
+                 keys: Iterable[str] = (), outputs: Iterable[Path] = (), deps: Iterable[str] = ()):
+        """
+        初期化
+
+        Args:
+            name: ターゲット名
+            action: 生成処理（例外を送出するか False を返すと失敗）
+            inputs: 内容をハッシュする入力ファイル
+            keys: ハッシュに含めるファイル以外の入力（日付・カードのデータなど）
+            outputs: 生成されるファイル（1つでも無ければ作り直す）
+            deps: 依存するターゲット名（依存先のハッシュもこのターゲットの入力になる）
+        """
+        self.name = name
+        self.action = action
+        self.inputs = [Path(path) for path in inputs]
+        self.keys = list(keys)
+        self.outputs = [Path(path) for path in outputs]
+        self.deps = list(deps)
+
+
+class FileHasher:
+    """ファイル内容のハッシュ（1回のビルド中は同じファイルを読み直さない）"""
+
+    def __init__(self):
+        self._hashes = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, path: Path) -> str:
+        with self._lock:
+            digest = self._hashes.get(path)
+        if digest is None:
+            try:
+                digest = hashlib.sha256(path.read_bytes()).hexdigest()
+            except FileNotFoundError:
+                digest = "missing"
+            with self._lock:
+                self._hashes[path] = digest
+        return digest
+
+
+def _relative(path: Path) -> str:
+    """状態ファイルに書くパス（環境によらないようリポジトリからの相対パス）"""
+    try:
+        return path.resolve().relative_to(BASE_DIR.resolve()).as_posix()
+    except ValueError:
+        return str(path)
+
+
+def target_hash(target: Target, dep_hashes: List[str], hasher: FileHasher) -> str:
+    """ターゲットの入力（ファイル内容・キー・依存先）から状態ハッシュを計算"""
+    h = hashlib.sha256(f"v{BUILD_STATE_VERSION}\0{target.name}".encode('utf-8'))
+    for path in target.inputs:
+        h.update(f"\0file:{_relative(path)}:{hasher(path)}".encode('utf-8'))
+    for key in target.keys:
+        h.update(f"\0key:{key}".encode('utf-8'))
+    for dep_hash in dep_hashes:
+        h.update(f"\0dep:{dep_hash}".encode('utf-8'))
+    return h.hexdigest()
+
+
+def load_state() -> dict:
+    """前回のビルド状態（ターゲット名 → ハッシュ）を読み込み"""
+    try:
+        with open(BUILD_STATE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state: dict):
+    """ビルド状態を保存（差分が読みやすいようキー順で書く）"""
+    tmp_path = BUILD_STATE_FILE.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, BUILD_STATE_FILE)
+
+
+# --- ターゲット定義 ---
+
+def card_targets() -> List[Target]:
+    """カード画像（1枚ずつ）とカード比較ページ"""
+    with open(CARDS_JSON, 'r', encoding='utf-8') as f:
+        cards = json.load(f)
+    script = TOOLS_DIR / "generate_card_images.py"
+
+    def make_image(card):
+        def action():
+            from generate_card_images import IMAGES_DIR, create_card_image
+            IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+            create_card_image(card, IMAGES_DIR / f"{card['id']}.png")
+        return action
+
+    targets = []
+    for card in cards:
+        targets.append(Target(
+            f"card_image:{card['id']}", make_image(card),
+            inputs=[script],
+            # cards.json 全体ではなくこのカードのデータだけを入力にする
+            keys=[json.dumps(card, ensure_ascii=False, sort_keys=True)],
+            outputs=[CREDIT_DIR / "images" / f"{card['id']}.png", BASE_DIR / "images" / f"{card['id']}.png"],
+        ))
+
+    def sync_shared():
+        # 手で編集した creditcard/ の共有ファイルをトップページ側にも配置する
+        from asset_store import default_store
+        default_store().sync()
+
+    targets.append(Target(
+        "shared_assets", sync_shared,
+        inputs=[CARDS_JSON, CREDIT_DIR / "style.css", TOOLS_DIR / "asset_store.py"],
+        outputs=[BASE_DIR / "cards.json", BASE_DIR / "style.css"],
+        # カード画像も取り込むので、画像の生成が終わってから実行する
+        deps=[target.name for target in targets],
+    ))
+
+    def make_pages():
+        from generate_creditcard import CreditCardData, HTMLGenerator
+        HTMLGenerator(CreditCardData()).generate_index_html()
+
+    from feeds import feeds_enabled
+    targets.append(Target(
+        "card_pages", make_pages,
+        inputs=[CARDS_JSON, TOOLS_DIR / "generate_creditcard.py"],
+        # カードのフィードへの <link> は公開URLが分かるときだけ出す
+        keys=[f"feed={feeds_enabled()}"],
+        outputs=[CREDIT_DIR / "index.html"],
+        deps=[target.name for target in targets if target.name.startswith("card_image:")],
+    ))
+    return targets
+
+
+def post_targets(date_s: str, video: bool = False, slides: bool = False) -> List[Target]:
+    """当日の記事・トップページの記事一覧・（指定時）動画（slides ならスライド動画）"""
+    import generate
+    from feeds import feeds_enabled
+
+    script = TOOLS_DIR / "generate.py"
+    post_path = POSTS_DIR / f"{date_s}.html"
+    # フィードへの <link> は公開URLが分かるときだけ出すので、その有無も入力にする
+    feed = feeds_enabled()
+
+    def make_post():
+        POSTS_DIR.mkdir(parents=True, exist_ok=True)
+        # generate.py と同じく、同日記事が既にあれば作り直さない
+        if not post_path.exists():
+            from odds_store import OddsStore
+            post_path.write_text(generate.render_post(date_s, OddsStore().favorites(date_s), feed),
+                                 encoding="utf-8")
+
+    def make_index():
+        # generate.py と同じく、当日の記事へのリンクだけを一覧に追記する
+        index_path = BASE_DIR / "index.html"
+        generate.update_index(f"posts/{post_path.name}", date_s)
+        generate.update_feed_link(feed, index_path)
+
+    targets = [
+        Target("post", make_post, inputs=[script], keys=[date_s, f"feed={feed}"], outputs=[post_path]),
+        Target("index", make_index, inputs=[script], keys=[date_s, f"feed={feed}"],
+               outputs=[BASE_DIR / "index.html"], deps=["post"]),
+    ]
+
+    if video:
+        from youtube_video_generator import RENDITIONS, VIDEO_DIR, VideoGenerator
+        video_paths = [VideoGenerator.rendition_path(VIDEO_DIR / f"{date_s}.mp4", name) for name in RENDITIONS]
+
+        def make_video():
+            from media_store import MediaStore, print_prune_result
+            from youtube_video_generator import process_post
+            media = MediaStore()
+            # アップロード済みの動画はメタデータだけを残してローカルから消している
+            if all(media.is_published(path) for path in video_paths):
+                return True
+            # 古いかどうかはビルド側で判定済み
+            result = process_post(VideoGenerator(slides=slides), post_path, force=True)
+            print_prune_result(media.prune())
+            return result['status'] != 'failed'
+
+        targets.append(Target(
+            "video", make_video,
+            inputs=[post_path, TOOLS_DIR / "youtube_video_generator.py", TOOLS_DIR / "media_config.py",
+                    TOOLS_DIR / "pipeline.py", TOOLS_DIR / "tts.py"]
+                   + ([TOOLS_DIR / "slide_renderer.py"] if slides else []),
+            outputs=video_paths,
+            deps=["post"],
+        ))
+    return targets
+
+
+def search_targets(date_s: str) -> List[Target]:
+    """全文検索インデックス（記事の増減・変更は search_index.py 側で内容ハッシュから判定する）"""
+    from search_index import META_FILE, SEARCH_DIR, STATE_FILE, update_index
+
+    posts = {path.name for path in POSTS_DIR.glob("*.html")} | {f"{date_s}.html"}
+    return [Target(
+        "search", lambda: update_index(BASE_DIR),
+        inputs=[TOOLS_DIR / "search_index.py", TOOLS_DIR / "post_parser.py", POSTS_DIR / f"{date_s}.html"],
+        keys=sorted(posts),
+        outputs=[BASE_DIR / SEARCH_DIR / META_FILE, BASE_DIR / SEARCH_DIR / STATE_FILE],
+        deps=["post"],
+    )]
+
+
+def feed_targets(date_s: str) -> List[Target]:
+    """サイトマップ・フィード（公開URLが決められなければ作らない）"""
+    import feeds
+
+    base_url = feeds.site_url(feeds.load_manifest())
+    if base_url is None:
+        print("サイトマップ・フィード: 公開URLが不明なため省略します（環境変数 SITE_URL を指定してください）")
+        return []
+
+    def make_feeds():
+        # 新しい記事は feeds.py 側で見つけるので、内容が変わりうる当日の記事だけ渡す
+        return feeds.update_feeds(BASE_DIR, changed=[f"posts/{date_s}.html"]) is not None
+
+    # post_targets() と同じく、これから作る当日の記事も一覧に含める
+    posts = {path.name for path in POSTS_DIR.glob("*.html")} | {f"{date_s}.html"}
+    return [Target(
+        "feeds", make_feeds,
+        inputs=[TOOLS_DIR / "feeds.py", CARDS_JSON, POSTS_DIR / f"{date_s}.html"],
+        keys=[base_url] + sorted(posts),
+        outputs=[BASE_DIR / feeds.SITEMAP_FILE, BASE_DIR / feeds.ATOM_FILE, BASE_DIR / feeds.RSS_FILE,
+                 BASE_DIR / feeds.CARD_FEED_FILE, feeds.MANIFEST_FILE],
+        deps=["index", "card_pages"],
+    )]
+
+
+# --- 実行 ---
+
+def run_build(targets: List[Target], jobs: Optional[int] = None, force: bool = False,
+              dry_run: bool = False, touch: bool = False) -> dict:
+    """
+    古いターゲットだけを依存順に作り直す
+
+    Args:
+        targets: ターゲットのリスト
+        jobs: 並列数（省略時は CPU 数）
+        force: ハッシュに関係なくすべて作り直す
+        dry_run: 作り直すターゲットを判定するだけで実行しない
+        touch: 作り直さずに現在の入力を最新として記録する
+
+    Returns:
+        ターゲット名 → {'status': 'built'|'skipped'|'stale'|'touched'|'failed', 'seconds'}
+    """
+    state = load_state()
+    hasher = FileHasher()
+    report = {}
+    lock = threading.Lock()
+    by_name = {target.name: target for target in targets}
+
+    def run_target(name, *dep_hashes):
+        target = by_name[name]
+        start = time.perf_counter()
+        digest = target_hash(target, list(dep_hashes), hasher)
+        fresh = state.get(name) == digest and all(path.exists() for path in target.outputs)
+
+        if fresh and not force:
+            status = 'skipped'
+        elif dry_run:
+            status = 'stale'
+        elif touch:
+            status = 'touched'
+        else:
+            result = False
+            try:
+                result = target.action()
+            finally:
+                if result is False:
+                    with lock:
+                        report[name] = {'status': 'failed', 'seconds': time.perf_counter() - start}
+            if result is False:
+                return False
+            status = 'built'
+
+        with lock:
+            if status in ('built', 'touched'):
+                state[name] = digest
+            report[name] = {'status': status, 'seconds': time.perf_counter() - start}
+        return digest
+
+    stages = [Stage(target.name, lambda *deps, name=target.name: run_target(name, *deps),
+                    deps=target.deps) for target in targets]
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        try:
+            run_pipeline(stages, thread_pool=pool)
+        except StageError as e:
+            print(f"エラー: {e}")
+        finally:
+            if not dry_run:
+                # 失敗したターゲットがあっても、完了した分は記録しておく
+                save_state(state)
+
+    for target in targets:
+        report.setdefault(target.name, {'status': 'cancelled', 'seconds': 0.0})
+    return report
+
+
+def print_report(report: dict):
+    """ターゲットごとの結果を表示"""
+    labels = {
+        'built': "生成", 'skipped': "最新", 'stale': "要生成", 'touched': "記録",
+        'failed': "失敗", 'cancelled': "中止",
+    }
+    width = max(len(name) for name in report)
+    for name, entry in report.items():
+        print(f"{name:<{width}}  {labels[entry['status']]:<4}  {entry['seconds']:6.2f}s")
+    counts = {}
+    for entry in report.values():
+        counts[entry['status']] = counts.get(entry['status'], 0) + 1
+    print("、".join(f"{labels[status]} {count}件" for status, count in counts.items()))
+
+
+def parse_args(argv=None):
+    """コマンドライン引数を解析"""
+    from generate import today_str
+
+    parser = argparse.ArgumentParser(description="サイト全体のインクリメンタルビルド")
+    parser.add_argument("--date", default=today_str(), help="記事の日付（YYYY-MM-DD、省略時は今日）")
+    parser.add_argument("--video", action="store_true", help="記事の動画も生成する")
+    parser.add_argument("--slides", action="store_true", help="動画をスライド動画にする（--video と併用）")
+    parser.add_argument("--dist", action="store_true",
+                        help="ビルド後に公開用の最小化・圧縮済みファイルを dist/ に書き出す（optimize.py）")
+    parser.add_argument("--check", action="store_true",
+                        help="ビルド後にリンク・画像をチェックし、問題があれば失敗にする（check_links.py）")
+    parser.add_argument("--only", nargs="+", metavar="TARGET",
+                        help="指定したターゲット（と依存先）だけをビルド")
+    parser.add_argument("--jobs", type=int, help="並列数（省略時は CPU 数）")
+    parser.add_argument("--force", action="store_true", help="すべて作り直す")
+    parser.add_argument("--dry-run", action="store_true", help="作り直すターゲットを表示するだけ")
+    parser.add_argument("--touch", action="store_true", help="作り直さずに現在の状態を最新として記録")
+    return parser.parse_args(argv)
+
+
+def select_targets(targets: List[Target], names: List[str]) -> List[Target]:
+    """指定したターゲットとその依存先だけを残す"""
+    by_name = {target.name: target for target in targets}
+    wanted = set()
+
+    def visit(name):
+        if name not in by_name:
+            raise SystemExit(f"エラー: 不明なターゲットです: {name}")
+        if name not in wanted:
+            wanted.add(name)
+            for dep in by_name[name].deps:
+                visit(dep)
+
+    for name in names:
+        visit(name)
+    return [target for target in targets if target.name in wanted]
+
+
+def main(argv=None) -> int:
+    """メイン処理"""
+    args = parse_args(argv)
+    # generate.py はカレントディレクトリからの相対パスで index.html を読み書きする
+    os.chdir(BASE_DIR)
+
+    targets = (card_targets() + post_targets(args.date, args.video, args.slides) + search_targets(args.date)
+               + feed_targets(args.date))
+    if args.only:
+        targets = select_targets(targets, args.only)
+
+    start = time.perf_counter()
+    report = run_build(targets, args.jobs, args.force, args.dry_run, args.touch)
+    print_report(report)
+    failed = any(entry['status'] in ('failed', 'cancelled') for entry in report.values())
+
+    if args.dist and not failed and not args.dry_run:
+        from optimize import DIST_DIR, optimize_site
+        summary = optimize_site(jobs=args.jobs)
+        print(f"dist: 書き込み {summary['written']}件、変更なし {summary['skipped']}件"
+              f"、削除 {summary['removed']}件（{DIST_DIR}）")
+
+    if args.check and not failed and not args.dry_run:
+        import check_links
+        result = check_links.check_site(DIST_DIR if args.dist else BASE_DIR, jobs=args.jobs)
+        check_links.print_report(result, limit=20)
+        failed = bool(result['issues'])
+
+    print(f"合計: {time.perf_counter() - start:.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+"""
+リンク・画像のチェックスクリプト
+
+生成したサイト（リポジトリのルート、または dist/）の HTML をすべて並列に解析し、
+次のものを確かめます。
+
+- サイト内リンク（a・area・iframe）の参照先ファイルがあるか
+- #アンカーの参照先に同じ id（または a の name）の要素があるか
+- 画像（img・source の src/srcset）・スタイルシート・スクリプトのファイルがあるか
+- cards.json の affiliate_url が http(s) のURLになっているか
+
+既知の問題（まだ中身のないカテゴリ・フッターのアンカー、未設定の affiliate_url など）は
+tools/check_links_baseline.json に書いておくと失敗扱いにせず、件数だけを表示します。
+新しく増えた問題だけが失敗になります。
+
+--external を付けると、外部URL（アフィリエイトリンクなど）にも asyncio で HEAD（使えなければ GET）を送ります。
+接続はホストごとに使い回し、ホストごとの同時接続数と1秒あたりのリクエスト数を制限します。
+
+使い方:
+    python tools/check_links.py                  # リポジトリのルート
+    python tools/check_links.py dist             # 公開用ファイル
+    python tools/check_links.py --external --host-rate 1
+    python tools/check_links.py --update-baseline  # 今の問題をすべて既知として書き出す
+    python tools/fake_link_server.py --port 8766 # 外部URLのチェックをローカルで試す代用サーバー
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import posixpath
+import re
+import ssl
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from html import unescape
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote, urljoin, urlsplit
+
+from tracing import count, span
+
+# 設定
+BASE_DIR = Path(__file__).parent.parent
+CARDS_JSON = "creditcard/cards.json"
+# 既知の問題（ページ・種類・URL・メッセージの組。行番号は見ないので前後を編集しても外れない）
+BASELINE_FILE = Path(__file__).parent / "check_links_baseline.json"
+
+# 解析しないディレクトリ（生成物ではないもの・別に確かめるもの）
+EXCLUDE_DIRS = {".git", ".cache", ".github", "node_modules", "dist", "tools", "__pycache__"}
+
+# 要素 → {属性: 参照の種類}
+REF_ATTRS = {
+    'a': {'href': 'link'},
+    'area': {'href': 'link'},
+    'iframe': {'src': 'link'},
+    'img': {'src': 'image'},
+    'source': {'src': 'image'},
+    'link': {'href': 'asset'},
+    'script': {'src': 'asset'},
+}
+SRCSET_TAGS = {'img', 'source'}
+# 確かめないスキーム
+IGNORED_SCHEMES = {'mailto', 'tel', 'javascript', 'data', 'sms'}
+# 要素がなくてもブラウザがページの先頭に移動するアンカー
+IMPLICIT_ANCHORS = {'', 'top'}
+
+# 開始タグ（引用符の中の > は区切りにしない）と属性
+TAG_PATTERN = re.compile(r'<([a-zA-Z][a-zA-Z0-9-]*)((?:\s+[^\s=>/]+(?:\s*=\s*(?:"[^"]*"|\'[^\']*\'|[^\s>]+))?)*)\s*/?>')
+ATTR_PATTERN = re.compile(r'([^\s=>/]+)(?:\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+))?')
+# コメント、または script・style の中身（2番目のグループ）
+SKIP_PATTERN = re.compile(r'<!--.*?-->|<(script|style)\b[^>]*>(.*?)</\1\s*>', re.S | re.I)
+
+# 1プロセスあたりにまとめて渡すページ数
+PARSE_CHUNK = 64
+
+# 外部URLのチェック
+EXTERNAL_CONCURRENCY = 32
+HOST_CONNECTIONS = 2
+HOST_RATE = 2.0  # 1ホストあたりの1秒間のリクエスト数
+EXTERNAL_TIMEOUT = 15.0
+MAX_REDIRECTS = 5
+USER_AGENT = "kyotei-picks-link-checker/1.0"
+
+
+def _blank(match: re.Match) -> str:
+    """コメント・script・style の中身を改行だけ残して空白にする"""
+    start = match.start(2) - match.start() if match.group(2) is not None else 0
+    end = match.end(2) - match.start() if match.group(2) is not None else len(match.group(0))
+    text = match.group(0)
+    return text[:start] + re.sub(r'[^\n]', ' ', text[start:end]) + text[end:]
+
+
+def parse_page(path: str) -> Tuple[List[str], List[tuple]]:
+    """
+    ページを解析して (id のリスト, 参照のリスト) を返す
+
+    何千ページも読むので html.parser ではなく開始タグだけを正規表現で拾います
+    （コメントと script・style の中身は行数を保ったまま空白にしてから探す）。
+
+    Returns:
+        id（と a の name）のリスト, (種類, URL, 行) のリスト
+    """
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        html = f.read()
+    html = SKIP_PATTERN.sub(_blank, html)
+    ids = set()
+    refs = []
+    line, offset = 1, 0
+    for match in TAG_PATTERN.finditer(html):
+        tag = match.group(1).lower()
+        attrs = {}
+        for name, value in ATTR_PATTERN.findall(match.group(2)):
+            attrs.setdefault(name.lower(), unescape(value[1:-1] if value[:1] in ('"', "'") else value))
+        if not attrs:
+            continue
+        line += html.count('\n', offset, match.start())
+        offset = match.start()
+        if attrs.get('id'):
+            ids.add(attrs['id'])
+        if tag == 'a' and attrs.get('name'):
+            ids.add(attrs['name'])
+        for attr, kind in REF_ATTRS.get(tag, {}).items():
+            if attrs.get(attr) is not None:
+                refs.append((kind, attrs[attr].strip(), line))
+        if tag in SRCSET_TAGS and attrs.get('srcset'):
+            for candidate in attrs['srcset'].split(','):
+                url = candidate.strip().split(' ')[0]
+                if url:
+                    refs.append(('image', url, line))
+    return sorted(ids), refs
+
+
+def _parse_chunk(paths: List[str]) -> List[tuple]:
+    """ワーカープロセスでまとめて解析"""
+    return [parse_page(path) for path in paths]
+
+
+def collect_pages(root: Path) -> List[str]:
+    """サイト内の HTML（root からの相対パス、/ 区切り）"""
+    pages = []
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names[:] = sorted(name for name in dir_names if name not in EXCLUDE_DIRS and not name.startswith('.'))
+        rel_dir = Path(dir_path).relative_to(root).as_posix()
+        for name in sorted(file_names):
+            if name.endswith(('.html', '.htm')):
+                pages.append(name if rel_dir == '.' else f"{rel_dir}/{name}")
+    return pages
+
+
+def _issue(page: str, line: int, kind: str, url: str, message: str) -> dict:
+    return {'page': page, 'line': line, 'kind': kind, 'url': url, 'message': message}
+
+
+class SiteChecker:
+    """解析済みのページから参照先を確かめる"""
+
+    def __init__(self, root: Path, pages: Dict[str, Tuple[List[str], List[tuple]]]):
+        self.root = root
+        self.pages = {page: set(ids) for page, (ids, _) in pages.items()}
+        self._exists = {}
+        self._results = {}
+
+    def exists(self, rel_path: str) -> bool:
+        result = self._exists.get(rel_path)
+        if result is None:
+            result = self._exists[rel_path] = (self.root / rel_path).is_file()
+        return result
+
+    def page_ids(self, rel_path: str) -> set:
+        """参照先のページの id（解析対象外のページは読むときに解析する）"""
+        ids = self.pages.get(rel_path)
+        if ids is None:
+            ids = self.pages[rel_path] = set(parse_page(str(self.root / rel_path))[0])
+        return ids
+
+    def resolve(self, page: str, path: str) -> Optional[str]:
+        """ページからの相対パスを root からの相対パスにする（root の外なら None）"""
+        path = unquote(path)
+        target = path.lstrip('/') if path.startswith('/') else posixpath.join(posixpath.dirname(page), path)
+        target = posixpath.normpath(target) if target else ""
+        if target.startswith('../') or target == '..':
+            return None
+        if target in ('', '.') or path.endswith('/'):
+            target = posixpath.join(target, 'index.html') if target not in ('', '.') else 'index.html'
+        elif not self.exists(target) and (self.root / target).is_dir():
+            target = posixpath.join(target, 'index.html')
+        return target
+
+    def check_ref(self, page: str, kind: str, url: str, line: int, external: dict) -> Optional[dict]:
+        """参照を1つ確かめる（問題があれば issue を返す。外部URLは external に集める）"""
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme in IGNORED_SCHEMES:
+            return None
+        if scheme in ('http', 'https') or url.startswith('//'):
+            external.setdefault(url if scheme else f"https:{url}", []).append((page, line, kind))
+            return None
+        # 同じディレクトリのページから同じURLを参照していれば結果も同じ（#だけのリンクはページごと）
+        key = (page if not parts.path else posixpath.dirname(page), kind, url)
+        if key not in self._results:
+            self._results[key] = self._check(page, kind, url, parts)
+        message = self._results[key]
+        return _issue(page, line, kind, url, message) if message else None
+
+    def _check(self, page: str, kind: str, url: str, parts) -> Optional[str]:
+        """問題があればメッセージを返す"""
+        if parts.scheme or parts.netloc:
+            return f"対応していないURLです（{parts.scheme}）"
+        target = page if not parts.path else self.resolve(page, parts.path)
+        if target is None:
+            return "サイトの外を指しています"
+        if parts.path and not self.exists(target):
+            return f"ファイルがありません（{target}）"
+        fragment = unquote(parts.fragment)
+        if kind == 'link' and fragment not in IMPLICIT_ANCHORS and target.endswith(('.html', '.htm')):
+            if fragment not in self.page_ids(target):
+                return f"アンカーがありません（{target} に id=\"{fragment}\" がない）"
+        return None
+
+
+def check_cards(root: Path) -> List[dict]:
+    """cards.json の affiliate_url を確かめる"""
+    path = root / CARDS_JSON
+    if not path.exists():
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        cards = json.load(f)
+    issues = []
+    for card in cards:
+        url = card.get('affiliate_url') or ""
+        if urlsplit(url).scheme not in ('http', 'https'):
+            issues.append(_issue(CARDS_JSON, 0, 'affiliate', url,
+                                 f"affiliate_url が設定されていません（{card.get('id', card.get('name', '?'))}）"))
+    return issues
+
+
+# --- 外部URL ---
+
+class HostLimiter:
+    """ホストごとの同時接続数と1秒あたりのリクエスト数の制限"""
+
+    def __init__(self, connections: int, rate: float):
+        self.connections = connections
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._semaphores = {}
+        self._next_time = {}
+        self._locks = {}
+
+    def semaphore(self, host: str) -> asyncio.Semaphore:
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.connections)
+            self._locks[host] = asyncio.Lock()
+        return self._semaphores[host]
+
+    async def wait_turn(self, host: str):
+        """前のリクエストから interval 秒たつまで待つ"""
+        if not self.interval:
+            return
+        async with self._locks[host]:
+            now = time.monotonic()
+            start = max(now, self._next_time.get(host, 0.0))
+            self._next_time[host] = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class ConnectionPool:
+    """ホストごとに keep-alive の接続を使い回す HTTP/1.1 クライアント"""
+
+    def __init__(self, limiter: HostLimiter, timeout: float = EXTERNAL_TIMEOUT):
+        self.limiter = limiter
+        self.timeout = timeout
+        self._idle = {}  # (scheme, host, port) → [(reader, writer)]
+        self._ssl = ssl.create_default_context()
+        self.connections = 0
+        self.requests = 0
+
+    async def _connect(self, key: tuple):
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        scheme, host, port = key
+        reader, writer = await asyncio.open_connection(host, port, ssl=self._ssl if scheme == 'https' else None,
+                                                       server_hostname=host if scheme == 'https' else None)
+        self.connections += 1
+        return reader, writer, False
+
+    async def request(self, method: str, url: str) -> Tuple[int, Dict[str, str]]:
+        """リクエストを1回送って (ステータス, ヘッダー) を返す（本文は読み捨てる）"""
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        host = parts.hostname or ""
+        key = (scheme, host, parts.port or (443 if scheme == 'https' else 80))
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        host_header = parts.netloc.rpartition('@')[2]
+        headers = [f"{method} {target} HTTP/1.1", f"Host: {host_header}", f"User-Agent: {USER_AGENT}",
+                   "Accept: */*", "Connection: keep-alive"]
+        if method == 'GET':
+            headers.append("Range: bytes=0-0")
+        data = ("\r\n".join(headers) + "\r\n\r\n").encode('latin-1')
+
+        async with self.limiter.semaphore(host):
+            await self.limiter.wait_turn(host)
+            for attempt in range(2):
+                reader, writer, reused = await asyncio.wait_for(self._connect(key), self.timeout)
+                try:
+                    writer.write(data)
+                    await writer.drain()
+                    status, response_headers, keep_alive = await asyncio.wait_for(
+                        self._read_response(reader, method), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    # 使い回した接続がサーバー側で切られていたら、新しい接続で1回だけやり直す
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                except BaseException:
+                    writer.close()
+                    raise
+                self.requests += 1
+                if keep_alive:
+                    self._idle.setdefault(key, []).append((reader, writer))
+                else:
+                    writer.close()
+                return status, response_headers
+        raise ConnectionError("接続できませんでした")
+
+    async def _read_response(self, reader: asyncio.StreamReader, method: str) -> Tuple[int, Dict[str, str], bool]:
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("応答がありません")
+        match = re.match(rb'HTTP/(\d\.\d) (\d{3})', status_line)
+        if not match:
+            raise ConnectionError(f"不正な応答です: {status_line[:40]!r}")
+        status = int(match.group(2))
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        keep_alive = match.group(1) == b"1.1" and headers.get('connection', '').lower() != 'close'
+
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            return status, headers, keep_alive
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await reader.readline()).split(b';')[0].strip() or b"0", 16)
+                if not size:
+                    break
+                await reader.readexactly(size + 2)
+            # トレーラーを読み飛ばす
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+        elif 'content-length' in headers:
+            await reader.readexactly(int(headers['content-length']))
+        else:
+            await reader.read()
+            keep_alive = False
+        return status, headers, keep_alive
+
+    def close(self):
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+
+async def _check_url(pool: ConnectionPool, url: str) -> Tuple[Optional[int], str]:
+    """URL を確かめて (最終的なステータス, メッセージ) を返す（リダイレクトをたどる）"""
+    current = url
+    for _ in range(MAX_REDIRECTS + 1):
+        try:
+            status, headers = await pool.request('HEAD', current)
+            if status in (405, 501):
+                # HEAD に対応していないサーバー
+                status, headers = await pool.request('GET', current)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ssl.SSLError) as e:
+            return None, f"接続できません（{type(e).__name__}: {e}）"
+        if status in (301, 302, 303, 307, 308) and headers.get('location'):
+            current = urljoin(current, headers['location'])
+            continue
+        return status, "" if status < 400 else f"HTTP {status}"
+    return None, f"リダイレクトが多すぎます（{MAX_REDIRECTS}回）"
+
+
+async def check_external(urls: List[str], concurrency: int = EXTERNAL_CONCURRENCY,
+                         host_connections: int = HOST_CONNECTIONS, host_rate: float = HOST_RATE,
+                         timeout: float = EXTERNAL_TIMEOUT) -> Dict[str, dict]:
+    """
+    外部URLをまとめて確かめる
+
+    Args:
+        urls: URL のリスト
+        concurrency: 全体の同時リクエスト数
+        host_connections: ホストごとの同時接続数
+        host_rate: ホストごとの1秒あたりのリクエスト数（0 なら制限しない）
+        timeout: 1リクエストのタイムアウト秒数
+
+    Returns:
+        URL → {'status', 'message', 'seconds'}（'stats' に接続数・リクエスト数）
+    """
+    pool = ConnectionPool(HostLimiter(host_connections, host_rate), timeout)
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {}
+
+    async def run(url):
+        async with semaphore:
+            start = time.perf_counter()
+            status, message = await _check_url(pool, url)
+            results[url] = {'status': status, 'message': message, 'seconds': time.perf_counter() - start}
+            count("links_checked", kind="external", result="ok" if not message else "error")
+
+    try:
+        await asyncio.gather(*(run(url) for url in dict.fromkeys(urls)))
+    finally:
+        pool.close()
+    results['stats'] = {'connections': pool.connections, 'requests': pool.requests}
+    return results
+
+
+# --- 既知の問題 ---
+
+def _issue_key(issue: dict) -> tuple:
+    # メッセージには参照先やカードの id が入るので、同じ URL（'#' など）でも別の問題として区別できる
+    return issue['page'], issue['kind'], issue['url'], issue['message']
+
+
+def load_baseline(path: Path = BASELINE_FILE) -> set:
+    """既知の問題を (ページ, 種類, URL, メッセージ) の集合で読み込む（ファイルがなければ空）"""
+    path = Path(path)
+    if not path.exists():
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return {_issue_key(issue) for issue in json.load(f)}
+
+
+def save_baseline(issues: List[dict], path: Path = BASELINE_FILE):
+    """問題のリストを既知の問題として書き出す"""
+    entries = sorted({_issue_key(issue) for issue in issues})
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump([{'page': page, 'kind': kind, 'url': url, 'message': message}
+                   for page, kind, url, message in entries],
+                  f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+# --- 全体 ---
+
+def check_site(root: Path = BASE_DIR, jobs: Optional[int] = None, external: bool = False,
+               host_rate: float = HOST_RATE, host_connections: int = HOST_CONNECTIONS,
+               baseline: Optional[Path] = BASELINE_FILE) -> dict:
+    """
+    サイト全体のリンク・画像を確かめる
+
+    Args:
+        root: サイトのルート（リポジトリのルートまたは dist/）
+        jobs: 解析の並列数（省略時は CPU 数）
+        external: 外部URLも確かめる
+        host_rate: 外部URLのホストごとの1秒あたりのリクエスト数
+        host_connections: 外部URLのホストごとの同時接続数
+        baseline: 既知の問題のファイル（None なら使わない）
+
+    Returns:
+        'pages'（ページ数）, 'refs'（参照数）, 'issues'（既知でない問題のリスト）,
+        'known'（既知の問題のリスト）, 'external'（外部URL → 参照元のリスト）, 'external_stats'
+    """
+    root = Path(root)
+    with span("check_links.collect"):
+        pages = collect_pages(root)
+    paths = [str(root / page) for page in pages]
+    chunks = [paths[i:i + PARSE_CHUNK] for i in range(0, len(paths), PARSE_CHUNK)]
+    with span("check_links.parse"):
+        workers = min(jobs or os.cpu_count() or 1, len(chunks))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parsed = [result for chunk in pool.map(_parse_chunk, chunks) for result in chunk]
+        else:
+            parsed = [result for chunk in chunks for result in _parse_chunk(chunk)]
+    parsed_pages = dict(zip(pages, parsed))
+
+    checker = SiteChecker(root, parsed_pages)
+    issues = []
+    external_refs = {}
+    total = 0
+    with span("check_links.resolve"):
+        for page, (_, refs) in parsed_pages.items():
+            for kind, url, line in refs:
+                total += 1
+                issue = checker.check_ref(page, kind, url, line, external_refs)
+                if issue:
+                    issues.append(issue)
+        issues += check_cards(root)
+    count("links_checked", total - sum(len(refs) for refs in external_refs.values()), kind="internal")
+
+    external_stats = None
+    if external and external_refs:
+        with span("check_links.external"):
+            results = asyncio.run(check_external(list(external_refs), host_connections=host_connections,
+                                                 host_rate=host_rate))
+        external_stats = results.pop('stats')
+        for url, result in results.items():
+            if result['message']:
+                for page, line, kind in external_refs[url]:
+                    issues.append(_issue(page, line, kind, url, result['message']))
+    known_keys = load_baseline(baseline) if baseline else set()
+    known = [issue for issue in issues if _issue_key(issue) in known_keys]
+    issues = [issue for issue in issues if _issue_key(issue) not in known_keys]
+    count("link_issues", len(issues))
+    count("link_issues_known", len(known))
+    return {'pages': len(pages), 'refs': total, 'issues': issues, 'known': known, 'external': external_refs,
+            'external_stats': external_stats}
+
+
+def print_report(result: dict, limit: int = 0):
+    """問題の一覧を表示（limit > 0 なら種類ごとにまとめて最大 limit 件）"""
+    issues = sorted(result['issues'], key=lambda issue: (issue['page'], issue['line'], issue['url']))
+    for issue in issues[:limit or None]:
+        location = f"{issue['page']}:{issue['line']}" if issue['line'] else issue['page']
+        print(f"{location}: [{issue['kind']}] {issue['url'] or '(空)'} — {issue['message']}")
+    if limit and len(issues) > limit:
+        print(f"...ほか {len(issues) - limit}件")
+    known = f"（既知 {len(result['known'])}件は除く）" if result.get('known') else ""
+    print(f"ページ {result['pages']}件、参照 {result['refs']}件（外部URL {len(result['external'])}件）、"
+          f"問題 {len(issues)}件{known}")
+    if result['external_stats']:
+        stats = result['external_stats']
+        print(f"外部URL: リクエスト {stats['requests']}回、接続 {stats['connections']}本")
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="生成したサイトのリンク・画像のチェック")
+    parser.add_argument("root", nargs="?", default=str(BASE_DIR), help="サイトのルート（省略時はリポジトリのルート）")
+    parser.add_argument("--jobs", type=int, help="解析の並列数（省略時は CPU 数）")
+    parser.add_argument("--external", action="store_true", help="外部URLにもリクエストを送って確かめる")
+    parser.add_argument("--host-rate", type=float, default=HOST_RATE,
+                        help=f"外部URLのホストごとの1秒あたりのリクエスト数（既定: {HOST_RATE}、0 で無制限）")
+    parser.add_argument("--host-connections", type=int, default=HOST_CONNECTIONS,
+                        help=f"外部URLのホストごとの同時接続数（既定: {HOST_CONNECTIONS}）")
+    parser.add_argument("--limit", type=int, default=0, help="表示する問題の最大件数")
+    parser.add_argument("--json", help="結果を JSON で書き出すパス")
+    parser.add_argument("--baseline", default=str(BASELINE_FILE),
+                        help="既知の問題のファイル（既定: tools/check_links_baseline.json）")
+    parser.add_argument("--no-baseline", action="store_true", help="既知の問題も含めてすべて表示する")
+    parser.add_argument("--update-baseline", action="store_true", help="今の問題をすべて既知の問題として書き出す")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    baseline = None if args.no_baseline or args.update_baseline else Path(args.baseline)
+    result = check_site(Path(args.root), args.jobs, args.external, args.host_rate, args.host_connections,
+                        baseline=baseline)
+    if args.update_baseline:
+        save_baseline(result['issues'], Path(args.baseline))
+        print(f"💾 既知の問題 {len(result['issues'])}件を {args.baseline} に書き出しました")
+        result['known'], result['issues'] = result['issues'], []
+    print_report(result, args.limit)
+    print(f"所要時間: {time.perf_counter() - start:.2f}s")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    sys.exit(1 if result['issues'] else 0)
+
+
+if __name__ == "__main__":
+    main()
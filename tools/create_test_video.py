@@ -1,107 +1,345 @@
 #!/usr/bin/env python3
 """
-テスト用の簡易動画生成スクリプト
-gTTSの代わりに、無音の音声ファイルを生成してテストします
+動画生成パイプラインのエンドツーエンド・ベンチマーク
+
+ネットワークを使わずに、固定の入力（固定日付の記事HTML・固定周波数の音声）から
+VideoGenerator の各ステージを実際に実行し、ステージごとに次の値を記録します。
+
+- 経過時間（秒）
+- CPU時間（Python と ffmpeg などの子プロセスの合計、秒）
+- 最大メモリ使用量（Python と子プロセスのうち大きい方、KB）
+- 出力のサイズとビットレート（音声・動画のみ）
+
+ステージは1つずつ別プロセスで実行するため、最大メモリ使用量はステージごとの値になります。
+キャッシュ（記事の解析結果・静止画の映像トラック）は一時ディレクトリに置くので、
+'video' は毎回キャッシュなしの状態から計測します（'video_warm' はキャッシュ済みの状態）。
+
+使い方:
+    python tools/create_test_video.py                          # 5秒・1分・10分の音声で計測
+    python tools/create_test_video.py --durations 5 30 --audio wav
+    python tools/create_test_video.py --stages video renditions --repeat 3
+    python tools/create_test_video.py --baseline 基準.json        # 遅くなった項目があれば終了コード 1
+    python tools/create_test_video.py --keep out/                # 生成したファイルを残す
 """
 
+import argparse
+import hashlib
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
 import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from PIL import Image, ImageDraw, ImageFont
-
-# ディレクトリ作成
-video_dir = Path(__file__).parent.parent / "videos"
-audio_dir = Path(__file__).parent.parent / "audio"
-image_dir = Path(__file__).parent.parent / "images"
-
-video_dir.mkdir(exist_ok=True)
-audio_dir.mkdir(exist_ok=True)
-image_dir.mkdir(exist_ok=True)
-
-print("=== テスト用動画生成 ===\n")
-
-# 1. サムネイル画像を生成
-print("1. サムネイル画像を生成...")
-image_path = image_dir / "test.png"
-
-width, height = 1280, 720
-bg_color = (0, 102, 204)
-
-img = Image.new('RGB', (width, height), bg_color)
-draw = ImageDraw.Draw(img)
-
-title_text = "競艇予想 テスト動画"
-date_text = "2026-01-16"
-
-try:
-    font_large = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 80)
-    font_medium = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 50)
-except:
-    font_large = ImageFont.load_default()
-    font_medium = ImageFont.load_default()
-
-# タイトルを中央に配置
-title_bbox = draw.textbbox((0, 0), title_text, font=font_large)
-title_w = title_bbox[2] - title_bbox[0]
-title_x = (width - title_w) // 2
-draw.text((title_x, 200), title_text, fill=(255, 255, 255), font=font_large)
-
-# 日付を配置
-date_bbox = draw.textbbox((0, 0), date_text, font=font_medium)
-date_w = date_bbox[2] - date_bbox[0]
-date_x = (width - date_w) // 2
-draw.text((date_x, 400), date_text, fill=(255, 255, 255), font=font_medium)
-
-img.save(image_path)
-print(f"   ✓ サムネイル生成完了: {image_path}")
-
-# 2. テスト用の無音音声を生成（5秒間）
-print("\n2. テスト用音声を生成（5秒間の無音）...")
-audio_path = audio_dir / "test.mp3"
-
-# ffmpegで5秒間の無音音声を生成
-cmd = [
-    'ffmpeg',
-    '-y',
-    '-f', 'lavfi',
-    '-i', 'anullsrc=r=44100:cl=stereo',
-    '-t', '5',
-    '-q:a', '9',
-    '-acodec', 'libmp3lame',
-    str(audio_path)
-]
-
-result = subprocess.run(cmd, capture_output=True, text=True)
-if result.returncode == 0:
-    print(f"   ✓ 音声生成完了: {audio_path}")
-else:
-    print(f"   ✗ 音声生成エラー: {result.stderr}")
-    exit(1)
-
-# 3. 動画を生成
-print("\n3. 動画を生成...")
-video_path = video_dir / "test.mp4"
-
-cmd = [
-    'ffmpeg',
-    '-y',
-    '-loop', '1',
-    '-i', str(image_path),
-    '-i', str(audio_path),
-    '-c:v', 'libx264',
-    '-c:a', 'aac',
-    '-b:a', '192k',
-    '-shortest',
-    '-pix_fmt', 'yuv420p',
-    '-r', '24',
-    str(video_path)
-]
-
-result = subprocess.run(cmd, capture_output=True, text=True)
-if result.returncode == 0:
-    print(f"   ✓ 動画生成完了: {video_path}")
-    print(f"\n=== 成功！ ===")
-    print(f"動画ファイル: {video_path}")
-    print(f"動画サイズ: {video_path.stat().st_size / 1024:.2f} KB")
-else:
-    print(f"   ✗ 動画生成エラー: {result.stderr}")
-    exit(1)
+from typing import List, Optional
+
+import youtube_video_generator
+from media_config import probe_duration, require_capability
+from youtube_video_generator import JST, VideoGenerator
+
+# 固定の入力
+FIXTURE_DATE = "2026-01-16"
+AUDIO_FREQUENCY = 440
+AUDIO_SAMPLE_RATE = 44100
+
+# 音声の長さ（秒）。5秒〜10分
+DEFAULT_DURATIONS = [5, 60, 600]
+MIN_DURATION = 5
+MAX_DURATION = 600
+
+# ステージ名 → 説明（この順に実行する）
+STAGES = {
+    'extract': "記事HTMLからテキストを抽出",
+    'thumbnail': "サムネイル画像を生成",
+    'audio': "音声ファイルを生成（サイン波）",
+    'video': "動画を生成（静止画キャッシュなし）",
+    'video_warm': "動画を生成（静止画キャッシュあり）",
+    'renditions': "全サイズの動画を1回で生成",
+    'video_full': "動画を生成（毎フレームをエンコード）",
+}
+# 時間がかかるため明示したときだけ実行する
+OPTIONAL_STAGES = ['video_full']
+
+RESULT_FORMAT_VERSION = 1
+
+
+def make_fixture_audio(output_path: Path, duration: float) -> bool:
+    """
+    固定周波数のサイン波の音声を生成（同じ環境なら毎回同じ内容になるよう bitexact を指定）
+
+    Args:
+        output_path: 出力ファイルパス（拡張子が .wav ならPCM、それ以外はMP3）
+        duration: 長さ（秒）
+
+    Returns:
+        成功したかどうか
+    """
+    if output_path.suffix == '.wav':
+        codec_args = ['-c:a', 'pcm_s16le']
+    else:
+        codec_args = ['-c:a', 'libmp3lame', '-b:a', '64k']
+    cmd = [
+        'ffmpeg',
+        '-y',
+        '-f', 'lavfi',
+        '-i', f"sine=frequency={AUDIO_FREQUENCY}:sample_rate={AUDIO_SAMPLE_RATE}:duration={duration}",
+        *codec_args,
+        '-fflags', '+bitexact',
+        '-flags:a', '+bitexact',
+        str(output_path)
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"音声生成エラー: {result.stderr}")
+        return False
+    return True
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def _stage_action(stage: str, generator: VideoGenerator, work_dir: Path, duration: float, audio_format: str):
+    """ステージの処理本体。出力ファイルのリストを返す（失敗時は例外）"""
+    html_path = work_dir / "posts" / f"{FIXTURE_DATE}.html"
+    image_path = work_dir / "images" / f"{FIXTURE_DATE}.png"
+    audio_path = work_dir / "audio" / f"{FIXTURE_DATE}.{audio_format}"
+    video_path = work_dir / "videos" / f"{FIXTURE_DATE}.mp4"
+
+    if stage == 'extract':
+        text_data = generator.extract_text_from_html(html_path)
+        if not text_data['points']:
+            raise RuntimeError("記事から要点を抽出できませんでした")
+        return []
+    if stage == 'thumbnail':
+        text_data = generator.extract_text_from_html(html_path)
+        if not generator.create_thumbnail(text_data['title'], text_data['date'], image_path):
+            raise RuntimeError("サムネイル生成に失敗しました")
+        return [image_path]
+    if stage == 'audio':
+        if not make_fixture_audio(audio_path, duration):
+            raise RuntimeError("音声生成に失敗しました")
+        return [audio_path]
+    if stage in ('video', 'video_warm', 'video_full'):
+        output_path = video_path.with_name(f"{video_path.stem}-{stage}.mp4")
+        if not generator.create_video(image_path, audio_path, output_path, fast=(stage != 'video_full')):
+            raise RuntimeError("動画生成に失敗しました")
+        return [output_path]
+    if stage == 'renditions':
+        outputs = generator.create_renditions(image_path, audio_path, video_path)
+        if outputs is None:
+            raise RuntimeError("動画生成に失敗しました")
+        return list(outputs.values())
+    raise ValueError(f"不明なステージです: {stage}")
+
+
+def _run_stage(stage: str, work_dir: Path, duration: float, audio_format: str,
+               threads: Optional[int]) -> dict:
+    """
+    1つのステージを計測（ステージごとに新しいプロセスで実行される）
+
+    Returns:
+        'wall', 'cpu', 'max_rss_kb', 'outputs'（パスの文字列のリスト）
+    """
+    import post_parser
+
+    # キャッシュを作業ディレクトリに向け、実行環境のキャッシュに左右されないようにする
+    post_parser.POST_CACHE_DIR = work_dir / "cache" / "posts"
+    youtube_video_generator.STILL_TRACK_DIR = work_dir / "cache" / "video_tracks"
+
+    generator = VideoGenerator(threads=threads)
+    generator.video_dir = work_dir / "videos"
+    generator.audio_dir = work_dir / "audio"
+    generator.image_dir = work_dir / "images"
+
+    self_before = resource.getrusage(resource.RUSAGE_SELF)
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    wall_start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull:
+        stdout = sys.stdout
+        sys.stdout = devnull
+        try:
+            outputs = _stage_action(stage, generator, work_dir, duration, audio_format)
+        finally:
+            sys.stdout = stdout
+    wall = time.perf_counter() - wall_start
+    self_after = resource.getrusage(resource.RUSAGE_SELF)
+    children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    cpu = sum(after.ru_utime + after.ru_stime - before.ru_utime - before.ru_stime
+              for before, after in ((self_before, self_after), (children_before, children_after)))
+    # Linux の ru_maxrss は KB 単位（子プロセスの値はこのプロセスが待った子のうち最大のもの）
+    max_rss_kb = max(self_after.ru_maxrss, children_after.ru_maxrss)
+    return {'wall': wall, 'cpu': cpu, 'max_rss_kb': max_rss_kb, 'outputs': [str(p) for p in outputs]}
+
+
+def _process_context():
+    """fork が使えれば fork（起動が速く、計測前の import が済んでいる）"""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+
+
+def measure_stage(stage: str, work_dir: Path, duration: float, audio_format: str,
+                  threads: Optional[int], repeat: int) -> dict:
+    """
+    ステージを repeat 回計測し、経過時間が最小の回の値を返す
+
+    Returns:
+        'seconds'（経過時間）, 'cpu_seconds', 'max_rss_kb', 'runs'（各回の経過時間）,
+        出力があれば 'output_bytes', 'bitrate_kbps', 'digest'
+    """
+    runs = []
+    for _ in range(repeat):
+        if stage == 'video':
+            # 毎回キャッシュなしの状態から計測する
+            shutil.rmtree(work_dir / "cache" / "video_tracks", ignore_errors=True)
+        with ProcessPoolExecutor(max_workers=1, mp_context=_process_context()) as pool:
+            runs.append(pool.submit(_run_stage, stage, work_dir, duration, audio_format, threads).result())
+
+    best = min(runs, key=lambda run: run['wall'])
+    entry = {
+        'seconds': best['wall'],
+        'cpu_seconds': best['cpu'],
+        'max_rss_kb': best['max_rss_kb'],
+        'runs': [run['wall'] for run in runs],
+    }
+    outputs = [Path(p) for p in best['outputs']]
+    if outputs:
+        entry['output_bytes'] = sum(p.stat().st_size for p in outputs)
+        entry['digest'] = _file_digest(outputs[0])
+        media_duration = probe_duration(outputs[0]) if outputs[0].suffix != '.png' else None
+        if media_duration:
+            entry['media_seconds'] = media_duration
+            entry['bitrate_kbps'] = outputs[0].stat().st_size * 8 / media_duration / 1000
+    return entry
+
+
+def prepare_fixture(work_dir: Path):
+    """固定日付の記事HTMLを作業ディレクトリに書き出す"""
+    import generate
+
+    for name in ("posts", "images", "audio", "videos"):
+        (work_dir / name).mkdir(parents=True, exist_ok=True)
+    (work_dir / "posts" / f"{FIXTURE_DATE}.html").write_text(generate.render_post(FIXTURE_DATE), encoding='utf-8')
+
+
+def run_harness(durations: List[float], stages: List[str], audio_format: str = 'mp3',
+                threads: Optional[int] = None, repeat: int = 1, keep_dir: Optional[Path] = None) -> dict:
+    """
+    音声の長さごとに全ステージを計測
+
+    Args:
+        durations: 音声の長さ（秒）のリスト
+        stages: 実行するステージ名（STAGES の順に実行される）
+        audio_format: 'mp3'（動画には音声をコピー）または 'wav'（AAC にエンコード）
+        threads: ffmpeg のスレッド数（省略時は ffmpeg に任せる）
+        repeat: 各ステージの計測回数（経過時間が最小の回を採用）
+        keep_dir: 生成したファイルを残すディレクトリ（省略時は一時ディレクトリを削除）
+
+    Returns:
+        JSON に保存する結果（'results' は「ステージ@長さ」→ 計測値。benchmark.py の compare で比較できる）
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for duration in durations:
+            work_dir = (keep_dir or Path(tmp)) / f"{duration:g}s"
+            prepare_fixture(work_dir)
+            for stage in STAGES:
+                if stage not in stages:
+                    continue
+                name = f"{stage}@{duration:g}s"
+                print(f"{name}: {STAGES[stage]}...", end="", flush=True)
+                entry = measure_stage(stage, work_dir, duration, audio_format, threads, repeat)
+                entry['items'] = 1
+                entry['per_item'] = entry['seconds']
+                results[name] = entry
+                print(f"\r{name}: {entry['seconds']:.2f}s{' ' * 40}")
+
+    return {
+        'version': RESULT_FORMAT_VERSION,
+        'created': datetime.now(JST).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'params': {'durations': durations, 'stages': stages, 'audio': audio_format,
+                   'threads': threads, 'repeat': repeat},
+        'results': results,
+    }
+
+
+def print_results(results: dict):
+    """結果の表を表示"""
+    rows = results['results']
+    width = max(len(name) for name in rows)
+    print(f"\n{'ステージ':<{width - 4}}  {'経過':>8}  {'CPU':>8}  {'最大メモリ':>9}  {'サイズ':>9}  {'ビットレート':>10}")
+    for name, entry in rows.items():
+        size = f"{entry['output_bytes'] / 1024:.0f}KB" if 'output_bytes' in entry else "-"
+        bitrate = f"{entry['bitrate_kbps']:.0f}kbps" if 'bitrate_kbps' in entry else "-"
+        print(f"{name:<{width}}  {entry['seconds']:>7.2f}s  {entry['cpu_seconds']:>7.2f}s"
+              f"  {entry['max_rss_kb'] / 1024:>9.0f}MB  {size:>9}  {bitrate:>14}")
+
+
+def _duration(value: str) -> float:
+    duration = float(value)
+    if not MIN_DURATION <= duration <= MAX_DURATION:
+        raise argparse.ArgumentTypeError(f"{MIN_DURATION}〜{MAX_DURATION} 秒で指定してください")
+    return duration
+
+
+def main():
+    """メイン処理"""
+    from benchmark import (BENCHMARK_DIR, REGRESSION_THRESHOLD, compare_results, load_results,
+                           print_comparison, save_results)
+
+    parser = argparse.ArgumentParser(description="動画生成パイプラインのエンドツーエンド・ベンチマーク")
+    parser.add_argument("--durations", nargs="+", type=_duration, default=DEFAULT_DURATIONS,
+                        help=f"音声の長さ（秒、{MIN_DURATION}〜{MAX_DURATION}。既定: 5 60 600）")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES),
+                        help=f"計測するステージ（既定: {', '.join(OPTIONAL_STAGES)} 以外のすべて）")
+    parser.add_argument("--audio", choices=["mp3", "wav"], default="mp3",
+                        help="音声の形式（wav は動画生成時の AAC エンコードを含めて計測）")
+    parser.add_argument("--threads", type=int, help="ffmpeg のスレッド数")
+    parser.add_argument("--repeat", type=int, default=1, help="各ステージの計測回数（最小値を採用）")
+    parser.add_argument("--keep", type=Path, help="生成したファイルを残すディレクトリ")
+    parser.add_argument("--output", type=Path,
+                        help="結果の保存先（省略時は .cache/benchmarks/pipeline-日時.json）")
+    parser.add_argument("--baseline", type=Path, help="基準の結果と比べる（遅くなったら終了コード 1）")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="劣化とみなす遅くなった割合（既定: 0.10）")
+    args = parser.parse_args()
+
+    if not require_capability('ffmpeg', "ffmpeg") or not require_capability('pil', "Pillow"):
+        sys.exit(1)
+
+    stages = args.stages or [stage for stage in STAGES if stage not in OPTIONAL_STAGES]
+    # 後のステージは前のステージの出力を使う
+    if any(stage in stages for stage in ('video', 'video_warm', 'renditions', 'video_full')):
+        stages = list(dict.fromkeys(['thumbnail', 'audio'] + stages))
+    if 'video_warm' in stages and 'video' not in stages:
+        stages.append('video')
+
+    print("=== 動画生成パイプライン・ベンチマーク ===\n")
+    results = run_harness(args.durations, stages, args.audio, args.threads, args.repeat, args.keep)
+    print_results(results)
+
+    output = args.output or BENCHMARK_DIR / f"pipeline-{datetime.now(JST).strftime('%Y%m%d-%H%M%S')}.json"
+    save_results(results, output)
+    print(f"\n結果を保存しました: {output}")
+
+    if args.baseline:
+        print()
+        if print_comparison(compare_results(load_results(args.baseline), results, args.threshold)):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
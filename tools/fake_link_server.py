@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+ローカル用の外部リンクの代用サーバー
+
+check_links.py の外部URLチェック（接続の使い回し・ホストごとの制限・リダイレクト・
+HEAD に対応しないサーバー）をネットワークなしで試せるようにします。
+
+パス:
+    /status/404        指定したステータスを返す
+    /redirect/3        3回リダイレクトしてから 200 を返す
+    /slow/500          500ミリ秒待ってから 200 を返す
+    /nohead            HEAD には 405、GET には 200 を返す
+    /_stats            受けたリクエスト数・接続数・同時処理数の最大・リクエスト時刻（JSON）
+    それ以外           200
+
+使い方:
+    python tools/fake_link_server.py --port 8766
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeLinkState:
+    """代用サーバーの状態（リクエスト・接続の記録）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = []  # (時刻, メソッド, パス)
+        self.connections = 0
+        self.active = 0
+        self.max_active = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {'requests': len(self.requests), 'connections': self.connections,
+                    'max_active': self.max_active, 'times': [t for t, _, _ in self.requests]}
+
+
+class FakeLinkHandler(BaseHTTPRequestHandler):
+    """外部リンクの代用ハンドラー"""
+
+    protocol_version = "HTTP/1.1"
+    state = None  # make_server() で設定
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.state.lock:
+            self.state.connections += 1
+
+    def _send(self, status: int, body: bytes = b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _handle(self):
+        if self.path == "/_stats":
+            self._send(200, json.dumps(self.state.stats()).encode('utf-8'), {'Content-Type': 'application/json'})
+            return
+        with self.state.lock:
+            self.state.requests.append((time.time(), self.command, self.path))
+            self.state.active += 1
+            self.state.max_active = max(self.state.max_active, self.state.active)
+        try:
+            parts = self.path.split('?')[0].strip('/').split('/')
+            if parts[0] == "status" and len(parts) > 1:
+                self._send(int(parts[1]))
+            elif parts[0] == "redirect" and len(parts) > 1:
+                remaining = int(parts[1])
+                location = f"/redirect/{remaining - 1}" if remaining > 1 else "/"
+                self._send(302, headers={'Location': location})
+            elif parts[0] == "slow" and len(parts) > 1:
+                time.sleep(int(parts[1]) / 1000)
+                self._send(200, b"ok")
+            elif parts[0] == "nohead" and self.command == "HEAD":
+                self._send(405, headers={'Allow': 'GET'})
+            else:
+                self._send(200, b"ok")
+        finally:
+            with self.state.lock:
+                self.state.active -= 1
+
+    do_HEAD = _handle
+    do_GET = _handle
+
+
+def make_server(port: int = 0) -> ThreadingHTTPServer:
+    """
+    代用サーバーを作成（serve_forever() は呼び出し側で実行）
+
+    Args:
+        port: 待ち受けポート（0 なら空きポート）
+
+    Returns:
+        ThreadingHTTPServer（.state に FakeLinkState）
+    """
+    state = FakeLinkState()
+    handler = type('Handler', (FakeLinkHandler,), {'state': state})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.state = state
+    return server
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="外部リンクのローカル代用サーバー")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    server = make_server(args.port)
+    print(f"代用サーバーを起動しました: http://127.0.0.1:{server.server_port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
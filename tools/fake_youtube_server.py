@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+ローカル用の YouTube アップロードAPIの代用サーバー
+
+resumable upload プロトコル（セッション開始・チャンク受信・308応答・状態確認）を
+最低限実装し、アップロード処理をネットワークなしで試せるようにします。
+一定の確率で 503 を返したり接続を切ったりして、再試行・再開の動作も確認できます。
+
+使い方:
+    python tools/fake_youtube_server.py --port 8765 --fail-rate 0.2
+    YOUTUBE_UPLOAD_URL=http://127.0.0.1:8765/upload/youtube/v3/videos \\
+        python tools/youtube_video_generator.py
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+UPLOAD_PATH = "/upload/youtube/v3/videos"
+SESSION_PATH = "/upload/sessions/"
+
+
+class FakeYouTubeState:
+    """代用サーバーの状態（セッションと完了した動画）"""
+
+    def __init__(self, fail_rate: float = 0.0, drop_rate: float = 0.0, seed=None):
+        self.fail_rate = fail_rate
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.sessions = {}  # セッションID → {'size', 'metadata', 'data'}
+        self.videos = {}  # 動画ID → {'metadata', 'size'}
+        self.requests = 0
+
+    def roll(self, rate: float) -> bool:
+        with self.lock:
+            return rate > 0 and self.random.random() < rate
+
+
+class FakeYouTubeHandler(BaseHTTPRequestHandler):
+    """resumable upload プロトコルのハンドラー"""
+
+    protocol_version = "HTTP/1.1"
+    state = None  # make_server() で設定
+
+    def log_message(self, format, *args):
+        pass  # 標準エラー出力を汚さない
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status: int, body: bytes = b"", headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _inject_failure(self) -> bool:
+        """設定に応じて 503 を返すか接続を切る"""
+        with self.state.lock:
+            self.state.requests += 1
+        if self.state.roll(self.state.drop_rate):
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return True
+        if self.state.roll(self.state.fail_rate):
+            self._send(503, b'{"error": "backendError"}', {'Content-Type': 'application/json'})
+            return True
+        return False
+
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        body = self._read_body()
+        if parts.path != UPLOAD_PATH or parse_qs(parts.query).get('uploadType') != ['resumable']:
+            self._send(404)
+            return
+        if not self.headers.get('Authorization', "").startswith("Bearer "):
+            self._send(401)
+            return
+        if self._inject_failure():
+            return
+
+        session_id = uuid.uuid4().hex
+        with self.state.lock:
+            self.state.sessions[session_id] = {
+                'size': int(self.headers.get('X-Upload-Content-Length') or 0),
+                'metadata': json.loads(body or b"{}"),
+                'data': bytearray(),
+            }
+        host = self.headers.get('Host', f"127.0.0.1:{self.server.server_port}")
+        self._send(200, headers={'Location': f"http://{host}{SESSION_PATH}{session_id}"})
+
+    def do_PUT(self):
+        parts = urlsplit(self.path)
+        body = self._read_body()
+        session_id = parts.path[len(SESSION_PATH):] if parts.path.startswith(SESSION_PATH) else None
+        with self.state.lock:
+            session = self.state.sessions.get(session_id)
+        if session is None:
+            self._send(404)
+            return
+        if self._inject_failure():
+            return
+
+        content_range = self.headers.get('Content-Range', "")
+        match = re.match(r'bytes (\d+)-(\d+)/(\d+)', content_range)
+        if match:
+            start, end = int(match.group(1)), int(match.group(2))
+            with self.state.lock:
+                received = len(session['data'])
+                if start > received:
+                    self._send(400, b"gap in upload")
+                    return
+                # 既に受信済みの部分が重なっていれば切り捨てる
+                session['data'][start:end + 1] = body
+        elif not re.match(r'bytes \*/(\d+)', content_range):
+            self._send(400, b"bad Content-Range")
+            return
+
+        with self.state.lock:
+            received = len(session['data'])
+            if received >= session['size']:
+                video_id = uuid.uuid4().hex[:11]
+                self.state.videos[video_id] = {'metadata': session['metadata'], 'size': received}
+                del self.state.sessions[session_id]
+                response = dict(session['metadata'], id=video_id, kind="youtube#video")
+                self._send(200, json.dumps(response).encode('utf-8'),
+                           {'Content-Type': 'application/json'})
+                return
+
+        headers = {'Range': f"bytes=0-{received - 1}"} if received else {}
+        self._send(308, headers=headers)
+
+
+def make_server(port: int = 0, fail_rate: float = 0.0, drop_rate: float = 0.0,
+                seed=None) -> ThreadingHTTPServer:
+    """
+    代用サーバーを作成（serve_forever() は呼び出し側で実行）
+
+    Args:
+        port: 待ち受けポート（0 なら空きポート）
+        fail_rate: 503 を返す確率
+        drop_rate: 応答せずに接続を切る確率
+        seed: 乱数のシード
+
+    Returns:
+        ThreadingHTTPServer（.state に FakeYouTubeState）
+    """
+    state = FakeYouTubeState(fail_rate, drop_rate, seed)
+    handler = type('Handler', (FakeYouTubeHandler,), {'state': state})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.state = state
+    return server
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="YouTube アップロードAPIのローカル代用サーバー")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="503 を返す確率")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="接続を切る確率")
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.fail_rate, args.drop_rate)
+    print(f"代用サーバーを起動しました: http://127.0.0.1:{server.server_port}{UPLOAD_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
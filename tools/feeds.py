@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+サイトマップ・フィード生成スクリプト
+
+記事・ページ・カードの一覧を site_manifest.json に記録しておき、実行のたびに
+新しく増えた記事（と指定された記事）・ページ・カードだけを読んで差分を反映します。
+lastmod（更新日時）は内容のハッシュが変わったときだけ更新します。
+
+出力:
+    sitemap.xml             サイトマップ（SITEMAP_MAX_URLS を超えたらサイトマップインデックス）
+    sitemaps/sitemap-N.xml  分割したサイトマップ（変更のあった分だけ書き直す）
+    feed.xml / rss.xml      記事の Atom / RSS フィード（新しい順に FEED_ENTRIES 件）
+    creditcard/feed.xml     カードの追加・変更の Atom フィード
+
+サイトマップとフィードには絶対URLが必要です。公開URLは環境変数 SITE_URL、
+GitHub Actions では GITHUB_REPOSITORY（GitHub Pages のURL）から決め、site_manifest.json にも記録します。
+
+使い方:
+    SITE_URL=https://example.github.io/kyotei-picks/ python tools/feeds.py
+    python tools/feeds.py --rescan     # 既存の記事も読み直して、手で編集された記事の lastmod を更新
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from pathlib import Path
+from typing import Iterable, List, Optional
+from urllib.parse import quote
+from xml.sax.saxutils import escape, quoteattr
+
+from tracing import count, span
+
+# 設定
+JST = timezone(timedelta(hours=9))
+BASE_DIR = Path(__file__).parent.parent
+MANIFEST_FILE = BASE_DIR / "site_manifest.json"
+POSTS_DIR = "posts"
+CARDS_JSON = "creditcard/cards.json"
+# 記事以外でサイトマップに載せるページ
+PAGES = ["index.html", "creditcard/index.html", "search.html"]
+
+SITEMAP_FILE = "sitemap.xml"
+SITEMAP_SHARD_DIR = "sitemaps"
+# サイトマップ1ファイルあたりの URL 数の上限（sitemaps.org の制限）
+SITEMAP_MAX_URLS = 50000
+
+ATOM_FILE = "feed.xml"
+RSS_FILE = "rss.xml"
+CARD_FEED_FILE = "creditcard/feed.xml"
+FEED_ENTRIES = 20
+
+SITE_TITLE = "競艇予想まとめ（自動更新）"
+SITE_DESCRIPTION = "競艇予想の記事を毎日自動で更新しています。"
+CARD_SITE_TITLE = "クレジットカード比較ナビ"
+
+# manifest の形式を変えたら上げる（出力をすべて作り直す）
+MANIFEST_VERSION = 1
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _write_atomic(path: Path, text: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_bytes(text.encode('utf-8'))
+    os.replace(tmp_path, path)
+    count("bytes_written", len(text.encode('utf-8')), kind="feed")
+
+
+def site_url(manifest: Optional[dict] = None) -> Optional[str]:
+    """
+    サイトの公開URL（末尾は /）
+
+    Args:
+        manifest: 前回の manifest（環境変数がなければ記録済みのURLを使う）
+
+    Returns:
+        URL。決められなければ None
+    """
+    url = os.environ.get('SITE_URL')
+    if not url and os.environ.get('GITHUB_REPOSITORY'):
+        owner, _, repo = os.environ['GITHUB_REPOSITORY'].partition('/')
+        host = f"{owner.lower()}.github.io"
+        url = f"https://{host}/" if repo.lower() == host else f"https://{host}/{repo}/"
+    if not url and manifest:
+        url = manifest.get('site_url')
+    if not url:
+        return None
+    return url if url.endswith('/') else url + '/'
+
+
+def feeds_enabled(base_dir: Path = BASE_DIR) -> bool:
+    """update_feeds() がフィードを書き出すか（公開URLが決められるか）。ページの <link> の出し分けに使う"""
+    return site_url(load_manifest(Path(base_dir) / MANIFEST_FILE.name)) is not None
+
+
+def page_url(base_url: str, rel_path: str) -> str:
+    """リポジトリからの相対パスの公開URL（index.html はディレクトリのURLにする）"""
+    if rel_path == "index.html" or rel_path.endswith("/index.html"):
+        rel_path = rel_path[:-len("index.html")]
+    return base_url + quote(rel_path)
+
+
+def load_manifest(path: Path = MANIFEST_FILE) -> dict:
+    """前回の manifest を読み込み（形式が違えば空）"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if manifest.get('version') == MANIFEST_VERSION else {}
+
+
+def save_manifest(manifest: dict, path: Path = MANIFEST_FILE):
+    """manifest を保存（記事・カードは1件1行にして、毎日の差分が追加の行だけになるようにする）"""
+    def dumps(value) -> str:
+        return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+    fields = []
+    for key in sorted(manifest):
+        value = manifest[key]
+        if isinstance(value, dict) and value:
+            items = ",\n".join(f"    {dumps(name)}: {dumps(value[name])}" for name in sorted(value))
+            fields.append(f"  {dumps(key)}: {{\n{items}\n  }}")
+        else:
+            fields.append(f"  {dumps(key)}: {dumps(value)}")
+    _write_atomic(path, "{\n" + ",\n".join(fields) + "\n}\n")
+
+
+# --- XML ---
+
+def render_urlset(base_url: str, entries: List[tuple]) -> str:
+    """サイトマップ（entries は (相対パス, lastmod) のリスト）"""
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for rel_path, lastmod in entries:
+        lines.append(f"  <url><loc>{escape(page_url(base_url, rel_path))}</loc>"
+                     f"<lastmod>{lastmod}</lastmod></url>")
+    lines.append('</urlset>')
+    return "\n".join(lines) + "\n"
+
+
+def render_sitemap_index(base_url: str, shards: List[tuple]) -> str:
+    """サイトマップインデックス（shards は (相対パス, lastmod) のリスト）"""
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for rel_path, lastmod in shards:
+        lines.append(f"  <sitemap><loc>{escape(base_url + rel_path)}</loc>"
+                     f"<lastmod>{lastmod}</lastmod></sitemap>")
+    lines.append('</sitemapindex>')
+    return "\n".join(lines) + "\n"
+
+
+def render_atom(title: str, base_url: str, feed_path: str, home_path: str, items: List[dict]) -> str:
+    """
+    Atom フィード
+
+    Args:
+        title: フィードのタイトル
+        base_url: サイトの公開URL
+        feed_path: フィード自身の相対パス
+        home_path: フィードが表すページの相対パス
+        items: 'id', 'link', 'title', 'summary', 'published', 'updated' を持つ辞書（新しい順）
+    """
+    updated = max((item['updated'] for item in items), default=datetime.now(JST).isoformat(timespec='seconds'))
+    lines = [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<feed xmlns="http://www.w3.org/2005/Atom" xml:lang="ja">',
+        f"  <title>{escape(title)}</title>",
+        f"  <link href={quoteattr(page_url(base_url, home_path))} rel=\"alternate\" type=\"text/html\"/>",
+        f"  <link href={quoteattr(base_url + feed_path)} rel=\"self\" type=\"application/atom+xml\"/>",
+        f"  <id>{escape(page_url(base_url, home_path))}</id>",
+        f"  <updated>{updated}</updated>",
+        f"  <author><name>{escape(title)}</name></author>",
+    ]
+    for item in items:
+        lines += [
+            "  <entry>",
+            f"    <title>{escape(item['title'])}</title>",
+            f"    <link href={quoteattr(item['link'])} rel=\"alternate\" type=\"text/html\"/>",
+            f"    <id>{escape(item['id'])}</id>",
+            f"    <published>{item['published']}</published>",
+            f"    <updated>{item['updated']}</updated>",
+            f"    <summary>{escape(item['summary'])}</summary>",
+            "  </entry>",
+        ]
+    lines.append('</feed>')
+    return "\n".join(lines) + "\n"
+
+
+def render_rss(title: str, description: str, base_url: str, feed_path: str, items: List[dict]) -> str:
+    """RSS 2.0 フィード（items は render_atom() と同じ）"""
+    def rfc822(value: str) -> str:
+        return format_datetime(datetime.fromisoformat(value))
+
+    updated = max((item['updated'] for item in items), default=datetime.now(JST).isoformat(timespec='seconds'))
+    lines = [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom">',
+        "  <channel>",
+        f"    <title>{escape(title)}</title>",
+        f"    <link>{escape(base_url)}</link>",
+        f"    <description>{escape(description)}</description>",
+        "    <language>ja</language>",
+        f"    <lastBuildDate>{rfc822(updated)}</lastBuildDate>",
+        f"    <atom:link href={quoteattr(base_url + feed_path)} rel=\"self\" type=\"application/rss+xml\"/>",
+    ]
+    for item in items:
+        lines += [
+            "    <item>",
+            f"      <title>{escape(item['title'])}</title>",
+            f"      <link>{escape(item['link'])}</link>",
+            f"      <guid isPermaLink=\"true\">{escape(item['id'])}</guid>",
+            f"      <pubDate>{rfc822(item['published'])}</pubDate>",
+            f"      <description>{escape(item['summary'])}</description>",
+            "    </item>",
+        ]
+    lines += ["  </channel>", "</rss>"]
+    return "\n".join(lines) + "\n"
+
+
+# --- 差分の反映 ---
+#
+# manifest['entries'] は {相対パス: [seq, ハッシュ, lastmod]}、manifest['cards'] は
+# {カード ID: [ハッシュ, 公開日時, 更新日時]}。記事のタイトルと要約はフィードに載っている分だけ
+# manifest['feed'] に持つ（記事が増えても manifest が大きくならないように）
+
+
+def _post_published(rel_path: str, lastmod: str) -> str:
+    """記事の公開日時（ファイル名の日付の0時。ただし最初に見つけた日時より後にはしない）"""
+    try:
+        published = datetime.fromisoformat(Path(rel_path).stem).replace(tzinfo=JST).isoformat()
+    except ValueError:
+        return lastmod
+    return min(published, lastmod)
+
+
+def _post_info(path: Path) -> dict:
+    """記事のタイトルと要約（フィード用）"""
+    from post_parser import parse_post
+
+    post = parse_post(path)
+    return {'title': post['title'] or path.stem, 'summary': " ".join(post['points'])}
+
+
+def _scan(manifest: dict, base_dir: Path, changed: Iterable[str], rescan: bool, now: str) -> dict:
+    """
+    記事・ページ・カードの変更を manifest に反映
+
+    Returns:
+        'pages'（変更のあった記事・ページの seq）, 'posts'（内容が変わった記事の相対パス）,
+        'posts_changed'（記事の増減・変更があったか）, 'cards'（変更のあったカード ID）,
+        'card_data'（cards.json のカード）
+    """
+    entries = manifest.setdefault('entries', {})
+    cards = manifest.setdefault('cards', {})
+    dirty = {'pages': set(), 'posts': set(), 'posts_changed': False, 'cards': set(), 'card_data': {}}
+
+    def update(rel_path: str, data: bytes, first_seen: str):
+        digest = _digest(data)
+        entry = entries.get(rel_path)
+        if entry and entry[1] == digest:
+            return
+        if entry is None:
+            entry = entries[rel_path] = [manifest.get('next_seq', 0), digest, first_seen]
+            manifest['next_seq'] = entry[0] + 1
+            count("feed_entries", kind="added")
+        else:
+            entry[1:] = [digest, now]
+            count("feed_entries", kind="updated")
+        dirty['pages'].add(entry[0])
+        if rel_path.startswith(f"{POSTS_DIR}/"):
+            dirty['posts'].add(rel_path)
+            dirty['posts_changed'] = True
+
+    def remove(rel_path: str):
+        dirty['pages'].add(entries.pop(rel_path)[0])
+        if rel_path.startswith(f"{POSTS_DIR}/"):
+            dirty['posts_changed'] = True
+        count("feed_entries", kind="removed")
+
+    for rel_path in PAGES:
+        path = base_dir / rel_path
+        if path.exists():
+            update(rel_path, path.read_bytes(), now)
+        elif rel_path in entries:
+            remove(rel_path)
+
+    # 記事はファイル名の一覧だけを見て、増えたもの・指定されたものだけを読む
+    posts_dir = base_dir / POSTS_DIR
+    names = {name for name in os.listdir(posts_dir) if name.endswith(".html")} if posts_dir.is_dir() else set()
+    known = {rel_path[len(POSTS_DIR) + 1:] for rel_path in entries if rel_path.startswith(f"{POSTS_DIR}/")}
+    to_read = names - known
+    to_read |= names if rescan else {Path(rel_path).name for rel_path in changed
+                                     if Path(rel_path).parent.name == POSTS_DIR} & names
+    for name in sorted(to_read):
+        rel_path = f"{POSTS_DIR}/{name}"
+        # 新しい記事の lastmod は公開日時（ファイル名の日付）
+        update(rel_path, (posts_dir / name).read_bytes(), _post_published(rel_path, now))
+    for name in sorted(known - names):
+        remove(f"{POSTS_DIR}/{name}")
+
+    cards_path = base_dir / CARDS_JSON
+    if cards_path.exists():
+        with open(cards_path, 'r', encoding='utf-8') as f:
+            dirty['card_data'] = {card['id']: card for card in json.load(f) if card.get('id')}
+    for card_id, card in dirty['card_data'].items():
+        digest = _digest(json.dumps(card, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+        entry = cards.get(card_id)
+        if entry and entry[0] == digest:
+            continue
+        cards[card_id] = [digest, entry[1] if entry else now, now]
+        dirty['cards'].add(card_id)
+    for card_id in set(cards) - set(dirty['card_data']):
+        del cards[card_id]
+        dirty['cards'].add(card_id)
+    return dirty
+
+
+def _write_sitemaps(manifest: dict, base_dir: Path, base_url: str, dirty_seqs: set, rebuild: bool,
+                    max_urls: int) -> List[str]:
+    """変更のあった分割だけサイトマップを書き直す（書いたファイルの相対パスを返す）"""
+    entries = manifest['entries']
+    sitemap = manifest.setdefault('sitemap', {})
+    shard_count = max((entry[0] for entry in entries.values()), default=0) // max_urls + 1
+    split = shard_count > 1
+    # 分割の有無や上限が変わったら全部書き直す
+    if sitemap.get('max_urls') != max_urls or sitemap.get('split') != split:
+        rebuild = True
+    dirty_shards = set(range(shard_count)) if rebuild else {seq // max_urls for seq in dirty_seqs}
+    if not split and not (base_dir / SITEMAP_FILE).exists():
+        dirty_shards.add(0)
+    if split:
+        dirty_shards |= {n for n in range(shard_count)
+                         if not (base_dir / SITEMAP_SHARD_DIR / f"sitemap-{n + 1}.xml").exists()}
+    if not dirty_shards:
+        return []
+
+    shard_entries = {n: [] for n in dirty_shards}
+    for rel_path, (seq, _, lastmod) in entries.items():
+        n = seq // max_urls
+        if n in shard_entries:
+            shard_entries[n].append((seq, rel_path, lastmod))
+
+    written = []
+    lastmods = dict(sitemap.get('shards', {}))
+    for n, items in sorted(shard_entries.items()):
+        items.sort()
+        urls = [(rel_path, lastmod) for _, rel_path, lastmod in items]
+        if not split:
+            _write_atomic(base_dir / SITEMAP_FILE, render_urlset(base_url, urls))
+            written.append(SITEMAP_FILE)
+            continue
+        rel_path = f"{SITEMAP_SHARD_DIR}/sitemap-{n + 1}.xml"
+        if urls:
+            _write_atomic(base_dir / rel_path, render_urlset(base_url, urls))
+            lastmods[str(n)] = max(lastmod for _, lastmod in urls)
+            written.append(rel_path)
+        else:
+            (base_dir / rel_path).unlink(missing_ok=True)
+            lastmods.pop(str(n), None)
+
+    if split:
+        shards = [(f"{SITEMAP_SHARD_DIR}/sitemap-{int(n) + 1}.xml", lastmod)
+                  for n, lastmod in sorted(lastmods.items(), key=lambda item: int(item[0]))]
+        _write_atomic(base_dir / SITEMAP_FILE, render_sitemap_index(base_url, shards))
+        written.append(SITEMAP_FILE)
+    else:
+        lastmods = {}
+        for path in (base_dir / SITEMAP_SHARD_DIR).glob("sitemap-*.xml"):
+            path.unlink()
+    manifest['sitemap'] = {'max_urls': max_urls, 'split': split, 'shards': lastmods}
+    return written
+
+
+def _write_feeds(manifest: dict, base_dir: Path, base_url: str, dirty: dict, rebuild: bool) -> List[str]:
+    """記事・カードのフィードを書き直す（書いたファイルの相対パスを返す）"""
+    written = []
+    if rebuild or dirty['posts_changed'] or not (base_dir / ATOM_FILE).exists() \
+            or not (base_dir / RSS_FILE).exists():
+        def published(item):
+            rel_path, (seq, _, lastmod) = item
+            return _post_published(rel_path, lastmod), seq
+
+        latest = heapq.nlargest(FEED_ENTRIES, ((rel_path, entry) for rel_path, entry in manifest['entries'].items()
+                                              if rel_path.startswith(f"{POSTS_DIR}/")), key=published)
+        # タイトルと要約は、フィードに新しく載る記事と内容が変わった記事だけ読み直す
+        cached = {} if rebuild else manifest.get('feed', {})
+        feed = {}
+        for rel_path, _ in latest:
+            info = cached.get(rel_path)
+            feed[rel_path] = _post_info(base_dir / rel_path) if info is None or rel_path in dirty['posts'] else info
+        manifest['feed'] = feed
+        items = [{'id': page_url(base_url, rel_path), 'link': page_url(base_url, rel_path),
+                  'title': feed[rel_path]['title'], 'summary': feed[rel_path]['summary'],
+                  'published': published((rel_path, entry))[0], 'updated': entry[2]} for rel_path, entry in latest]
+        _write_atomic(base_dir / ATOM_FILE, render_atom(SITE_TITLE, base_url, ATOM_FILE, "index.html", items))
+        _write_atomic(base_dir / RSS_FILE, render_rss(SITE_TITLE, SITE_DESCRIPTION, base_url, RSS_FILE, items))
+        written += [ATOM_FILE, RSS_FILE]
+
+    if rebuild or dirty['cards'] or not (base_dir / CARD_FEED_FILE).exists():
+        page = "creditcard/index.html"
+        latest = heapq.nlargest(FEED_ENTRIES, manifest['cards'].items(), key=lambda item: (item[1][2], item[0]))
+        items = []
+        for card_id, (_, card_published, card_updated) in latest:
+            card = dirty['card_data'].get(card_id, {})
+            items.append({'id': f"{page_url(base_url, page)}#card-{card_id}",
+                          'link': f"{page_url(base_url, page)}#card-{card_id}",
+                          'title': card.get('name', card_id),
+                          'summary': f"還元率 {card.get('return_rate', '-')}・年会費 {card.get('annual_fee', '-')}",
+                          'published': card_published, 'updated': card_updated})
+        _write_atomic(base_dir / CARD_FEED_FILE, render_atom(CARD_SITE_TITLE, base_url, CARD_FEED_FILE, page, items))
+        written.append(CARD_FEED_FILE)
+    return written
+
+
+def update_feeds(base_dir: Path = BASE_DIR, changed: Iterable[str] = (), rescan: bool = False,
+                 max_urls: int = SITEMAP_MAX_URLS, now: Optional[datetime] = None,
+                 manifest_path: Optional[Path] = None) -> Optional[dict]:
+    """
+    サイトマップとフィードを差分で更新
+
+    Args:
+        base_dir: サイトのルート
+        changed: 内容が変わった可能性のある記事（リポジトリからの相対パス）。新しい記事は指定しなくても拾う
+        rescan: 既存の記事もすべて読み直す
+        max_urls: サイトマップ1ファイルあたりの URL 数の上限
+        now: 更新日時（省略時は現在時刻）
+        manifest_path: manifest のパス（省略時は base_dir/site_manifest.json）
+
+    Returns:
+        'entries'（記事・ページ数）, 'cards', 'written'（書き直したファイル）。公開URLが決められなければ None
+    """
+    base_dir = Path(base_dir)
+    manifest_path = manifest_path or base_dir / MANIFEST_FILE.name
+    with span("feeds.load_manifest"):
+        manifest = load_manifest(manifest_path)
+    base_url = site_url(manifest)
+    if base_url is None:
+        print("サイトマップ・フィード: 公開URLが不明なため省略します（環境変数 SITE_URL を指定してください）")
+        return None
+
+    rebuild = not manifest or manifest.get('site_url') != base_url
+    if rebuild:
+        manifest = dict(manifest, version=MANIFEST_VERSION, site_url=base_url)
+    timestamp = (now or datetime.now(JST)).astimezone(JST).replace(microsecond=0).isoformat()
+
+    with span("feeds.scan"):
+        dirty = _scan(manifest, base_dir, changed, rescan, timestamp)
+    with span("feeds.sitemap"):
+        written = _write_sitemaps(manifest, base_dir, base_url, dirty['pages'], rebuild, max_urls)
+    with span("feeds.feed"):
+        written += _write_feeds(manifest, base_dir, base_url, dirty, rebuild)
+
+    if written or dirty['pages'] or dirty['cards'] or rebuild:
+        save_manifest(manifest, manifest_path)
+    return {'entries': len(manifest['entries']), 'cards': len(manifest['cards']), 'written': written}
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="サイトマップとフィードを差分で更新")
+    parser.add_argument("changed", nargs="*", help="内容が変わった記事（posts/YYYY-MM-DD.html）")
+    parser.add_argument("--rescan", action="store_true", help="既存の記事もすべて読み直す")
+    args = parser.parse_args()
+
+    result = update_feeds(changed=args.changed, rescan=args.rescan)
+    if result is None:
+        sys.exit(1)
+    print(f"記事・ページ {result['entries']}件、カード {result['cards']}件")
+    print(f"書き込み: {', '.join(result['written']) or 'なし'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,11 @@ from datetime import datetime, timezone, timedelta
 from pathlib import Path
 import re
 
+from tracing import count, span, traced
+
 JST = timezone(timedelta(hours=9))
 SITE_TITLE = "競艇予想まとめ（自動更新）"
-BASE_URL = "./"  # GitHub Pagesのプロジェクト配下想定
+BASE_URL = "../"  # 記事は posts/ に置くので、トップへは1つ上を指す
 
 DISCLAIMER = (
     "本ページの内容は、公開情報や一般的傾向にもとづく整理・見解であり、的中を保証するものではありません。"
@@ -14,7 +16,7 @@ DISCLAIMER = (
 def today_str():
     return datetime.now(JST).strftime("%Y-%m-%d")
 
-def render_post(date_s: str) -> str:
+def render_post(date_s: str, odds_favorites: dict = None, feed: bool = False) -> str:
     title = f"{date_s}｜競艇テンプレ（自動更新テスト）"
     points = [
         "この記事は自動更新の動作確認用テンプレです（後で実データ連携に置き換え可能）。",
@@ -26,13 +28,31 @@ def render_post(date_s: str) -> str:
     li_points = "\n".join([f"<li>{p}</li>" for p in points])
     li_bets = "\n".join([f"<li>{b}</li>" for b in bets])
 
+    # オッズの記録があれば、レースごとの人気上位（tools/odds_store.py の最新オッズ）
+    odds_section = ""
+    if odds_favorites:
+        li_odds = "\n".join([
+            f"<li>{race}：" + "、".join(f"{combination}（{value:.1f}倍）" for combination, value in favorites) + "</li>"
+            for race, favorites in odds_favorites.items() if favorites
+        ])
+        odds_section = f"""
+    <h3 style="margin:14px 0 8px;font-size:16px;">最新オッズの人気上位</h3>
+    <ul>
+      {li_odds}
+    </ul>
+"""
+
+    # フィードを書き出すとき（公開URLが分かるとき）だけ参照する
+    feed_link = f"""
+  <link rel="alternate" type="application/atom+xml" title="{SITE_TITLE}" href="../feed.xml" />""" if feed else ""
+
     return f"""<!doctype html>
 <html lang="ja">
 <head>
   <meta charset="utf-8" />
   <meta name="viewport" content="width=device-width,initial-scale=1" />
   <title>{title}</title>
-  <meta name="description" content="競艇予想のテンプレ記事（自動更新テスト）。的中保証なし。" />
+  <meta name="description" content="競艇予想のテンプレ記事（自動更新テスト）。的中保証なし。" />{feed_link}
   <style>
     body{{font-family:system-ui,-apple-system,Segoe UI,Roboto,Helvetica,Arial,sans-serif;max-width:860px;margin:0 auto;padding:18px;line-height:1.7}}
     header{{padding:14px 0;border-bottom:1px solid #ddd;margin-bottom:16px}}
@@ -59,13 +79,14 @@ def render_post(date_s: str) -> str:
     <ul>
       {li_bets}
     </ul>
-
+{odds_section}
     <div class="muted" style="margin-top:10px;">免責：{DISCLAIMER}</div>
   </div>
 </body>
 </html>
 """
 
+@traced("generate.update_index")
 def update_index(post_rel_path: str, date_s: str):
     index_path = Path("index.html")
     if not index_path.exists():
@@ -90,11 +111,27 @@ def update_index(post_rel_path: str, date_s: str):
     # すでに同日記事がリンクされてたら何もしない
     if post_rel_path in html:
         index_path.write_text(html, encoding="utf-8")
+        count("files_skipped", kind="index")
         return
 
     new_li = f'      <li><a href="{post_rel_path}">{date_s} の記事</a></li>\n      {marker}'
     html = html.replace(marker, new_li, 1)
-    index_path.write_text(html, encoding="utf-8")
+    count("bytes_written", index_path.write_bytes(html.encode("utf-8")), kind="index")
+
+# トップページはクレジットカード比較ナビの見た目なので、フィード名はページの「最新記事」欄に合わせる
+INDEX_FEED_LINK = '<link rel="alternate" type="application/atom+xml" title="クレジットカード比較ナビ 最新記事" href="feed.xml">'
+FEED_LINK_PATTERN = re.compile(r'\n?[ \t]*<link rel="alternate" type="application/atom\+xml"[^>]*>')
+
+def update_feed_link(enabled: bool, index_path: Path = Path("index.html")):
+    """トップページの <head> のフィードへのリンクを、フィードを書き出すかどうかに合わせる"""
+    if not index_path.exists():
+        return
+    html = index_path.read_text(encoding="utf-8")
+    updated = FEED_LINK_PATTERN.sub("", html)
+    if enabled:
+        updated = updated.replace("</head>", f"    {INDEX_FEED_LINK}\n</head>", 1)
+    if updated != html:
+        count("bytes_written", index_path.write_bytes(updated.encode("utf-8")), kind="index")
 
 def main():
     date_s = today_str()
@@ -105,11 +142,25 @@ def main():
     post_path = posts_dir / post_name
     post_rel = f"posts/{post_name}"
 
+    from feeds import feeds_enabled, update_feeds
+    feed = feeds_enabled()
+
     # 同日記事が既にあれば作らない（安全）
     if not post_path.exists():
-        post_path.write_text(render_post(date_s), encoding="utf-8")
+        from odds_store import OddsStore
+        with span("generate.render_post"):
+            html = render_post(date_s, OddsStore().favorites(date_s), feed)
+        count("bytes_written", post_path.write_bytes(html.encode("utf-8")), kind="post")
+    else:
+        count("files_skipped", kind="post")
 
     update_index(post_rel, date_s)
+    update_feed_link(feed)
+
+    # 全文検索インデックスとサイトマップ・フィード（新しい記事だけ追記。フィードは公開URLが分かるときだけ）
+    from search_index import update_index as update_search_index
+    update_search_index()
+    update_feeds(changed=[post_rel])
 
 if __name__ == "__main__":
     main()
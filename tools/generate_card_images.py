@@ -6,9 +6,13 @@
 """
 
 from PIL import Image, ImageDraw, ImageFont
+from io import BytesIO
 from pathlib import Path
 import json
 
+from asset_store import write_asset
+from tracing import span, traced
+
 # 設定
 BASE_DIR = Path(__file__).parent.parent
 CREDIT_DIR = BASE_DIR / "creditcard"
@@ -16,6 +20,7 @@ IMAGES_DIR = CREDIT_DIR / "images"
 CARDS_JSON = CREDIT_DIR / "cards.json"
 
 
+@traced("card_image")
 def create_card_image(card_data: dict, output_path: Path):
     """クレジットカード画像を生成"""
     # カードサイズ（横長）
@@ -108,8 +113,11 @@ def create_card_image(card_data: dict, output_path: Path):
     output = Image.new('RGBA', (width, height), (0, 0, 0, 0))
     output.paste(img, (0, 0), mask)
 
-    # 保存
-    output.save(output_path, 'PNG')
+    # 保存（アセットストア経由で creditcard/images と images の両方に配置）
+    buffer = BytesIO()
+    with span("card_image.encode"):
+        output.save(buffer, 'PNG')
+    write_asset(output_path, buffer.getvalue())
     print(f"✓ 生成: {output_path.name}")
 
 
@@ -10,6 +10,8 @@ from pathlib import Path
 import json
 from typing import List, Dict
 
+from tracing import count, traced
+
 # 設定
 JST = timezone(timedelta(hours=9))
 BASE_DIR = Path(__file__).parent.parent
@@ -24,6 +26,7 @@ class CreditCardData:
         self.cards = []
         self.load_cards()
 
+    @traced("creditcard.load_cards")
     def load_cards(self):
         """カード情報をJSONから読み込み"""
         if CARDS_JSON.exists():
@@ -34,11 +37,13 @@ class CreditCardData:
             self.cards = self.get_default_cards()
             self.save_cards()
 
+    @traced("creditcard.save_cards")
     def save_cards(self):
-        """カード情報をJSONに保存"""
+        """カード情報をJSONに保存（アセットストア経由でトップページ側の cards.json にも配置）"""
+        from asset_store import write_asset
+
         CREDIT_DIR.mkdir(exist_ok=True)
-        with open(CARDS_JSON, 'w', encoding='utf-8') as f:
-            json.dump(self.cards, f, ensure_ascii=False, indent=2)
+        write_asset(CARDS_JSON, json.dumps(self.cards, ensure_ascii=False, indent=2).encode('utf-8'))
 
     def get_default_cards(self) -> List[Dict]:
         """デフォルトのカード情報"""
@@ -203,7 +208,8 @@ class HTMLGenerator:
         emoney = "<br>".join(card.get("emoney", []))
         card_id = card.get("id", "")
 
-        return f'''                        <tr>
+        # カードの記事内リンク（feeds.py のカードのフィード）の行き先。比較表には全カードが1回ずつ載る
+        return f'''                        <tr id="card-{card_id}">
                             <td><strong style="font-size: 18px; color: #e91e63;">{card["return_rate"]}</strong></td>
                             <td><strong style="color: {"#4caf50" if "無料" in card["annual_fee"] else "#333"};">{card["annual_fee"]}</strong></td>
                             <td>{brands}</td>
@@ -212,9 +218,15 @@ class HTMLGenerator:
                             <td><a href="{card.get("affiliate_url", "#")}" class="apply-btn" target="_blank" rel="noopener">詳細・申込</a></td>
                         </tr>'''
 
+    @traced("creditcard.generate_index_html")
     def generate_index_html(self):
         """index.htmlを生成"""
+        from feeds import feeds_enabled
+
         today = datetime.now(JST).strftime('%Y年%m月%d日')
+        # カードのフィードを書き出すとき（公開URLが分かるとき）だけ参照する
+        feed_link = ('\n    <link rel="alternate" type="application/atom+xml" title="クレジットカード比較ナビ" href="feed.xml">'
+                     if feeds_enabled() else "")
 
         # 人気カード（最初の3枚）
         popular_cards = self.card_data.cards[:3]
@@ -234,7 +246,7 @@ class HTMLGenerator:
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>クレジットカード比較ナビ | お得なカード選びをサポート</title>
     <meta name="description" content="2026年最新！おすすめクレジットカードを徹底比較。年会費無料、高還元率、ゴールドカードなどカテゴリ別に紹介します。">
-    <link rel="stylesheet" href="style.css">
+    <link rel="stylesheet" href="style.css">{feed_link}
 </head>
 <body>
     <!-- ヘッダー -->
@@ -369,8 +381,10 @@ class HTMLGenerator:
         # HTMLを保存
         CREDIT_DIR.mkdir(exist_ok=True)
         output_path = CREDIT_DIR / "index.html"
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(html_template)
+        data = html_template.encode('utf-8')
+        with open(output_path, 'wb') as f:
+            f.write(data)
+        count("bytes_written", len(data), kind="html")
 
         print(f"✅ HTMLを生成しました: {output_path}")
 
@@ -387,6 +401,10 @@ def main():
     generator = HTMLGenerator(card_data)
     generator.generate_index_html()
 
+    # カードのフィード（公開URLが分かるときだけ）
+    from feeds import update_feeds
+    update_feeds()
+
     print("\n✅ 生成完了！")
     print(f"サイトURL: file://{CREDIT_DIR / 'index.html'}")
 
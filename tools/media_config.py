@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+動画・音声ツールの共通設定
+
+youtube_video_generator.py・tts.py・slide_renderer.py・media_store.py が共有する
+出力先のディレクトリと、外部コマンド・ライブラリの有無の確認をまとめたモジュールです。
+どのツールからも読み込まれるため、ここからは他のツールをインポートしません。
+
+外部機能の確認結果は PATH とバージョンをキーにして .cache/capabilities.json に保存します。
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from functools import lru_cache
+from importlib import util
+from pathlib import Path
+from typing import Optional
+
+# 出力先
+VIDEO_DIR = Path(__file__).parent.parent / "videos"
+AUDIO_DIR = Path(__file__).parent.parent / "audio"
+# サムネイル（images/ はカード画像と共有しているので分ける）
+IMAGE_DIR = Path(__file__).parent.parent / "thumbnails"
+CACHE_DIR = Path(__file__).parent.parent / ".cache"
+CAPABILITY_CACHE_FILE = CACHE_DIR / "capabilities.json"
+STILL_TRACK_DIR = CACHE_DIR / "video_tracks"
+
+# 静止画・スライド動画の x264 プリセット
+STILL_X264_PRESET = "veryfast"
+
+# サムネイルの背景色（青系）。縦長などへの余白やスライドの背景もこの色で埋める
+THUMBNAIL_BG_COLOR = (0, 102, 204)
+
+
+# 機能名 → (配布パッケージ名のリスト, 確認するモジュール名のリスト, インストール方法)
+LIBRARY_CAPABILITIES = {
+    'gtts': (['gTTS'], ['gtts'], "pip install gtts"),
+    'pil': (['Pillow'], ['PIL'], "pip install Pillow"),
+    'youtube_api': (
+        ['google-auth-oauthlib', 'google-api-python-client'],
+        ['google_auth_oauthlib', 'googleapiclient'],
+        "pip install google-auth-oauthlib google-api-python-client",
+    ),
+}
+
+
+# 機能名 → (実行ファイル名の候補, バージョン確認の引数, インストール方法)
+COMMAND_CAPABILITIES = {
+    'ffmpeg': (['ffmpeg'], '-version', "ffmpeg をシステムにインストールしてください"),
+    'espeak': (['espeak-ng', 'espeak'], '--version', "espeak-ng をシステムにインストールしてください"),
+}
+
+
+def _dist_version(dist_name: str) -> str:
+    """配布パッケージのバージョンを返す（モジュールはインポートしない）"""
+    from importlib import metadata
+
+    try:
+        return metadata.version(dist_name)
+    except metadata.PackageNotFoundError:
+        return ""
+
+
+def _find_command(name: str) -> str:
+    """コマンド型の機能の実行ファイルを PATH から探す"""
+    for candidate in COMMAND_CAPABILITIES[name][0]:
+        path = shutil.which(candidate)
+        if path:
+            return path
+    return ""
+
+
+def _capability_key(name: str) -> str:
+    """キャッシュの有効性を判定するためのキーを作成"""
+    if name in COMMAND_CAPABILITIES:
+        command_path = _find_command(name)
+        mtime = os.stat(command_path).st_mtime_ns if command_path else 0
+        parts = [os.environ.get('PATH', ""), command_path, str(mtime)]
+    else:
+        dists, _, _ = LIBRARY_CAPABILITIES[name]
+        parts = [sys.executable] + [f"{d}={_dist_version(d)}" for d in dists]
+    return hashlib.sha256("\n".join(parts).encode('utf-8')).hexdigest()
+
+
+def _probe(name: str) -> dict:
+    """機能の有無を実際に確認する"""
+    if name in COMMAND_CAPABILITIES:
+        command_path = _find_command(name)
+        if not command_path:
+            return {'available': False, 'version': ""}
+        try:
+            result = subprocess.run([command_path, COMMAND_CAPABILITIES[name][1]],
+                                    capture_output=True, text=True)
+        except OSError:
+            return {'available': False, 'version': ""}
+        first_line = result.stdout.splitlines()[0] if result.stdout else ""
+        return {'available': result.returncode == 0, 'version': first_line}
+
+    dists, modules, _ = LIBRARY_CAPABILITIES[name]
+    try:
+        available = all(util.find_spec(m) is not None for m in modules)
+    except (ImportError, ValueError):
+        available = False
+    return {'available': available, 'version': ",".join(_dist_version(d) for d in dists)}
+
+
+def _load_capability_cache() -> dict:
+    try:
+        with open(CAPABILITY_CACHE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+@lru_cache(maxsize=None)
+def has_capability(name: str) -> bool:
+    """
+    外部コマンド・ライブラリが利用可能かを確認（初回のみ実行し結果をキャッシュ）
+
+    Args:
+        name: COMMAND_CAPABILITIES または LIBRARY_CAPABILITIES のキー
+
+    Returns:
+        利用可能かどうか
+    """
+    key = _capability_key(name)
+    cache = _load_capability_cache()
+    entry = cache.get(name)
+    if not entry or entry.get('key') != key:
+        entry = dict(_probe(name), key=key)
+        cache[name] = entry
+        try:
+            CACHE_DIR.mkdir(exist_ok=True)
+            tmp_path = CAPABILITY_CACHE_FILE.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, CAPABILITY_CACHE_FILE)
+        except OSError:
+            pass  # キャッシュに書けなくても判定結果は使える
+    return bool(entry['available'])
+
+
+def probe_duration(media_path: Path) -> Optional[float]:
+    """
+    ffmpeg で音声・動画の長さ（秒）を取得
+
+    Args:
+        media_path: メディアファイルのパス
+
+    Returns:
+        長さ（秒）。取得できない場合はNone
+    """
+    result = subprocess.run(['ffmpeg', '-hide_banner', '-i', str(media_path)],
+                            capture_output=True, text=True)
+    match = re.search(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)', result.stderr)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def require_capability(name: str, label: str) -> bool:
+    """機能が使えなければエラーを表示して False を返す"""
+    if has_capability(name):
+        return True
+    if name in COMMAND_CAPABILITIES:
+        hint = COMMAND_CAPABILITIES[name][2]
+    else:
+        hint = LIBRARY_CAPABILITIES[name][2]
+    print(f"エラー: {label} が利用できません（{hint}）")
+    return False
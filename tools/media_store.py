@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+動画・音声・サムネイルの保存容量の管理
+
+youtube_video_generator.py は毎日 videos/・audio/・thumbnails/ に生成物を書き出し、
+.cache/ に映像トラックと音声チャンクのキャッシュを溜めていきます。このモジュールは次のように
+それらの大きさを一定の範囲に保ちます。
+
+- 音声・サムネイルは内容のハッシュを名前にした実体（.cache/media/objects/）を1つだけ持ち、
+  出力先にはハードリンクで配置する（同じ内容は何日分あっても1つ分の容量）
+- アップロード済みの動画は data/videos.json にURLなどのメタデータだけを記録し、ローカルのファイルは消す
+- 最後に使ってから max_age_days 日を過ぎたファイルを消す
+- 合計が容量の上限を超えたら、最後に使った日時の古い順に消す
+  （アップロード待ちの動画と、直近 RECENT_HOURS 時間以内に使ったファイルは消さない）
+
+使い方:
+    python tools/media_store.py status              # 種類ごとの件数・容量
+    python tools/media_store.py prune               # 上の規則で削除
+    python tools/media_store.py prune --dry-run     # 削除するものを表示するだけ
+    python tools/media_store.py prune --budget-mb 500 --max-age-days 30
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from media_config import AUDIO_DIR, CACHE_DIR, IMAGE_DIR, STILL_TRACK_DIR, VIDEO_DIR
+from tracing import count, span
+
+# 設定
+BASE_DIR = Path(__file__).parent.parent
+MEDIA_STORE_DIR = CACHE_DIR / "media"
+# アップロード済みの動画の記録（リポジトリに含める）
+PUBLISHED_FILE = BASE_DIR / "data" / "videos.json"
+# 以前のサムネイルの置き場所（カード画像と同じ images/ に日付の名前で書いていた）
+LEGACY_THUMBNAIL_DIR = BASE_DIR / "images"
+LEGACY_THUMBNAIL_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}\.png$')
+
+# 容量の上限（MB）と、使われなくなってから消すまでの日数（環境変数で変更可）
+DEFAULT_BUDGET_MB = int(os.environ.get('MEDIA_BUDGET_MB', 2048))
+DEFAULT_MAX_AGE_DAYS = int(os.environ.get('MEDIA_MAX_AGE_DAYS', 90))
+# 直近に使ったファイルは容量を超えていても消さない（時間）
+RECENT_HOURS = 24
+
+
+def _tts_cache_dir() -> Path:
+    from tts import TTS_CACHE_DIR
+    return TTS_CACHE_DIR
+
+
+def file_sha256(path: Path) -> str:
+    """ファイル内容の SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class MediaStore:
+    """生成した動画・音声・サムネイルとそのキャッシュの保存容量を管理する"""
+
+    def __init__(self, store_dir: Path = MEDIA_STORE_DIR, published_file: Path = PUBLISHED_FILE,
+                 base_dir: Path = BASE_DIR):
+        """
+        初期化
+
+        Args:
+            store_dir: 実体と使用履歴（usage.json）を置くディレクトリ
+            published_file: アップロード済みの動画の記録
+            base_dir: 記録に書くパスの基準（リポジトリのルート）
+        """
+        self.store_dir = Path(store_dir)
+        self.objects_dir = self.store_dir / "objects"
+        self.usage_path = self.store_dir / "usage.json"
+        self.published_file = Path(published_file)
+        self.base_dir = Path(base_dir)
+        self._lock = threading.Lock()
+
+    def media_dirs(self) -> Dict[str, Path]:
+        """種類 → ディレクトリ（容量の管理の対象）"""
+        return {
+            'video': VIDEO_DIR,
+            'audio': AUDIO_DIR,
+            'thumbnail': IMAGE_DIR,
+            'still_track': STILL_TRACK_DIR,
+            'tts': _tts_cache_dir(),
+        }
+
+    def _relative(self, path: Path) -> str:
+        return os.path.relpath(Path(path).absolute(), self.base_dir.absolute()).replace(os.sep, "/")
+
+    def _inside_base(self, path: Path) -> bool:
+        try:
+            Path(path).absolute().relative_to(self.base_dir.absolute())
+            return True
+        except ValueError:
+            return False
+
+    # --- 重複の除去 ---
+
+    def adopt(self, path: Path) -> bool:
+        """
+        生成したファイルを実体と共有する（同じ内容の実体があればハードリンクに置き換える）
+
+        リポジトリの外（テスト用の一時ディレクトリなど）のファイルはそのままにする。
+
+        Args:
+            path: 生成したファイル
+
+        Returns:
+            既存の実体と共有して容量を減らせたかどうか
+        """
+        path = Path(path)
+        if not path.exists() or not self._inside_base(path):
+            return False
+        digest = file_sha256(path)
+        object_path = self.objects_dir / digest[:2] / f"{digest}{path.suffix}"
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            if os.path.samefile(path, object_path):
+                return False
+        except FileNotFoundError:
+            try:
+                os.link(path, object_path)
+            except FileExistsError:
+                pass
+            except OSError:
+                return False
+            else:
+                count("cache_misses", cache="media_object")
+                return False
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            os.link(object_path, tmp_path)
+        except OSError:
+            return False
+        os.replace(tmp_path, path)
+        count("cache_hits", cache="media_object")
+        return True
+
+    # --- 使用履歴 ---
+
+    def _load_usage(self) -> Dict[str, float]:
+        try:
+            with open(self.usage_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_usage(self, usage: Dict[str, float]):
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.usage_path.with_name(f"usage.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(usage, f, sort_keys=True, indent=0)
+        os.replace(tmp_path, self.usage_path)
+
+    def touch(self, paths: Iterable[Path], now: Optional[float] = None):
+        """ファイルを使ったことを記録（容量を超えたときに古い順に消すための日時）"""
+        now = now or time.time()
+        with self._lock:
+            usage = self._load_usage()
+            usage.update({self._relative(path): now for path in paths
+                          if Path(path).exists() and self._inside_base(path)})
+            self._save_usage(usage)
+
+    # --- アップロード済みの動画 ---
+
+    def published(self) -> Dict[str, dict]:
+        """アップロード済みの動画（ファイル名 → {'url', 'title', 'sha256', 'size', 'published'}）"""
+        try:
+            with open(self.published_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def is_published(self, video_path: Path) -> bool:
+        """動画がアップロード済みとして記録されているか"""
+        return Path(video_path).name in self.published()
+
+    def _save_published(self, records: Dict[str, dict]):
+        # 1件1行にして、毎日の追加が git の差分で1行になるようにする
+        self.published_file.parent.mkdir(parents=True, exist_ok=True)
+        lines = [f"  {json.dumps(name, ensure_ascii=False)}: {json.dumps(record, ensure_ascii=False, sort_keys=True)}"
+                 for name, record in sorted(records.items())]
+        tmp_path = self.published_file.with_name(f".{self.published_file.name}.{os.getpid()}.tmp")
+        tmp_path.write_text("{\n" + ",\n".join(lines) + ("\n" if lines else "") + "}\n", encoding='utf-8')
+        os.replace(tmp_path, self.published_file)
+
+    def record_published(self, video_path: Path, url: str, title: str = "",
+                         published: Optional[str] = None) -> bool:
+        """
+        アップロードした動画を記録（ローカルのファイルは prune() で消す）
+
+        Args:
+            video_path: 動画ファイルのパス
+            url: 動画のURL
+            title: 動画のタイトル
+            published: アップロード日時（省略時は今）
+
+        Returns:
+            新しく記録したかどうか
+        """
+        video_path = Path(video_path)
+        with self._lock:
+            records = self.published()
+            if video_path.name in records:
+                return False
+            record = {'url': url, 'title': title,
+                      'published': published or datetime.now(timezone.utc).isoformat(timespec='seconds')}
+            if video_path.exists():
+                record.update(sha256=file_sha256(video_path), size=video_path.stat().st_size)
+            records[video_path.name] = record
+            self._save_published(records)
+        return True
+
+    def sync_uploads(self) -> tuple:
+        """
+        アップロードキューの完了した項目を記録
+
+        Returns:
+            (新しく記録した数, アップロード待ちの動画のパスの集合)
+        """
+        from upload_queue import QUEUE_DB, UploadQueue
+
+        if not QUEUE_DB.exists():
+            return 0, set()
+        added = 0
+        pending = set()
+        for item in UploadQueue().items():
+            if item['status'] == 'done' and item['video_url']:
+                added += self.record_published(Path(item['video_path']), item['video_url'], item['title'],
+                                               published=item['updated_at'])
+            elif item['status'] in ('queued', 'uploading'):
+                pending.add(Path(item['video_path']).resolve())
+        return added, pending
+
+    # --- 削除 ---
+
+    def migrate_thumbnails(self) -> int:
+        """images/ に日付の名前で置いていたサムネイルを thumbnails/ に移す（移した数を返す）"""
+        if not LEGACY_THUMBNAIL_DIR.is_dir() or LEGACY_THUMBNAIL_DIR.resolve() == IMAGE_DIR.resolve():
+            return 0
+        moved = 0
+        for path in LEGACY_THUMBNAIL_DIR.iterdir():
+            if LEGACY_THUMBNAIL_PATTERN.match(path.name):
+                IMAGE_DIR.mkdir(parents=True, exist_ok=True)
+                os.replace(path, IMAGE_DIR / path.name)
+                moved += 1
+        return moved
+
+    def entries(self) -> List[dict]:
+        """
+        管理対象のファイルを実体（inode）ごとにまとめる
+
+        Returns:
+            {'kind', 'paths', 'size', 'last_used'} のリスト
+        """
+        usage = self._load_usage()
+        groups = {}
+        for kind, directory in self.media_dirs().items():
+            if not directory.is_dir():
+                continue
+            for path in directory.rglob("*"):
+                if not path.is_file() or ".tmp" in path.name:
+                    continue
+                stat = path.stat()
+                group = groups.setdefault((stat.st_dev, stat.st_ino), {
+                    'kind': kind, 'paths': [], 'size': stat.st_size, 'last_used': stat.st_mtime})
+                group['paths'].append(path)
+                group['last_used'] = max(group['last_used'], usage.get(self._relative(path), 0))
+        return list(groups.values())
+
+    def gc(self) -> int:
+        """出力先から参照されなくなった実体を削除（削除した数を返す）"""
+        removed = 0
+        if self.objects_dir.is_dir():
+            for path in self.objects_dir.glob("*/*"):
+                if path.stat().st_nlink <= 1:
+                    path.unlink()
+                    removed += 1
+        return removed
+
+    def prune(self, budget_bytes: Optional[int] = None, max_age_days: Optional[float] = None,
+              dry_run: bool = False, now: Optional[float] = None) -> dict:
+        """
+        アップロード済みの動画・古いファイルを消し、容量の上限に収める
+
+        Args:
+            budget_bytes: 容量の上限（省略時は DEFAULT_BUDGET_MB）
+            max_age_days: 使われなくなってから消すまでの日数（省略時は DEFAULT_MAX_AGE_DAYS）
+            dry_run: 消さずに対象を表示するだけ
+            now: 現在時刻（UNIX 秒）
+
+        Returns:
+            'published'（記録したアップロード済みの動画）, 'removed'（消したファイル数）,
+            'freed'（空いたバイト数）, 'total'（残りのバイト数）を持つ辞書
+        """
+        budget_bytes = budget_bytes if budget_bytes is not None else DEFAULT_BUDGET_MB * 1024 * 1024
+        max_age_days = max_age_days if max_age_days is not None else DEFAULT_MAX_AGE_DAYS
+        now = now or time.time()
+
+        with span("media_store.prune"):
+            if not dry_run:
+                self.migrate_thumbnails()
+            published_added, pending = self.sync_uploads()
+            published = self.published()
+            entries = self.entries()
+
+            def protected(entry):
+                return any(path.resolve() in pending for path in entry['paths'])
+
+            # アップロード済みの動画 → 使われなくなって久しいもの → 容量を超えた分（古い順）
+            expired = now - max_age_days * 86400
+            doomed = [entry for entry in entries if not protected(entry) and (
+                entry['last_used'] < expired
+                or (entry['kind'] == 'video' and all(path.name in published for path in entry['paths'])))]
+            total = sum(entry['size'] for entry in entries) - sum(entry['size'] for entry in doomed)
+            recent = now - RECENT_HOURS * 3600
+            doomed_ids = {id(entry) for entry in doomed}
+            for entry in sorted(entries, key=lambda entry: entry['last_used']):
+                if total <= budget_bytes:
+                    break
+                if id(entry) in doomed_ids or entry['last_used'] >= recent or protected(entry):
+                    continue
+                doomed.append(entry)
+                total -= entry['size']
+
+            freed = removed = 0
+            for entry in doomed:
+                for path in entry['paths']:
+                    if dry_run:
+                        print(f"削除対象: {self._relative(path)}（{entry['size']:,} バイト）")
+                    else:
+                        path.unlink(missing_ok=True)
+                    removed += 1
+                freed += entry['size']
+            if not dry_run:
+                self.gc()
+                usage = self._load_usage()
+                if usage:
+                    self._save_usage({rel: ts for rel, ts in usage.items() if (self.base_dir / rel).exists()})
+
+        count("files_removed", removed, kind="media")
+        count("bytes_freed", freed, kind="media")
+        return {'published': published_added, 'removed': removed, 'freed': freed, 'total': total}
+
+    def status(self) -> Dict[str, dict]:
+        """種類 → {'files', 'bytes'}"""
+        result = {kind: {'files': 0, 'bytes': 0} for kind in self.media_dirs()}
+        for entry in self.entries():
+            result[entry['kind']]['files'] += len(entry['paths'])
+            result[entry['kind']]['bytes'] += entry['size']
+        return result
+
+
+def print_prune_result(result: dict):
+    """prune() の結果を表示"""
+    print(f"メディアの整理: 削除 {result['removed']}件（{result['freed'] / 1024 / 1024:.1f} MB）、"
+          f"残り {result['total'] / 1024 / 1024:.1f} MB"
+          + (f"、アップロード済みの記録 {result['published']}件" if result['published'] else ""))
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="動画・音声・サムネイルの保存容量の管理")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="種類ごとの件数・容量")
+    prune = sub.add_parser("prune", help="アップロード済み・古いファイルを削除して容量の上限に収める")
+    prune.add_argument("--budget-mb", type=int, default=DEFAULT_BUDGET_MB,
+                       help=f"容量の上限（既定: {DEFAULT_BUDGET_MB}、環境変数 MEDIA_BUDGET_MB）")
+    prune.add_argument("--max-age-days", type=float, default=DEFAULT_MAX_AGE_DAYS,
+                       help=f"使われなくなってから消すまでの日数（既定: {DEFAULT_MAX_AGE_DAYS}、環境変数 MEDIA_MAX_AGE_DAYS）")
+    prune.add_argument("--dry-run", action="store_true", help="削除せずに対象を表示する")
+    args = parser.parse_args()
+
+    store = MediaStore()
+    if args.command == "status":
+        status = store.status()
+        for kind, entry in status.items():
+            print(f"{kind:<12}{entry['files']:>7}件  {entry['bytes'] / 1024 / 1024:>9.1f} MB")
+        print(f"アップロード済みの動画の記録: {len(store.published())}件")
+    else:
+        print_prune_result(store.prune(args.budget_mb * 1024 * 1024, args.max_age_days, args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
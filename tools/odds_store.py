@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+オッズの時系列ストア
+
+3連単の全120通りのオッズを1分ごとなどに記録し、レースごとに次のファイルへ追記します。
+
+    <日付>/<レース>.dlt   セグメントを追記していくデータ本体
+    <日付>/<レース>.key   セグメントの索引（固定長レコード）
+    <日付>/<レース>.tail  まだセグメントにしていない行（固定長の生データ）
+
+オッズは 0.1 単位の整数（0 は発売なし・取消）で持ちます。SEGMENT_ROWS 行たまるごとに
+1つのセグメントにまとめ、列（時刻と120通り）ごとに前の行との差分を zigzag 符号化して、
+セグメント内で最大の値が入る固定幅（1・2・4・8バイト）の配列として列の順に並べます。
+セグメントの先頭と末尾には行全体の値をそのまま置くので、最新のオッズは差分を足し合わせずに読めます。
+読み込みは mmap で行い、必要な列・行だけを取り出します（1日分をまとめて読み込まない）。
+
+書き込みは1レースにつき1プロセスだけで行う前提です。前回の書き込みが途中で止まっていた場合は、
+そのレースに初めて追記するときに壊れた末尾のレコードを切り詰めます。
+
+使い方:
+    python tools/odds_store.py import odds.jsonl      # {"date", "race", "time", "odds": {"1-2-3": 12.3, ...}} の行
+    python tools/odds_store.py latest --date 2026-01-16
+    python tools/odds_store.py series --date 2026-01-16 --race 02R03 --combination 1-2-3
+    python tools/odds_store.py stats --date 2026-01-16
+"""
+
+import argparse
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate, chain, permutations
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from tracing import count, span
+
+# 設定
+BASE_DIR = Path(__file__).parent.parent
+ODDS_DIR = BASE_DIR / "data" / "odds"
+JST = timezone(timedelta(hours=9))
+
+# 3連単の組み合わせ（列の順番。変えると既存のファイルが読めなくなる）
+COMBINATIONS = [f"{a}-{b}-{c}" for a, b, c in permutations(range(1, 7), 3)]
+COMBINATION_INDEX = {combination: i for i, combination in enumerate(COMBINATIONS)}
+
+# オッズを整数にするときの倍率（0.1 単位）
+ODDS_SCALE = 10
+
+# 1セグメントの行数
+SEGMENT_ROWS = 60
+
+# 1行: 時刻（UNIX 秒）と120通りのオッズ
+ROW = struct.Struct(f"<q{len(COMBINATIONS)}I")
+COLUMNS = 1 + len(COMBINATIONS)
+# 索引の1レコード: .dlt 内の位置, 最初と最後の行の時刻, 行数, 差分の幅（バイト）
+KEY_RECORD = struct.Struct("<QqqHB5x")
+
+# 差分の幅 → array の型コード
+WIDTH_TYPECODES = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+for _width, _typecode in WIDTH_TYPECODES.items():
+    assert array(_typecode).itemsize == _width
+
+RACE_PATTERN = re.compile(r'^[0-9A-Za-z_-]+$')
+
+OddsValues = Union[Sequence[Optional[float]], Dict[str, Optional[float]]]
+
+
+def _zigzag(value: int) -> int:
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def _unzigzag(value: int) -> int:
+    return (value >> 1) ^ -(value & 1)
+
+
+def encode_odds(odds: OddsValues) -> List[int]:
+    """オッズ（組み合わせ → 倍率 の辞書、または COMBINATIONS 順のリスト）を整数の列にする"""
+    if isinstance(odds, dict):
+        unknown = set(odds) - set(COMBINATION_INDEX)
+        if unknown:
+            raise ValueError(f"不明な組み合わせです: {sorted(unknown)[:3]}")
+        odds = [odds.get(combination) for combination in COMBINATIONS]
+    if len(odds) != len(COMBINATIONS):
+        raise ValueError(f"オッズは {len(COMBINATIONS)}通り必要です（{len(odds)}通り）")
+    return [int(round(value * ODDS_SCALE)) if value and value > 0 else 0 for value in odds]
+
+
+def decode_odds(value: int) -> Optional[float]:
+    """整数のオッズを倍率に戻す（0 は None）"""
+    return value / ODDS_SCALE if value else None
+
+
+def _timestamp(value) -> int:
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def encode_segment(rows: List[tuple]) -> Tuple[bytes, int]:
+    """
+    行（時刻, オッズ120個）のリストを1セグメントにする
+
+    Returns:
+        (セグメントのバイト列, 差分の幅)
+    """
+    deltas = [[_zigzag(b - a) for a, b in zip(column, column[1:])] for column in zip(*rows)]
+    top = max((max(column) for column in deltas if column), default=0)
+    width = next(width for width in WIDTH_TYPECODES if top < 1 << (8 * width))
+    body = array(WIDTH_TYPECODES[width], chain.from_iterable(deltas))
+    if sys.byteorder == 'big':
+        body.byteswap()
+    return ROW.pack(*rows[0]) + body.tobytes() + ROW.pack(*rows[-1]), width
+
+
+def _segment_size(rows: int, width: int) -> int:
+    return ROW.size * 2 + COLUMNS * (rows - 1) * width
+
+
+def _read_deltas(data: mmap.mmap, start: int, length: int, width: int) -> array:
+    """セグメント内の差分（length 個）を読んで zigzag のまま返す"""
+    deltas = array(WIDTH_TYPECODES[width])
+    with memoryview(data) as view, view[start:start + length * width] as raw:
+        deltas.frombytes(raw)
+    if sys.byteorder == 'big':
+        deltas.byteswap()
+    return deltas
+
+
+class RaceReader:
+    """1レースのファイルを mmap して読む"""
+
+    def __init__(self, race_dir: Path, race: str):
+        self.race = race
+        self._files = []
+        self._maps = {}
+        for suffix in ('.key', '.dlt', '.tail'):
+            path = race_dir / f"{race}{suffix}"
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                continue
+            self._files.append(f)
+            size = os.fstat(f.fileno()).st_size
+            if size:
+                self._maps[suffix] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # 書き込み途中のレコード・セグメントは無視する
+        key, data = self._maps.get('.key'), self._maps.get('.dlt')
+        data_size = len(data) if data is not None else 0
+        self.segments = []
+        for i in range(len(key) // KEY_RECORD.size if key is not None else 0):
+            record = KEY_RECORD.unpack_from(key, i * KEY_RECORD.size)
+            if record[0] + _segment_size(record[3], record[4]) > data_size:
+                break
+            self.segments.append(record)
+        # セグメントにした後に消し損ねた行（時刻が最後のセグメント以前）は飛ばす
+        tail = self._maps.get('.tail')
+        last_time = self.segments[-1][2] if self.segments else None
+        self._tail_rows = []
+        for i in range(len(tail) // ROW.size if tail is not None else 0):
+            if last_time is None or struct.unpack_from("<q", tail, i * ROW.size)[0] > last_time:
+                self._tail_rows.append(i * ROW.size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for m in self._maps.values():
+            m.close()
+        for f in self._files:
+            f.close()
+        self._maps.clear()
+        self._files.clear()
+
+    @property
+    def rows(self) -> int:
+        """行数"""
+        return sum(record[3] for record in self.segments) + len(self._tail_rows)
+
+    def tail_rows(self) -> List[tuple]:
+        """まだセグメントにしていない行"""
+        tail = self._maps.get('.tail')
+        return [ROW.unpack_from(tail, offset) for offset in self._tail_rows]
+
+    def latest(self) -> Optional[tuple]:
+        """最新の行（時刻, オッズ120個の整数）"""
+        if self._tail_rows:
+            return ROW.unpack_from(self._maps['.tail'], self._tail_rows[-1])
+        if self.segments:
+            offset, _, _, rows, width = self.segments[-1]
+            return ROW.unpack_from(self._maps['.dlt'], offset + ROW.size + COLUMNS * (rows - 1) * width)
+        return None
+
+    def column(self, index: int) -> List[int]:
+        """1列（0 は時刻、1〜120 はオッズ）の全行の値"""
+        values = []
+        data = self._maps.get('.dlt')
+        field = struct.Struct("<q" if index == 0 else "<I")
+        for offset, _, _, rows, width in self.segments:
+            base = field.unpack_from(data, offset + (0 if index == 0 else 8 + 4 * (index - 1)))[0]
+            deltas = _read_deltas(data, offset + ROW.size + index * (rows - 1) * width, rows - 1, width)
+            values += accumulate((_unzigzag(delta) for delta in deltas), initial=base)
+        tail = self._maps.get('.tail')
+        values += [field.unpack_from(tail, offset + (0 if index == 0 else 8 + 4 * (index - 1)))[0]
+                   for offset in self._tail_rows]
+        return values
+
+    def series(self, combination: str) -> List[Tuple[int, Optional[float]]]:
+        """1つの組み合わせの (時刻, オッズ) の時系列"""
+        values = self.column(1 + COMBINATION_INDEX[combination])
+        return [(timestamp, decode_odds(value)) for timestamp, value in zip(self.column(0), values)]
+
+    def snapshots(self) -> Iterator[tuple]:
+        """すべての行を古い順に（バックテスト用。セグメントごとに復元する）"""
+        data = self._maps.get('.dlt')
+        for offset, _, _, rows, width in self.segments:
+            base = ROW.unpack_from(data, offset)
+            deltas = _read_deltas(data, offset + ROW.size, COLUMNS * (rows - 1), width)
+            columns = [list(accumulate((_unzigzag(delta) for delta in deltas[i * (rows - 1):(i + 1) * (rows - 1)]),
+                                       initial=base[i])) for i in range(COLUMNS)]
+            yield from zip(*columns)
+        yield from self.tail_rows()
+
+
+class OddsStore:
+    """日付・レースごとのオッズの時系列ストア"""
+
+    def __init__(self, root: Optional[Path] = None):
+        """
+        初期化
+
+        Args:
+            root: 保存先（省略時は環境変数 ODDS_DIR、なければ data/odds）
+        """
+        self.root = Path(root or os.environ.get('ODDS_DIR') or ODDS_DIR)
+        # (日付, レース) → [最後の時刻, セグメントにしていない行数]（追記のたびにファイルを読まないため）
+        self._positions = {}
+
+    def day_dir(self, date: str) -> Path:
+        return self.root / date
+
+    def races(self, date: str) -> List[str]:
+        """記録のあるレースの一覧"""
+        day_dir = self.day_dir(date)
+        if not day_dir.is_dir():
+            return []
+        return sorted({path.stem for path in day_dir.iterdir() if path.suffix in ('.key', '.tail')})
+
+    def open(self, date: str, race: str) -> RaceReader:
+        """1レースを読む（with で閉じる）"""
+        return RaceReader(self.day_dir(date), race)
+
+    def append(self, date: str, race: str, timestamp, odds: OddsValues):
+        """
+        1回分のオッズを追記（SEGMENT_ROWS 行たまったらセグメントにする）
+
+        Args:
+            date: 日付（YYYY-MM-DD）
+            race: レース（例: 02R03）
+            timestamp: 時刻（UNIX 秒または ISO 形式）
+            odds: 組み合わせ → 倍率 の辞書、または COMBINATIONS 順のリスト（発売なしは None）
+        """
+        if not RACE_PATTERN.match(race):
+            raise ValueError(f"レース名に使えない文字があります: {race}")
+        row = (_timestamp(timestamp), *encode_odds(odds))
+        position = self._positions.get((date, race))
+        if position is None:
+            with self.open(date, race) as reader:
+                latest = reader.latest()
+                segments = reader.segments
+                position = [latest[0] if latest else None, len(reader.tail_rows())]
+            # 前回の書き込みが途中で止まっていたら、続きを書く前に壊れた末尾を切り詰める
+            self._truncate_torn(date, race, segments)
+            self._positions[(date, race)] = position
+        if position[0] is not None and row[0] <= position[0]:
+            raise ValueError(f"時刻が前の記録より前です: {race} {row[0]} <= {position[0]}")
+
+        day_dir = self.day_dir(date)
+        day_dir.mkdir(parents=True, exist_ok=True)
+        with open(day_dir / f"{race}.tail", 'ab') as f:
+            f.write(ROW.pack(*row))
+        position[0] = row[0]
+        position[1] += 1
+        count("odds_rows", kind="appended")
+        if position[1] >= SEGMENT_ROWS:
+            self.flush(date, race)
+
+    def _truncate_torn(self, date: str, race: str, segments: List[tuple]):
+        """
+        書き込み途中で止まった末尾を切り詰める（そのまま追記すると後ろの記録が読めなくなる）
+
+        .tail は ROW.size の倍数、.key は読み込み側が使えるレコード（.dlt に本体のあるもの）まで、
+        .dlt は最後のセグメントの終わりまでにする。
+
+        Args:
+            date: 日付
+            race: レース
+            segments: RaceReader.segments（使えるセグメントの索引）
+        """
+        day_dir = self.day_dir(date)
+        data_end = segments[-1][0] + _segment_size(segments[-1][3], segments[-1][4]) if segments else 0
+        for suffix, valid_size in (('.key', len(segments) * KEY_RECORD.size), ('.dlt', data_end), ('.tail', None)):
+            path = day_dir / f"{race}{suffix}"
+            try:
+                size = path.stat().st_size
+            except FileNotFoundError:
+                continue
+            if valid_size is None:
+                valid_size = size - size % ROW.size
+            if size > valid_size:
+                os.truncate(path, valid_size)
+                count("odds_truncated_bytes", size - valid_size, kind=suffix[1:])
+
+    def flush(self, date: str, race: str) -> bool:
+        """
+        たまっている行をセグメントにする（その日の記録を終えるときにも呼ぶ）
+
+        Returns:
+            セグメントを書いたかどうか
+        """
+        with self.open(date, race) as reader:
+            rows = reader.tail_rows()
+        if not rows:
+            return False
+        with span("odds_store.flush"):
+            data, width = encode_segment(rows)
+            day_dir = self.day_dir(date)
+            # 本体 → 索引 → 生データの順に書く（途中で止まっても読み込み側で整合が取れる）
+            with open(day_dir / f"{race}.dlt", 'ab') as f:
+                offset = f.tell()
+                f.write(data)
+            with open(day_dir / f"{race}.key", 'ab') as f:
+                f.write(KEY_RECORD.pack(offset, rows[0][0], rows[-1][0], len(rows), width))
+            os.truncate(day_dir / f"{race}.tail", 0)
+        if (date, race) in self._positions:
+            self._positions[(date, race)][1] = 0
+        count("bytes_written", len(data) + KEY_RECORD.size, kind="odds")
+        return True
+
+    def latest_all(self, date: str) -> Dict[str, Tuple[int, List[Optional[float]]]]:
+        """全レースの最新のオッズ（レース → (時刻, COMBINATIONS 順の倍率)）"""
+        result = {}
+        for race in self.races(date):
+            with self.open(date, race) as reader:
+                latest = reader.latest()
+            if latest is not None:
+                result[race] = (latest[0], [decode_odds(value) for value in latest[1:]])
+        return result
+
+    def series(self, date: str, race: str, combination: str) -> List[Tuple[int, Optional[float]]]:
+        """1レース・1組み合わせの (時刻, 倍率) の時系列"""
+        with self.open(date, race) as reader:
+            return reader.series(combination)
+
+    def favorites(self, date: str, limit: int = 3) -> Dict[str, List[Tuple[str, float]]]:
+        """全レースの最新オッズで人気（倍率の低い順）の組み合わせ"""
+        result = {}
+        for race, (_, odds) in self.latest_all(date).items():
+            ranked = sorted((value, combination) for combination, value in zip(COMBINATIONS, odds) if value)
+            result[race] = [(combination, value) for value, combination in ranked[:limit]]
+        return result
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="オッズの時系列ストア")
+    parser.add_argument("--root", type=Path, help="保存先（省略時は環境変数 ODDS_DIR、なければ data/odds）")
+    sub = parser.add_subparsers(dest="command", required=True)
+    import_parser = sub.add_parser("import", help="JSON Lines のオッズを追記")
+    import_parser.add_argument("path", nargs="?", help="入力ファイル（省略時は標準入力）")
+    latest_parser = sub.add_parser("latest", help="全レースの人気の組み合わせ（最新オッズ）")
+    latest_parser.add_argument("--date", required=True)
+    latest_parser.add_argument("--limit", type=int, default=3)
+    series_parser = sub.add_parser("series", help="1つの組み合わせの時系列")
+    series_parser.add_argument("--date", required=True)
+    series_parser.add_argument("--race", required=True)
+    series_parser.add_argument("--combination", required=True, choices=COMBINATIONS, metavar="A-B-C")
+    stats_parser = sub.add_parser("stats", help="行数・ファイルサイズ（JSON で持った場合との比較）")
+    stats_parser.add_argument("--date", required=True)
+    args = parser.parse_args()
+
+    store = OddsStore(args.root)
+    if args.command == "import":
+        touched = set()
+        with (open(args.path, 'r', encoding='utf-8') if args.path else sys.stdin) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    store.append(record['date'], record['race'], record['time'], record['odds'])
+                    touched.add((record['date'], record['race']))
+        for date, race in sorted(touched):
+            store.flush(date, race)
+        print(f"{len(touched)}レースに追記しました")
+    elif args.command == "latest":
+        for race, favorites in store.favorites(args.date, args.limit).items():
+            print(f"{race}: " + "、".join(f"{combination} {value:.1f}倍" for combination, value in favorites))
+    elif args.command == "series":
+        for timestamp, value in store.series(args.date, args.race, args.combination):
+            print(f"{datetime.fromtimestamp(timestamp, JST).strftime('%H:%M:%S')}  {value if value is not None else '-'}")
+    elif args.command == "stats":
+        rows = stored = as_json = 0
+        for race in store.races(args.date):
+            with store.open(args.date, race) as reader:
+                rows += reader.rows
+                for row in reader.snapshots():
+                    as_json += len(json.dumps({'race': race, 'time': row[0], 'odds': {
+                        combination: decode_odds(value) for combination, value in zip(COMBINATIONS, row[1:])}}))
+            stored += sum(path.stat().st_size for path in store.day_dir(args.date).glob(f"{race}.*"))
+        print(f"レース {len(store.races(args.date))}件、{rows}行: {stored:,} バイト"
+              f"（JSON では {as_json:,} バイト、{stored / as_json:.1%}）" if as_json else "記録がありません")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+公開用の静的ファイル最適化スクリプト
+
+サイトの HTML・CSS を最小化して dist/ に書き出し、.gz（brotli があれば .br も）を並列に作成します。
+
+- 記事ごとに埋め込まれた <style> は共通のスタイルシートに切り出す
+- スタイルシートは内容のハッシュ入りのファイル名（assets/名前.ハッシュ.css）にして
+  長期キャッシュできるようにする（dist/_headers に Cache-Control を記載）
+- 前回と入力・出力が同じファイルは書き込み・圧縮を省略する
+
+使い方:
+    python tools/optimize.py
+    python tools/build.py --dist    # ビルド後に続けて実行
+"""
+
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+# 設定
+BASE_DIR = Path(__file__).parent.parent
+DIST_DIR = BASE_DIR / "dist"
+ASSETS_DIR = "assets"
+MANIFEST_NAME = ".manifest.json"
+
+# 最小化・切り出しの方法を変えたら上げる（前回の出力をすべて作り直すため）
+OPTIMIZER_VERSION = 1
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+# 対象ファイル（リポジトリからの相対パスの glob）
+HTML_SOURCES = ["index.html", "posts/*.html", "creditcard/index.html", "search.html"]
+CSS_SOURCES = ["style.css", "creditcard/style.css"]
+COPY_SOURCES = ["images/*.png", "creditcard/images/*.png"]
+# そのままコピーして圧縮版も作るもの（feeds.py・search_index.py の出力と検索ページのスクリプト）
+DATA_SOURCES = ["sitemap.xml", "sitemaps/*.xml", "feed.xml", "rss.xml", "creditcard/feed.xml",
+                "search.js", "search/meta.json", "search/docs/*.json", "search/shards/*.json"]
+
+# 埋め込みの <style> を切り出すページ（同じテンプレートで大量に作られるもの）
+EXTRACT_STYLE_PATTERN = re.compile(r'^posts/')
+
+# ハッシュ入りのファイルは内容が変わると名前が変わるので、1年キャッシュさせる
+HEADERS_FILE = "_headers"
+HEADERS_CONTENT = f"""/{ASSETS_DIR}/*
+  Cache-Control: public, max-age=31536000, immutable
+"""
+
+# 空白を詰めない要素
+PRESERVE_PATTERN = re.compile(r'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.S | re.I)
+STYLE_BLOCK_PATTERN = re.compile(r'<style\b[^>]*>(.*?)</style\s*>', re.S | re.I)
+STYLESHEET_LINK_PATTERN = re.compile(
+    r'(<link\b[^>]*\brel=["\']stylesheet["\'][^>]*\bhref=["\'])([^"\']+)(["\'])', re.I)
+CSS_STRING_PATTERN = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')')
+
+
+def minify_css(css: str) -> str:
+    """CSS の最小化（コメント・不要な空白・最後の ; を削除。文字列の中は変えない）"""
+    parts = CSS_STRING_PATTERN.split(css)
+    for i in range(0, len(parts), 2):
+        part = re.sub(r'/\*.*?\*/', '', parts[i], flags=re.S)
+        part = re.sub(r'\s+', ' ', part)
+        # ':' の前の空白は子孫セレクタ（a :hover）の意味を持つので残す
+        part = re.sub(r'\s*([{};,>])\s*', r'\1', part)
+        part = re.sub(r':\s+', ':', part)
+        part = part.replace(';}', '}')
+        parts[i] = part
+    return "".join(parts).strip()
+
+
+def minify_html(html: str) -> str:
+    """
+    HTML の最小化
+
+    コメントを削除し、連続する空白を1文字にまとめる（改行を含むなら改行1つ）。
+    表示が変わらないよう、空白そのものは消さない。pre・textarea・script の中は変えず、
+    style の中は CSS として最小化する。
+    """
+    parts = PRESERVE_PATTERN.split(html)
+    result = []
+    # split() は (前のテキスト, ブロック全体, タグ名) の繰り返しになる
+    for i in range(0, len(parts), 3):
+        text = re.sub(r'<!--(?!\[if).*?-->', '', parts[i], flags=re.S)
+        text = re.sub(r'\s+', lambda m: '\n' if '\n' in m.group() else ' ', text)
+        result.append(text)
+        if i + 1 < len(parts):
+            block, tag = parts[i + 1], parts[i + 2].lower()
+            if tag == 'style':
+                block = STYLE_BLOCK_PATTERN.sub(
+                    lambda m: m.group(0).replace(m.group(1), minify_css(m.group(1))), block)
+            result.append(block)
+    return "".join(result).strip() + "\n"
+
+
+def fingerprint_name(name: str, data: bytes) -> str:
+    """内容のハッシュ入りのファイル名（style.css → style.0123456789.css）"""
+    stem, ext = posixpath.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+
+
+def _relative_url(from_page: str, to_path: str) -> str:
+    """ページから見た相対URL"""
+    return posixpath.relpath(to_path, posixpath.dirname(from_page) or ".")
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _compress_file(path: str, use_brotli: bool) -> int:
+    """.gz（と .br）を作成して、圧縮後の合計バイト数を返す（プロセスプールで実行）"""
+    data = Path(path).read_bytes()
+    outputs = [(f"{path}.gz", gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0))]
+    if use_brotli:
+        import brotli
+        outputs.append((f"{path}.br", brotli.compress(data, quality=BROTLI_QUALITY)))
+    total = 0
+    for out_path, compressed in outputs:
+        tmp_path = f"{out_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmp_path, out_path)
+        total += len(compressed)
+    return total
+
+
+def _expand(patterns, base_dir: Path):
+    """glob のリストをリポジトリからの相対パスに展開"""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(str(base_dir / pattern)))
+        paths.extend(Path(match).relative_to(base_dir).as_posix() for match in matches)
+    return paths
+
+
+def build_stylesheets(base_dir: Path = BASE_DIR):
+    """
+    外部スタイルシートを最小化してハッシュ入りの名前にする（内容が同じなら1ファイルにまとまる）
+
+    Returns:
+        (元の相対パス → assets 内のパス, assets 内のパス → 内容)
+    """
+    stylesheets, outputs = {}, {}
+    for rel_path in _expand(CSS_SOURCES, base_dir):
+        data = minify_css((base_dir / rel_path).read_text(encoding='utf-8')).encode('utf-8')
+        asset_path = f"{ASSETS_DIR}/{fingerprint_name(posixpath.basename(rel_path), data)}"
+        stylesheets[rel_path] = asset_path
+        outputs[asset_path] = data
+    return stylesheets, outputs
+
+
+def render_page(rel_path: str, html: str, stylesheets: dict):
+    """
+    1ページを最小化する
+
+    Args:
+        rel_path: ページの相対パス
+        html: ページの HTML
+        stylesheets: build_stylesheets() が返した元の相対パス → assets 内のパス
+
+    Returns:
+        (最小化した HTML, 切り出したスタイルシートの assets 内のパス → 内容)
+    """
+    assets = {}
+
+    if EXTRACT_STYLE_PATTERN.match(rel_path):
+        def extract(match):
+            data = minify_css(match.group(1)).encode('utf-8')
+            asset_path = f"{ASSETS_DIR}/{fingerprint_name('post.css', data)}"
+            assets[asset_path] = data
+            return f'<link rel="stylesheet" href="{_relative_url(rel_path, asset_path)}">'
+        html = STYLE_BLOCK_PATTERN.sub(extract, html)
+
+    def relink(match):
+        href = match.group(2)
+        if re.match(r'^([a-z]+:|//|/)', href, re.I):
+            return match.group(0)  # 外部・絶対パスはそのまま
+        source = posixpath.normpath(posixpath.join(posixpath.dirname(rel_path), href))
+        if source not in stylesheets:
+            return match.group(0)
+        return match.group(1) + _relative_url(rel_path, stylesheets[source]) + match.group(3)
+    html = STYLESHEET_LINK_PATTERN.sub(relink, html)
+
+    return minify_html(html).encode('utf-8'), assets
+
+
+def _load_manifest(dist_dir: Path) -> dict:
+    try:
+        with open(dist_dir / MANIFEST_NAME, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        return manifest if manifest.get('version') == OPTIMIZER_VERSION else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _copy(source: Path, target: Path):
+    """ファイルをコピー（同じファイルシステムならハードリンクで済ませる）"""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copy2(source, tmp_path)
+    os.replace(tmp_path, target)
+
+
+def optimize_site(base_dir: Path = BASE_DIR, dist_dir: Path = DIST_DIR, jobs: Optional[int] = None,
+                  use_brotli: Optional[bool] = None, force: bool = False) -> dict:
+    """
+    サイトを最適化して dist_dir に書き出す
+
+    元のページの内容ハッシュ（と参照するスタイルシート）が前回と同じなら、
+    最小化・書き込み・圧縮をすべて省略する。
+
+    Args:
+        base_dir: サイトのルート
+        dist_dir: 出力先
+        jobs: 圧縮の並列数（省略時は CPU 数）
+        use_brotli: .br を作るかどうか（省略時は brotli があれば作る）
+        force: 前回と同じファイルも書き直す
+
+    Returns:
+        'written', 'skipped', 'removed'（件数）と 'bytes_in', 'bytes_out', 'bytes_gz'（バイト数）
+    """
+    if use_brotli is None:
+        from importlib import util
+        use_brotli = util.find_spec('brotli') is not None
+
+    base_dir, dist_dir = Path(base_dir), Path(dist_dir)
+    manifest = {} if force else _load_manifest(dist_dir)
+    # 圧縮の設定が変わったら全部作り直す
+    if manifest.get('brotli') != use_brotli:
+        manifest = {}
+    previous_files = manifest.get('files', {})  # 出力の相対パス → [ハッシュ, サイズ]
+    previous_pages = manifest.get('pages', {})  # ページの相対パス → {'hash', 'context', 'assets'}
+
+    files, pages = {}, {}
+    to_compress = []
+    summary = {'written': 0, 'skipped': 0, 'removed': 0, 'bytes_in': 0, 'bytes_out': 0, 'bytes_gz': 0}
+
+    def is_current(rel_path: str, compress: bool) -> bool:
+        target = dist_dir / rel_path
+        siblings = [f"{target}.gz"] + ([f"{target}.br"] if use_brotli else []) if compress else []
+        return target.exists() and all(os.path.exists(path) for path in siblings)
+
+    def emit(rel_path: str, data: Optional[bytes] = None, source: Optional[Path] = None,
+             compress: bool = True):
+        if rel_path in files:
+            return  # 複数のページから切り出された同じスタイルシート
+        if data is not None:
+            entry = [_sha256(data), len(data)]
+        else:
+            stat = source.stat()
+            entry = [f"{stat.st_size}:{stat.st_mtime_ns}", stat.st_size]
+        files[rel_path] = entry
+        if compress:
+            summary['bytes_out'] += entry[1]
+        if previous_files.get(rel_path) == entry and is_current(rel_path, compress):
+            summary['skipped'] += 1
+            return
+        target = dist_dir / rel_path
+        if data is not None:
+            _write_atomic(target, data)
+        else:
+            _copy(source, target)
+        summary['written'] += 1
+        if compress:
+            to_compress.append(str(target))
+
+    stylesheets, css_outputs = build_stylesheets(base_dir)
+    for rel_path in CSS_SOURCES:
+        for path in _expand([rel_path], base_dir):
+            summary['bytes_in'] += (base_dir / path).stat().st_size
+    for asset_path, data in css_outputs.items():
+        emit(asset_path, data)
+
+    # スタイルシートの名前が変わったら、それを参照するページは作り直す
+    context = _sha256(json.dumps(stylesheets, sort_keys=True).encode('utf-8'))
+    for rel_path in _expand(HTML_SOURCES, base_dir):
+        raw = (base_dir / rel_path).read_bytes()
+        summary['bytes_in'] += len(raw)
+        page = {'hash': _sha256(raw), 'context': context}
+
+        previous = previous_pages.get(rel_path)
+        if previous and all(previous.get(key) == value for key, value in page.items()):
+            reused = [rel_path] + previous['assets']
+            if all(path in previous_files and (path in files or is_current(path, True)) for path in reused):
+                for path in reused:
+                    if path not in files:
+                        files[path] = previous_files[path]
+                        summary['bytes_out'] += files[path][1]
+                        summary['skipped'] += 1
+                pages[rel_path] = previous
+                continue
+
+        html, assets = render_page(rel_path, raw.decode('utf-8'), stylesheets)
+        for asset_path, data in assets.items():
+            emit(asset_path, data)
+        emit(rel_path, html)
+        pages[rel_path] = dict(page, assets=sorted(assets))
+
+    for rel_path in _expand(DATA_SOURCES, base_dir):
+        summary['bytes_in'] += (base_dir / rel_path).stat().st_size
+        emit(rel_path, source=base_dir / rel_path)
+    for rel_path in _expand(COPY_SOURCES, base_dir):
+        emit(rel_path, source=base_dir / rel_path, compress=False)
+    emit(HEADERS_FILE, HEADERS_CONTENT.encode('utf-8'), compress=False)
+
+    if to_compress:
+        workers = jobs or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            sizes = pool.map(_compress_file, to_compress, [use_brotli] * len(to_compress),
+                             chunksize=max(1, len(to_compress) // (4 * workers)))
+            summary['bytes_gz'] = sum(sizes)
+
+    # 元ファイルが無くなった出力（古いハッシュ名のスタイルシートなど）を削除
+    for rel_path in previous_files.keys() - files.keys():
+        for path in (dist_dir / rel_path, Path(f"{dist_dir / rel_path}.gz"), Path(f"{dist_dir / rel_path}.br")):
+            if path.exists():
+                path.unlink()
+        summary['removed'] += 1
+
+    _write_atomic(dist_dir / MANIFEST_NAME, json.dumps(
+        {'version': OPTIMIZER_VERSION, 'brotli': use_brotli, 'files': files, 'pages': pages},
+        ensure_ascii=False, sort_keys=True).encode('utf-8'))
+    return summary
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="公開用に HTML・CSS を最小化・圧縮して dist/ に書き出す")
+    parser.add_argument("--out", type=Path, default=DIST_DIR, help="出力先（省略時は dist/）")
+    parser.add_argument("--jobs", type=int, help="圧縮の並列数（省略時は CPU 数）")
+    parser.add_argument("--force", action="store_true", help="前回と同じファイルも書き直す")
+    parser.add_argument("--no-brotli", action="store_true", help=".br を作らない")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = optimize_site(BASE_DIR, args.out, args.jobs, False if args.no_brotli else None, args.force)
+    print(f"書き込み {summary['written']}件、変更なし {summary['skipped']}件、削除 {summary['removed']}件"
+          f"（{time.perf_counter() - start:.2f}s）")
+    if summary['bytes_in']:
+        print(f"HTML・CSS: {summary['bytes_in']:,} → {summary['bytes_out']:,} バイト"
+              f"（{summary['bytes_out'] * 100 / summary['bytes_in']:.0f}%）")
+    print(f"出力先: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
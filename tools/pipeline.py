@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+ステージ実行モジュール
+
+処理をステージの依存グラフとして表し、依存関係のないステージを asyncio と
+スレッド／プロセスプールで並行に実行します。ステージごとの所要時間を記録し、
+どれかが失敗した場合は残りのステージを速やかにキャンセルします。
+
+実行中のステージは CancelEvent（current_cancel() で取得）で失敗を知ることができ、
+run_command() や track_process() で起動したサブプロセスは失敗と同時に終了させます。
+"""
+
+import asyncio
+import contextlib
+import functools
+import subprocess
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional
+
+import tracing
+
+
+class Stage:
+    """パイプラインの1ステージ"""
+
+    def __init__(self, name: str, func: Callable, deps: Iterable[str] = (), executor: str = 'thread'):
+        """
+        初期化
+
+        Args:
+            name: ステージ名
+            func: 実行する関数。依存ステージの結果を deps の順に引数として受け取る。
+                  例外を送出するか False を返すと失敗とみなす。'thread' ステージは
+                  current_cancel() で他のステージの失敗を知ることができる
+            deps: 依存するステージ名
+            executor: 'thread'（I/O待ち・サブプロセス向け）または 'process'（CPU処理向け。
+                      func と引数は pickle できる必要がある）
+        """
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"不明な executor です: {executor}")
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.executor = executor
+
+
+class StageError(Exception):
+    """ステージの失敗"""
+
+    def __init__(self, stage: str, cause: Optional[BaseException] = None):
+        self.stage = stage
+        self.cause = cause
+        message = f"ステージ '{stage}' が失敗しました"
+        if cause is not None:
+            message += f": {cause}"
+        super().__init__(message)
+
+
+class CancelEvent(threading.Event):
+    """
+    パイプラインの中止を知らせるイベント
+
+    set() されると、登録中のサブプロセスを終了させる（ffmpeg などの終了を待たずに済む）。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    def set(self):
+        with self._lock:
+            super().set()
+            processes = list(self._processes)
+        for process in processes:
+            _terminate(process)
+
+    def register(self, process: subprocess.Popen):
+        """サブプロセスを登録（すでに中止されていればすぐに終了させる）"""
+        with self._lock:
+            if not self.is_set():
+                self._processes.add(process)
+                return
+        _terminate(process)
+
+    def unregister(self, process: subprocess.Popen):
+        """サブプロセスの登録を外す"""
+        with self._lock:
+            self._processes.discard(process)
+
+
+def _terminate(process: subprocess.Popen):
+    if process.poll() is None:
+        try:
+            process.terminate()
+        except OSError:
+            pass  # 直前に終了していた
+
+
+_local = threading.local()
+
+
+def current_cancel() -> Optional[CancelEvent]:
+    """このスレッドで実行中のステージの CancelEvent（ステージの外では None）"""
+    return getattr(_local, 'cancel', None)
+
+
+@contextlib.contextmanager
+def cancel_scope(cancel: Optional[CancelEvent]):
+    """
+    このスレッドの current_cancel() を一時的に設定
+
+    ステージの中で別のスレッドに処理を渡すときに、そのスレッドで使う。
+    """
+    previous = current_cancel()
+    _local.cancel = cancel
+    try:
+        yield cancel
+    finally:
+        _local.cancel = previous
+
+
+@contextlib.contextmanager
+def track_process(process: subprocess.Popen, cancel: Optional[CancelEvent] = None):
+    """
+    実行中のステージが失敗したらサブプロセスを終了させる
+
+    Args:
+        process: 起動済みのサブプロセス
+        cancel: 登録先（省略時は current_cancel()。ステージの外では何もしない）
+    """
+    cancel = cancel or current_cancel()
+    if cancel is None:
+        yield process
+        return
+    cancel.register(process)
+    try:
+        yield process
+    finally:
+        cancel.unregister(process)
+
+
+def run_command(cmd: List[str], **kwargs) -> subprocess.CompletedProcess:
+    """
+    subprocess.run(cmd, capture_output=True, text=True) と同じだが、
+    実行中のステージが失敗したら終了させる（終了コードは 0 以外になる）
+
+    Args:
+        cmd: コマンドと引数
+        **kwargs: subprocess.Popen に渡す引数（text など）
+
+    Returns:
+        subprocess.CompletedProcess
+    """
+    kwargs.setdefault('text', True)
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+    with process, track_process(process):
+        stdout, stderr = process.communicate()
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
+def _check_graph(stages: List[Stage]):
+    """ステージ名の重複・存在しない依存・循環を検出"""
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError("ステージ名が重複しています")
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        for dep in stage.deps:
+            if dep not in by_name:
+                raise ValueError(f"ステージ '{stage.name}' の依存 '{dep}' がありません")
+
+    visiting, done = set(), set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"ステージの依存が循環しています: {name}")
+        visiting.add(name)
+        for dep in by_name[name].deps:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+
+    for name in names:
+        visit(name)
+
+
+def _traced_call(name: str, cancel: CancelEvent, func: Callable, *args):
+    """実行するスレッド上でスパンを記録（スレッドごとに入れ子が正しく表示される）"""
+    if cancel.is_set():
+        raise RuntimeError("キャンセルされました")
+    with cancel_scope(cancel), tracing.span(name):
+        return func(*args)
+
+
+async def run_stages(stages: List[Stage], thread_pool: Optional[Executor] = None,
+                     process_pool: Optional[Executor] = None, timings: Optional[dict] = None,
+                     on_start: Optional[Callable[[str], None]] = None) -> dict:
+    """
+    ステージを依存関係に従って並行実行
+
+    Args:
+        stages: ステージのリスト
+        thread_pool: 'thread' ステージを実行するプール（省略時はイベントループ既定）
+        process_pool: 'process' ステージを実行するプール（省略時は thread_pool で実行）
+        timings: ステージ名 → 所要時間（秒）を書き込む辞書（失敗時も途中まで記録）
+        on_start: ステージ開始時に呼ぶ関数（ステージ名を受け取る）
+
+    Returns:
+        ステージ名 → 結果の辞書
+
+    Raises:
+        StageError: いずれかのステージが失敗した場合（他のステージはキャンセル済み）
+    """
+    _check_graph(stages)
+    loop = asyncio.get_running_loop()
+    timings = timings if timings is not None else {}
+    results = {}
+    tasks = {}
+    # スレッドで実行中のステージに失敗を知らせ、起動中のサブプロセスを終了させる
+    cancel = CancelEvent()
+
+    async def run_stage(stage: Stage):
+        if stage.deps:
+            await asyncio.gather(*(tasks[dep] for dep in stage.deps))
+        if on_start:
+            on_start(stage.name)
+        in_process = stage.executor == 'process' and process_pool is not None
+        pool = process_pool if in_process else thread_pool
+        args = [results[dep] for dep in stage.deps]
+        span_name = f"stage.{stage.name}"
+        if in_process and tracing.enabled():
+            # ワーカープロセス内のスパンも親のトレースに取り込む
+            call = functools.partial(tracing.call_in_worker, span_name, stage.func, *args)
+        elif in_process:
+            call = functools.partial(stage.func, *args)
+        else:
+            call = functools.partial(_traced_call, span_name, cancel, stage.func, *args)
+        start = time.perf_counter()
+        try:
+            value = await loop.run_in_executor(pool, call)
+            if in_process and tracing.enabled():
+                value, payload = value
+                tracing.get_tracer().merge(payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            raise StageError(stage.name, e) from e
+        finally:
+            timings[stage.name] = time.perf_counter() - start
+        if value is False:
+            raise StageError(stage.name)
+        results[stage.name] = value
+        return value
+
+    # 全タスクを先に登録してから待つ（依存先のタスクを名前で参照するため）
+    for stage in stages:
+        tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+
+    pending = set(tasks.values())
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+    except BaseException:
+        cancel.set()
+        raise
+    finally:
+        # 失敗したら兄弟ステージを待たずにキャンセルする（未開始のプール処理は実行されない）
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    return results
+
+
+def run_pipeline(stages: List[Stage], thread_pool: Optional[Executor] = None,
+                 process_pool: Optional[Executor] = None, timings: Optional[dict] = None,
+                 on_start: Optional[Callable[[str], None]] = None) -> dict:
+    """
+    run_stages() を新しいイベントループで実行（同期コードからの呼び出し用）
+
+    thread_pool が指定されていない場合は、この実行の間だけスレッドプールを作る。
+    失敗したときは実行中のステージの終了を待たずに戻る（イベントループ既定の
+    プールは asyncio.run() の終了時に全スレッドの終了を待ってしまうため使わない）。
+    process_pool が指定されていない場合、'process' ステージもスレッドで実行する
+    （1回の実行のためにプロセスを起動するより速い）。
+
+    Args:
+        run_stages() と同じ
+
+    Returns:
+        ステージ名 → 結果の辞書
+    """
+    own_pool = None
+    if thread_pool is None:
+        own_pool = thread_pool = ThreadPoolExecutor(max_workers=max(1, len(stages)),
+                                                    thread_name_prefix="stage")
+    try:
+        return asyncio.run(run_stages(stages, thread_pool, process_pool, timings, on_start))
+    finally:
+        if own_pool is not None:
+            own_pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+記事HTMLの解析モジュール
+
+generate.py が出力した記事から、タイトル・本文の要点・買い目・免責文を
+html.parser で1回の走査で取り出します。結果はファイル内容のハッシュで
+キャッシュし、動画・フィード・検索などの各処理で使い回します。
+"""
+
+import hashlib
+import json
+import os
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+
+CACHE_DIR = Path(__file__).parent.parent / ".cache"
+POST_CACHE_DIR = CACHE_DIR / "posts"
+
+# 解析結果の形式を変えたら上げる（古いキャッシュを無効にするため）
+PARSER_VERSION = 1
+
+DISCLAIMER_PREFIX = "免責："
+
+# プロセス内キャッシュ（ファイル内容のハッシュ → 解析結果）
+_memory_cache = {}
+
+
+class PostHTMLParser(HTMLParser):
+    """記事HTMLから構造化された項目を取り出すパーサー"""
+
+    # テキストを読まない要素
+    SKIP_TAGS = {'style', 'script', 'head'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.points = []
+        self.bets = []
+        self.disclaimer = ""
+
+        self._skip_depth = 0
+        self._in_h1 = False
+        self._card_depth = 0  # div.card の中にいる間は div のネスト数
+        self._ul_index = -1  # div.card 内で何番目の ul か
+        self._li_text = None
+        self._muted_depth = 0  # div.card 内の div.muted の中にいる間は div のネスト数
+        self._muted_text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+            return
+        classes = (dict(attrs).get('class') or "").split()
+
+        if tag == 'h1':
+            self._in_h1 = True
+        elif tag == 'div':
+            if self._card_depth:
+                self._card_depth += 1
+                if self._muted_depth:
+                    self._muted_depth += 1
+                elif 'muted' in classes:
+                    self._muted_depth = 1
+                    self._muted_text = []
+            elif 'card' in classes:
+                self._card_depth = 1
+        elif tag == 'ul' and self._card_depth:
+            self._ul_index += 1
+        elif tag == 'li' and self._card_depth:
+            self._li_text = []
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+            return
+
+        if tag == 'h1':
+            self._in_h1 = False
+        elif tag == 'div' and self._card_depth:
+            if self._muted_depth:
+                self._muted_depth -= 1
+                if not self._muted_depth:
+                    text = _normalize("".join(self._muted_text))
+                    if text.startswith(DISCLAIMER_PREFIX):
+                        self.disclaimer = text[len(DISCLAIMER_PREFIX):]
+            self._card_depth -= 1
+        elif tag == 'li' and self._li_text is not None:
+            text = _normalize("".join(self._li_text))
+            if text:
+                # 1つ目のリストが本文の要点、2つ目が買い目
+                if self._ul_index == 0:
+                    self.points.append(text)
+                elif self._ul_index == 1:
+                    self.bets.append(text)
+            self._li_text = None
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._in_h1:
+            self.title += data
+        if self._li_text is not None:
+            self._li_text.append(data)
+        if self._muted_depth:
+            self._muted_text.append(data)
+
+
+def _normalize(text: str) -> str:
+    """連続する空白を1つにまとめる"""
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def _cache_path(digest: str) -> Path:
+    return POST_CACHE_DIR / digest[:2] / f"{digest}.json"
+
+
+def parse_post(html_path: Path) -> dict:
+    """
+    記事HTMLを解析（同じ内容のファイルはキャッシュを使う）
+
+    Args:
+        html_path: 記事HTMLのパス
+
+    Returns:
+        'title', 'points', 'bets', 'disclaimer', 'date', 'hash' を持つ辞書
+    """
+    html_path = Path(html_path)
+    data = html_path.read_bytes()
+    digest = hashlib.sha256(data + f"\0v{PARSER_VERSION}".encode('ascii')).hexdigest()
+
+    result = _memory_cache.get(digest)
+    if result is None:
+        cache_path = _cache_path(digest)
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            result = _parse(data.decode('utf-8'))
+            result['hash'] = digest
+            try:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(result, f, ensure_ascii=False)
+                os.replace(tmp_path, cache_path)
+            except OSError:
+                pass  # キャッシュに書けなくても解析結果は使える
+        _memory_cache[digest] = result
+
+    # 日付はファイル名から取る（内容が同じでも日付は別）
+    date_match = re.search(r'(\d{4}-\d{2}-\d{2})', html_path.name)
+    parsed = dict(result, points=list(result['points']), bets=list(result['bets']))
+    parsed['date'] = date_match.group(1) if date_match else ""
+    return parsed
+
+
+def _parse(html: str) -> dict:
+    """HTML文字列を1回走査して各項目を取り出す"""
+    parser = PostHTMLParser()
+    parser.feed(html)
+    parser.close()
+    return {
+        'title': _normalize(parser.title),
+        'points': parser.points,
+        'bets': parser.bets,
+        'disclaimer': parser.disclaimer,
+    }
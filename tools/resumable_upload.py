@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+再開可能なアップロードモジュール
+
+YouTube Data API の resumable upload プロトコルで動画をチャンク単位に送信します。
+セッションURIと送信済みバイト数をディスクに保存するため、接続が切れたり
+プロセスが再起動したりしても続きから再開できます。
+
+一時的なエラー（5xx・429・接続断）は指数バックオフ＋ジッターで再試行し、
+チャンクサイズは1チャンクあたりの送信時間が TARGET_CHUNK_SECONDS 前後になるよう調整します。
+
+ローカルの fake_youtube_server.py に向けて試す場合:
+    YOUTUBE_UPLOAD_URL=http://127.0.0.1:8765/upload/youtube/v3/videos
+"""
+
+import hashlib
+import http.client
+import json
+import os
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+from urllib.parse import urlencode, urlsplit
+
+CACHE_DIR = Path(__file__).parent.parent / ".cache"
+UPLOAD_STATE_DIR = CACHE_DIR / "uploads"
+
+YOUTUBE_UPLOAD_URL = "https://www.googleapis.com/upload/youtube/v3/videos"
+
+# チャンクサイズは 256KiB の倍数でなければならない（最後のチャンクを除く）
+CHUNK_ALIGN = 256 * 1024
+MIN_CHUNK_SIZE = 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+TARGET_CHUNK_SECONDS = 5.0
+
+MAX_RETRIES = 8
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+HTTP_TIMEOUT = 60
+
+
+class UploadError(Exception):
+    """再試行しても回復しないアップロードの失敗"""
+
+
+class SessionNotStartedError(UploadError):
+    """この呼び出しで新しいアップロードセッションを開始しないまま失敗した（API のクォータを消費していない）"""
+
+
+class RetryableError(Exception):
+    """再試行すれば回復する可能性のある失敗"""
+
+
+def _align(size: int) -> int:
+    """チャンクサイズを 256KiB の倍数・上下限内に丸める"""
+    size = max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, size))
+    return max(CHUNK_ALIGN, size - size % CHUNK_ALIGN)
+
+
+class ResumableUploader:
+    """resumable upload プロトコルのクライアント"""
+
+    def __init__(self, token_provider: Callable[[], str], upload_url: Optional[str] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, max_retries: int = MAX_RETRIES,
+                 state_dir: Path = UPLOAD_STATE_DIR, sleep: Callable[[float], None] = time.sleep):
+        """
+        初期化
+
+        Args:
+            token_provider: アクセストークンを返す関数（リクエストごとに呼ぶので、期限切れなら更新して返す）
+            upload_url: アップロード開始のURL（省略時は環境変数 YOUTUBE_UPLOAD_URL、なければ YouTube）
+            chunk_size: 最初のチャンクサイズ（バイト）
+            max_retries: 連続して再試行する最大回数
+            state_dir: セッション状態を保存するディレクトリ
+            sleep: 待機に使う関数（テスト用）
+        """
+        self.token_provider = token_provider
+        self.upload_url = upload_url or os.environ.get('YOUTUBE_UPLOAD_URL') or YOUTUBE_UPLOAD_URL
+        self.chunk_size = _align(chunk_size)
+        self.max_retries = max_retries
+        self.state_dir = Path(state_dir)
+        self.sleep = sleep
+        # (スレッド, scheme, host, port) → 接続（keep-alive で使い回す）。
+        # 1つのインスタンスを複数スレッドで共有できるよう、接続はスレッドごとに持つ
+        self._connections = {}
+        self._connections_lock = threading.Lock()
+
+    # --- HTTP ---
+
+    def _request(self, method: str, url: str, body: bytes = b"", headers: Optional[dict] = None):
+        """
+        リクエストを送信し (ステータス, ヘッダー, 本文) を返す
+
+        接続断・タイムアウトは RetryableError にする。
+        """
+        parts = urlsplit(url)
+        key = (threading.get_ident(), parts.scheme, parts.hostname, parts.port)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        headers = dict(headers or {})
+        headers['Authorization'] = f"Bearer {self.token_provider()}"
+        headers['Content-Length'] = str(len(body))
+
+        with self._connections_lock:
+            conn = self._connections.get(key)
+            if conn is None:
+                conn_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+                conn = conn_class(parts.hostname, parts.port, timeout=HTTP_TIMEOUT)
+                self._connections[key] = conn
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            with self._connections_lock:
+                self._connections.pop(key, None)
+            raise RetryableError(f"接続エラー: {e}") from e
+        return response.status, {k.lower(): v for k, v in response.getheaders()}, data
+
+    def close(self):
+        """保持している接続を閉じる"""
+        with self._connections_lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
+
+    # --- セッション状態 ---
+
+    def _state_path(self, video_path: Path, metadata: dict) -> Path:
+        stat = video_path.stat()
+        key = json.dumps([str(video_path.resolve()), stat.st_size, stat.st_mtime_ns, metadata],
+                         ensure_ascii=False, sort_keys=True)
+        return self.state_dir / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]}.json"
+
+    def _load_state(self, state_path: Path) -> Optional[dict]:
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_state(self, state_path: Path, state: dict):
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = state_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, state_path)
+
+    # --- プロトコル ---
+
+    def _start_session(self, size: int, metadata: dict, content_type: str) -> str:
+        """アップロードセッションを開始してセッションURIを返す"""
+        query = urlencode({'uploadType': 'resumable', 'part': ",".join(metadata.keys())})
+        separator = "&" if "?" in self.upload_url else "?"
+        status, headers, data = self._request(
+            'POST', f"{self.upload_url}{separator}{query}",
+            body=json.dumps(metadata).encode('utf-8'),
+            headers={
+                'Content-Type': 'application/json; charset=UTF-8',
+                'X-Upload-Content-Length': str(size),
+                'X-Upload-Content-Type': content_type,
+            }
+        )
+        if status in RETRY_STATUSES:
+            raise RetryableError(f"セッション開始 HTTP {status}")
+        if status != 200 or 'location' not in headers:
+            raise UploadError(f"セッションを開始できません（HTTP {status}）: {data[:200]!r}")
+        return headers['location']
+
+    @staticmethod
+    def _parse_range(headers: dict) -> int:
+        """308 応答の Range ヘッダーから次に送るバイト位置を求める"""
+        match = re.match(r'bytes=0-(\d+)', headers.get('range', ""))
+        return int(match.group(1)) + 1 if match else 0
+
+    def _handle_response(self, status: int, headers: dict, data: bytes):
+        """
+        チャンク送信・状態確認の応答を解釈
+
+        Returns:
+            ('done', 応答JSON) / ('incomplete', 次のバイト位置) / ('expired', None)
+        """
+        if status in (200, 201):
+            return 'done', json.loads(data.decode('utf-8'))
+        if status == 308:
+            return 'incomplete', self._parse_range(headers)
+        if status in (404, 410):
+            return 'expired', None
+        if status in RETRY_STATUSES or status == 401:
+            # 401 は token_provider が次のリクエストで更新したトークンを返す
+            raise RetryableError(f"HTTP {status}")
+        raise UploadError(f"アップロードに失敗しました（HTTP {status}）: {data[:200]!r}")
+
+    def _query_offset(self, session_uri: str, size: int):
+        """サーバーが受信済みのバイト数を問い合わせる"""
+        status, headers, data = self._request('PUT', session_uri,
+                                              headers={'Content-Range': f"bytes */{size}"})
+        return self._handle_response(status, headers, data)
+
+    def _backoff(self, attempt: int, reason: str):
+        if attempt > self.max_retries:
+            raise UploadError(f"再試行回数の上限に達しました: {reason}")
+        delay = min(BACKOFF_CAP, BACKOFF_BASE * (2 ** (attempt - 1)))
+        delay = random.uniform(0, delay)  # full jitter
+        print(f"一時的なエラー（{reason}）。{delay:.1f}秒後に再試行します（{attempt}/{self.max_retries}）")
+        self.sleep(delay)
+
+    def _restart_backoff(self, restarts: int):
+        """期限切れ（404/410）のセッションを作り直す前に待つ（上限は一時的なエラーと同じ）"""
+        print("アップロードセッションの期限が切れたため最初からやり直します")
+        self._backoff(restarts, "アップロードセッションの期限切れ")
+
+    def upload(self, video_path: Path, metadata: dict, content_type: str = 'video/mp4',
+               on_progress: Optional[Callable[[int, int], None]] = None) -> dict:
+        """
+        動画をアップロード（前回の途中から再開できる場合は再開）
+
+        Args:
+            video_path: 動画ファイルパス
+            metadata: 動画リソース（'snippet', 'status' など）
+            content_type: 動画の MIME タイプ
+            on_progress: 進行状況を受け取る関数（送信済みバイト数, 全体のバイト数）
+
+        Returns:
+            API の応答（動画リソース）
+
+        Raises:
+            SessionNotStartedError: 新しいセッションを開始する前の失敗（認証・セッション開始・保存済みセッションの再開）
+            UploadError: 回復できない失敗
+        """
+        video_path = Path(video_path)
+        # この呼び出しで新しいセッションを開始したか。開始前の失敗はクォータを消費していない
+        session_started = False
+        try:
+            size = video_path.stat().st_size
+            state_path = self._state_path(video_path, metadata)
+            state = self._load_state(state_path)
+            offset = 0
+            attempt = 0
+            # セッションの作り直しは進み具合に関係なく通算で数える（期限切れが続くなら諦める）
+            restarts = 0
+
+            with open(video_path, 'rb') as f:
+                while True:
+                    try:
+                        if state is None:
+                            session_uri = self._start_session(size, metadata, content_type)
+                            session_started = True
+                            state = {'session_uri': session_uri, 'size': size, 'offset': 0}
+                            self._save_state(state_path, state)
+                            offset = 0
+                        elif attempt or offset == 0:
+                            # 再開時・エラー後はサーバー側の受信位置に合わせる
+                            kind, value = self._query_offset(state['session_uri'], size)
+                            if kind == 'done':
+                                state_path.unlink(missing_ok=True)
+                                return value
+                            if kind == 'expired':
+                                restarts += 1
+                                self._restart_backoff(restarts)
+                                state = None
+                                continue
+                            offset = value
+                            if offset:
+                                print(f"アップロードを再開します: {offset}/{size} バイト")
+
+                        f.seek(offset)
+                        chunk = f.read(self.chunk_size)
+                        end = offset + len(chunk) - 1
+                        started = time.perf_counter()
+                        status, headers, data = self._request(
+                            'PUT', state['session_uri'], body=chunk,
+                            headers={'Content-Range': f"bytes {offset}-{end}/{size}"}
+                        )
+                        kind, value = self._handle_response(status, headers, data)
+                        self._tune_chunk_size(len(chunk), time.perf_counter() - started)
+                    except RetryableError as e:
+                        attempt += 1
+                        self._backoff(attempt, str(e))
+                        continue
+
+                    if kind == 'done':
+                        state_path.unlink(missing_ok=True)
+                        if on_progress:
+                            on_progress(size, size)
+                        return value
+                    if kind == 'expired':
+                        restarts += 1
+                        self._restart_backoff(restarts)
+                        state = None
+                        continue
+
+                    attempt = 0
+                    offset = value
+                    state['offset'] = offset
+                    self._save_state(state_path, state)
+                    if on_progress:
+                        on_progress(offset, size)
+        except Exception as e:
+            if session_started or isinstance(e, SessionNotStartedError):
+                raise
+            raise SessionNotStartedError(str(e)) from e
+
+    def _tune_chunk_size(self, sent: int, seconds: float):
+        """1チャンクの送信時間が目標に近づくようにチャンクサイズを調整"""
+        if sent < self.chunk_size or seconds <= 0:
+            return  # 最後の短いチャンクでは判断しない
+        if seconds < TARGET_CHUNK_SECONDS / 2:
+            self.chunk_size = _align(self.chunk_size * 2)
+        elif seconds > TARGET_CHUNK_SECONDS * 2:
+            self.chunk_size = _align(self.chunk_size // 2)
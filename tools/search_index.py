@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+記事の全文検索インデックス生成スクリプト
+
+記事（posts/*.html）のタイトル・本文の要点・買い目から転置インデックスを作り、
+ブラウザ（search.js）が検索語に必要な分だけ読み込めるよう、語の先頭の文字ごとに分割して書き出します。
+日本語は2文字ずつ（bigram）、英数字は単語ごとに区切ります。
+
+記事ごとの内容ハッシュを search/state.json に記録しておき、増えた記事・内容が変わった記事・
+消えた記事が含まれる分割ファイルだけを書き直します。ファイルの更新日時とサイズが前回と同じ記事は読みません
+（更新日時はチェックアウトごとに変わるので、リポジトリに含めない .cache/search_stat.json に記録します）。
+
+出力:
+    search/meta.json          分割の設定（search.js が最初に読む）
+    search/shards/XXX.json    語 → [記事ID, 出現回数, 記事ID, 出現回数, ...]
+    search/docs/N.json        記事ID → [パス, タイトル, 日付]（DOCS_PER_SHARD 件ずつ）
+    search/state.json         前回の状態（検索には使わない）
+
+使い方:
+    python tools/search_index.py
+    python tools/search_index.py --rescan    # 更新日時に関係なくすべての記事のハッシュを確かめる
+    python tools/search_index.py --query 競艇  # 作ったインデックスで検索してみる
+"""
+
+import argparse
+import json
+import os
+import re
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from tracing import count, span
+
+# 設定
+BASE_DIR = Path(__file__).parent.parent
+POSTS_DIR = "posts"
+SEARCH_DIR = "search"
+SHARD_DIR = "shards"
+DOCS_DIR = "docs"
+META_FILE = "meta.json"
+STATE_FILE = "state.json"
+# 記事ごとの "サイズ:更新日時"（base_dir からの相対パス。.cache/ はリポジトリに含めない）
+STAT_CACHE_FILE = ".cache/search_stat.json"
+
+# 語の先頭の文字のコードポイントをこのビット数だけ右にずらした値で分割する
+# （4 ならひらがなは6ファイル程度。search.js も meta.json の値で同じ計算をする）
+SHARD_SHIFT = 4
+DOCS_PER_SHARD = 1000
+
+# 形式や区切り方を変えたら上げる（すべて作り直す）
+INDEX_VERSION = 2
+
+# 英数字の並び、またはそれ以外の文字（かな・漢字など）の並び。search.js の TOKEN_PATTERN と同じ
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+|(?:(?![a-z0-9])[^\W_])+')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    検索用の語に区切る
+
+    NFKC で正規化して小文字にし、英数字は単語ごと、日本語は2文字ずつ（1文字だけならその文字）にします。
+
+    Args:
+        text: 文章
+
+    Returns:
+        語のリスト（重複あり）
+    """
+    tokens = []
+    for run in TOKEN_PATTERN.findall(unicodedata.normalize('NFKC', text).lower()):
+        if run.isascii() or len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def shard_name(token: str) -> str:
+    """語を入れる分割ファイルの名前"""
+    return f"{ord(token[0]) >> SHARD_SHIFT:x}"
+
+
+def _write_json(path: Path, data, compact: bool = True):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    text = json.dumps(data, ensure_ascii=False, separators=(',', ':') if compact else None, sort_keys=True)
+    tmp_path.write_bytes(text.encode('utf-8'))
+    os.replace(tmp_path, path)
+    count("bytes_written", path.stat().st_size, kind="search")
+
+
+def _read_json(path: Path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def load_state(search_dir: Path) -> dict:
+    """前回の状態（設定や形式が違えば空）"""
+    state = _read_json(search_dir / STATE_FILE, {})
+    settings = {'version': INDEX_VERSION, 'shard_shift': SHARD_SHIFT, 'docs_per_shard': DOCS_PER_SHARD}
+    return state if all(state.get(key) == value for key, value in settings.items()) else {}
+
+
+def save_state(state: dict, search_dir: Path):
+    """状態を保存（記事は1件1行にして、毎日の差分が追加の行だけになるようにする）"""
+    docs = state['docs']
+    lines = [f"    {json.dumps(rel_path, ensure_ascii=False)}: {json.dumps(docs[rel_path], ensure_ascii=False)}"
+             for rel_path in sorted(docs)]
+    fields = [f"  {json.dumps(key)}: {json.dumps(state[key])}" for key in sorted(state) if key != 'docs']
+    fields.append('  "docs": {\n' + ",\n".join(lines) + "\n  }" if lines else '  "docs": {}')
+    path = search_dir / STATE_FILE
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path.write_bytes(("{\n" + ",\n".join(fields) + "\n}\n").encode('utf-8'))
+    os.replace(tmp_path, path)
+
+
+def _document(path: Path) -> dict:
+    """記事のタイトル・日付・検索対象の文章（免責文は全記事共通なので除く）"""
+    from post_parser import parse_post
+
+    post = parse_post(path)
+    title = post['title'] or path.stem
+    return {'hash': post['hash'][:16], 'title': title, 'date': post['date'],
+            'text': "\n".join([title, post['date']] + post['points'] + post['bets'])}
+
+
+def update_index(base_dir: Path = BASE_DIR, rescan: bool = False) -> dict:
+    """
+    検索インデックスを差分で更新
+
+    Args:
+        base_dir: サイトのルート
+        rescan: 更新日時・サイズが前回と同じ記事もハッシュを確かめる
+
+    Returns:
+        'docs'（記事数）, 'indexed'（索引し直した記事数）, 'removed', 'written'（書き直したファイル数）
+    """
+    base_dir = Path(base_dir)
+    search_dir = base_dir / SEARCH_DIR
+    state = load_state(search_dir)
+    if not state:
+        # 作り直すときは前回の分割ファイルを残さない
+        for sub_dir in (SHARD_DIR, DOCS_DIR):
+            for path in (search_dir / sub_dir).glob("*.json"):
+                path.unlink()
+        state = {'version': INDEX_VERSION, 'shard_shift': SHARD_SHIFT, 'docs_per_shard': DOCS_PER_SHARD,
+                 'next_id': 0, 'docs': {}}
+    docs = state['docs']
+
+    # state の docs: 相対パス → [記事ID, 内容ハッシュ, 語の入っている分割ファイル（空白区切り）]
+    posts_dir = base_dir / POSTS_DIR
+    names = sorted(name for name in os.listdir(posts_dir) if name.endswith(".html")) if posts_dir.is_dir() else []
+    stat_path = base_dir / STAT_CACHE_FILE
+    signatures = _read_json(stat_path, {})
+    new_signatures = {}
+    indexed = {}
+    with span("search.scan"):
+        for name in names:
+            rel_path = f"{POSTS_DIR}/{name}"
+            stat = (posts_dir / name).stat()
+            new_signatures[rel_path] = f"{stat.st_size}:{stat.st_mtime_ns}"
+            entry = docs.get(rel_path)
+            if entry and signatures.get(rel_path) == new_signatures[rel_path] and not rescan:
+                continue
+            document = _document(posts_dir / name)
+            if entry and entry[1] == document['hash']:
+                continue  # 触っただけ（内容は同じ）
+            indexed[rel_path] = document
+    removed = sorted(set(docs) - {f"{POSTS_DIR}/{name}" for name in names})
+    if not indexed and not removed and (search_dir / META_FILE).exists():
+        if new_signatures != signatures:
+            _write_json(stat_path, new_signatures, compact=False)
+        count("files_skipped", kind="search")
+        return {'docs': len(docs), 'indexed': 0, 'removed': 0, 'written': 0}
+
+    # 新しい語の出現（分割ファイルごと）と、古い語を消す必要のある分割ファイル
+    postings: Dict[str, Dict[str, Dict[int, int]]] = {}
+    stale_ids = set()
+    touched_shards = set()
+    doc_updates: Dict[int, Optional[list]] = {}
+    with span("search.tokenize"):
+        for rel_path in removed:
+            doc_id, _, shards = docs.pop(rel_path)
+            stale_ids.add(doc_id)
+            touched_shards.update(shards.split())
+            doc_updates[doc_id] = None
+            count("search_docs", kind="removed")
+        for rel_path, document in indexed.items():
+            entry = docs.get(rel_path)
+            if entry:
+                doc_id = entry[0]
+                stale_ids.add(doc_id)
+                touched_shards.update(entry[2].split())
+                count("search_docs", kind="updated")
+            else:
+                doc_id = state['next_id']
+                state['next_id'] += 1
+                count("search_docs", kind="added")
+            shards = set()
+            for token, tf in Counter(tokenize(document['text'])).items():
+                name = shard_name(token)
+                postings.setdefault(name, {}).setdefault(token, {})[doc_id] = tf
+                shards.add(name)
+            touched_shards |= shards
+            docs[rel_path] = [doc_id, document['hash'], " ".join(sorted(shards))]
+            doc_updates[doc_id] = [rel_path, document['title'], document['date']]
+
+    written = 0
+    with span("search.write"):
+        for name in sorted(touched_shards):
+            path = search_dir / SHARD_DIR / f"{name}.json"
+            shard = _read_json(path, {})
+            for token in list(shard):
+                if stale_ids:
+                    pairs = shard[token]
+                    kept = [value for i in range(0, len(pairs), 2) if pairs[i] not in stale_ids
+                            for value in pairs[i:i + 2]]
+                    if kept:
+                        shard[token] = kept
+                    else:
+                        del shard[token]
+            for token, new in postings.get(name, {}).items():
+                pairs = shard.get(token, [])
+                merged = dict(zip(pairs[::2], pairs[1::2]))
+                merged.update(new)
+                shard[token] = [value for doc_id in sorted(merged) for value in (doc_id, merged[doc_id])]
+            if shard:
+                _write_json(path, shard)
+                written += 1
+            else:
+                path.unlink(missing_ok=True)
+
+        for n in sorted({doc_id // DOCS_PER_SHARD for doc_id in doc_updates}):
+            path = search_dir / DOCS_DIR / f"{n}.json"
+            shard = _read_json(path, {})
+            for doc_id, value in doc_updates.items():
+                if doc_id // DOCS_PER_SHARD == n:
+                    if value is None:
+                        shard.pop(str(doc_id), None)
+                    else:
+                        shard[str(doc_id)] = value
+            if shard:
+                _write_json(path, shard)
+                written += 1
+            else:
+                path.unlink(missing_ok=True)
+
+        _write_json(search_dir / META_FILE, {'version': INDEX_VERSION, 'shard_shift': SHARD_SHIFT,
+                                             'docs_per_shard': DOCS_PER_SHARD, 'docs': len(docs)}, compact=False)
+        save_state(state, search_dir)
+        # 索引を書き終えてから記録する（途中で失敗したら次回も読み直す）
+        _write_json(stat_path, new_signatures, compact=False)
+    return {'docs': len(docs), 'indexed': len(indexed), 'removed': len(removed), 'written': written + 1}
+
+
+def search(query: str, base_dir: Path = BASE_DIR, limit: int = 20) -> List[dict]:
+    """
+    インデックスを検索（search.js と同じ方法。動作確認用）
+
+    すべての語を含む記事を、出現回数の合計が多い順（同じなら新しい順）に返します。
+    日本語1文字の語はその文字で始まる語すべてにマッチします。
+
+    Returns:
+        'path', 'title', 'date', 'score' を持つ辞書のリスト
+    """
+    search_dir = Path(base_dir) / SEARCH_DIR
+    shards = {}
+    scores = None
+    for token in dict.fromkeys(tokenize(query)):
+        name = shard_name(token)
+        if name not in shards:
+            shards[name] = _read_json(search_dir / SHARD_DIR / f"{name}.json", {})
+        keys = [key for key in shards[name] if key.startswith(token)] \
+            if len(token) == 1 and not token.isascii() else [token]
+        found = Counter()
+        for key in keys:
+            pairs = shards[name].get(key, [])
+            for doc_id, tf in zip(pairs[::2], pairs[1::2]):
+                found[doc_id] += tf
+        scores = found if scores is None else Counter({doc_id: scores[doc_id] + tf
+                                                       for doc_id, tf in found.items() if doc_id in scores})
+    results = []
+    for doc_id, score in sorted((scores or {}).items(), key=lambda item: (-item[1], -item[0]))[:limit]:
+        doc = _read_json(search_dir / DOCS_DIR / f"{doc_id // DOCS_PER_SHARD}.json", {}).get(str(doc_id))
+        if doc:
+            results.append({'path': doc[0], 'title': doc[1], 'date': doc[2], 'score': score})
+    return results
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="記事の全文検索インデックスを差分で更新")
+    parser.add_argument("--rescan", action="store_true", help="すべての記事のハッシュを確かめる")
+    parser.add_argument("--query", help="インデックスを更新せずに検索する")
+    args = parser.parse_args()
+
+    if args.query is not None:
+        results = search(args.query)
+        for result in results:
+            print(f"{result['score']:4d}  {result['date']}  {result['path']}  {result['title']}")
+        print(f"{len(results)}件")
+        return
+
+    result = update_index(rescan=args.rescan)
+    print(f"記事 {result['docs']}件（索引 {result['indexed']}件、削除 {result['removed']}件）、"
+          f"書き込み {result['written']}ファイル")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+"""
+ローカルプレビューサーバー（ウォッチモード）
+
+ファイルの変更を inotify（Linux 以外ではポーリング）で検出し、build.py で影響のあるターゲットだけを作り直して、
+ブラウザを自動で再読み込みします。ビルドは毎回別プロセスで実行するので、tools/ の変更（build.py や
+その import 先を含む）も次のビルドからそのまま反映されます。
+
+- ETag / Last-Modified による条件付きリクエスト（304）
+- テキストファイルの gzip 圧縮（圧縮結果はファイルの更新まで使い回す）
+- Range リクエスト（動画のシーク用）
+- Server-Sent Events によるライブリロード
+
+使い方:
+    python tools/serve.py --port 8000
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import gzip
+import mimetypes
+import os
+import re
+import select
+import struct
+import subprocess
+import sys
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import unquote, urlsplit
+
+# 設定
+BASE_DIR = Path(__file__).parent.parent
+TOOLS_DIR = Path(__file__).parent
+POLL_INTERVAL = 0.1  # ポーリング時に変更を確認する間隔（秒）
+DEBOUNCE_SECONDS = 0.02  # 保存時の連続した変更をまとめる時間（秒）
+LIVERELOAD_PATH = "/__livereload"
+LIVERELOAD_PING = 15  # 接続維持のコメントを送る間隔（秒）
+GZIP_MIN_SIZE = 1024
+GZIP_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# 監視するディレクトリ（直下のファイルのみ）。隠しディレクトリや動画・音声は監視しない
+WATCH_DIRS = ["", "posts", "creditcard", "creditcard/images", "images", "tools"]
+
+# 変わったらビルドし直すファイル（それ以外の変更は再読み込みだけ）
+BUILD_INPUT_PATTERN = re.compile(
+    r'^(tools/[^/]+\.py|creditcard/(cards\.json|style\.css)|posts/[^/]+\.html)$')
+
+LIVERELOAD_SCRIPT = (
+    f'<script>new EventSource("{LIVERELOAD_PATH}").onmessage=function(){{location.reload()}};</script>'
+).encode('utf-8')
+
+
+class ReloadNotifier:
+    """ライブリロードの通知（世代番号を上げて待機中の接続を起こす）"""
+
+    def __init__(self):
+        self.version = 0
+        self._condition = threading.Condition()
+
+    def notify(self):
+        with self._condition:
+            self.version += 1
+            self._condition.notify_all()
+
+    def wait(self, version: int, timeout: float) -> int:
+        """世代番号が version から変わるか timeout まで待ち、現在の世代番号を返す"""
+        with self._condition:
+            self._condition.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+def snapshot(base_dir: Path = BASE_DIR) -> dict:
+    """監視対象のファイル（相対パス → (更新時刻, サイズ)）"""
+    files = {}
+    for rel_dir in WATCH_DIRS:
+        try:
+            entries = os.scandir(base_dir / rel_dir)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name.startswith('.') or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                files[rel_path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def changed_paths(before: dict, after: dict) -> set:
+    """2つのスナップショットの差分（追加・削除・更新されたパス）"""
+    return {path for path in before.keys() | after.keys() if before.get(path) != after.get(path)}
+
+
+def rebuild(date_s: str, jobs: Optional[int] = None) -> bool:
+    """
+    build.py を別プロセスで実行し、古いターゲットだけを作り直す
+
+    モジュールを読み込み直すと、import 元が古い関数を持ったままになるので、毎回新しいプロセスで読み込む。
+
+    Args:
+        date_s: 記事の日付（YYYY-MM-DD）
+        jobs: ビルドの並列数（None なら CPU 数）
+
+    Returns:
+        ビルドが成功したかどうか
+    """
+    command = [sys.executable, str(TOOLS_DIR / "build.py"), "--date", date_s]
+    if jobs:
+        command += ["--jobs", str(jobs)]
+    return subprocess.run(command, cwd=BASE_DIR).returncode == 0
+
+
+class Inotify:
+    """inotify による変更検出（Linux のみ。記事が数千件あっても全ファイルを stat しない）"""
+
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, base_dir: Path = BASE_DIR):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self._libc = libc
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 に失敗しました")
+        mask = (self.IN_CLOSE_WRITE | self.IN_MODIFY | self.IN_MOVED_FROM | self.IN_MOVED_TO
+                | self.IN_CREATE | self.IN_DELETE)
+        self._dirs = {}  # 監視記述子 → 相対ディレクトリ
+        for rel_dir in WATCH_DIRS:
+            path = base_dir / rel_dir
+            if path.is_dir():
+                wd = libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+                if wd >= 0:
+                    self._dirs[wd] = rel_dir
+
+    def read(self, timeout: Optional[float]) -> set:
+        """変更されたパスを返す（timeout まで何もなければ空集合）"""
+        changed = set()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        while ready:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                data = b""
+            offset = 0
+            while offset < len(data):
+                wd, _, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+                offset += self.EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0").decode('utf-8', 'replace')
+                offset += length
+                rel_dir = self._dirs.get(wd)
+                if rel_dir is not None and name and not name.startswith('.'):
+                    changed.add(f"{rel_dir}/{name}" if rel_dir else name)
+            # 保存時の連続したイベントをまとめて受け取る
+            ready, _, _ = select.select([self.fd], [], [], DEBOUNCE_SECONDS)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class Watcher(threading.Thread):
+    """ファイルの変更を監視し、ビルドと再読み込みの通知を行うスレッド"""
+
+    def __init__(self, notifier: ReloadNotifier, date_s: str, interval: float = POLL_INTERVAL,
+                 jobs: Optional[int] = None):
+        super().__init__(daemon=True)
+        self.notifier = notifier
+        self.date_s = date_s
+        self.interval = interval
+        self.jobs = jobs
+        self.inotify = None
+        if sys.platform.startswith('linux'):
+            try:
+                self.inotify = Inotify()
+            except OSError:
+                pass
+        self.files = None if self.inotify else snapshot()
+
+    def wait_for_changes(self) -> set:
+        """次の変更まで待って、変更されたパスを返す"""
+        if self.inotify:
+            return self.inotify.read(None)
+        while True:
+            time.sleep(self.interval)
+            current = snapshot()
+            changed = changed_paths(self.files, current)
+            self.files = current
+            if changed:
+                return changed
+
+    def run(self):
+        while True:
+            changed = self.wait_for_changes()
+            start = time.perf_counter()
+
+            if any(BUILD_INPUT_PATTERN.match(path) for path in changed):
+                try:
+                    if not rebuild(self.date_s, self.jobs):
+                        print("エラー: ビルドに失敗しました（上の出力を確認してください）")
+                except OSError as e:
+                    print(f"エラー: ビルドを開始できませんでした: {e}")
+                # ビルドで書き出したファイルを次回の変更として拾わないようにする
+                if self.inotify:
+                    self.inotify.read(0)
+                else:
+                    self.files = snapshot()
+
+            self.notifier.notify()
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"変更を検出: {', '.join(sorted(changed)[:5])}"
+                  f"{' ほか' if len(changed) > 5 else ''}（{elapsed:.0f}ms）")
+
+
+class PreviewHandler(BaseHTTPRequestHandler):
+    """静的ファイルとライブリロードを提供するハンドラー"""
+
+    protocol_version = "HTTP/1.1"
+    root = BASE_DIR
+    notifier = None  # make_server() で設定
+    livereload = True
+    # (パス, 更新時刻, サイズ) → gzip 圧縮済みの本文
+    _gzip_cache = {}
+    _gzip_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass  # アクセスログは出さない
+
+    def _resolve(self, url_path: str) -> Optional[Path]:
+        """URLのパスをファイルパスに変換（ルート外・隠しファイルは None）"""
+        parts = [part for part in unquote(url_path).split('/') if part]
+        if any(part.startswith('.') for part in parts):
+            return None
+        path = self.root.joinpath(*parts)
+        if path.is_dir():
+            path = path / "index.html"
+        try:
+            path.resolve().relative_to(self.root.resolve())
+        except ValueError:
+            return None
+        return path if path.is_file() else None
+
+    def _send_error(self, status: int, message: str = ""):
+        body = message.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        url_path = urlsplit(self.path).path
+        if url_path == LIVERELOAD_PATH and self.notifier is not None:
+            self._serve_events()
+            return
+
+        path = self._resolve(url_path)
+        if path is None:
+            self._send_error(404, "Not Found")
+            return
+
+        stat = path.stat()
+        content_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        is_html = content_type == 'text/html'
+        inject = is_html and self.livereload and self.notifier is not None
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-lr" if inject else ""}"'
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+
+        if self._not_modified(etag, stat.st_mtime):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            self.end_headers()
+            return
+
+        range_header = self.headers.get('Range')
+        if range_header and not inject:
+            self._serve_range(path, stat.st_size, range_header, content_type, etag, last_modified)
+            return
+
+        compress = (
+            'gzip' in self.headers.get('Accept-Encoding', "")
+            and content_type.startswith(GZIP_TYPES)
+            and stat.st_size >= GZIP_MIN_SIZE
+        )
+        if inject or compress:
+            body = self._text_body(path, stat, inject, compress)
+            self.send_response(200)
+            self._send_common_headers(content_type, f'{etag[:-1]}-gz"' if compress else etag, last_modified)
+            if compress:
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if self.command != 'HEAD':
+                self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self._send_common_headers(content_type, etag, last_modified)
+        self.send_header('Content-Length', str(stat.st_size))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self._stream(path, 0, stat.st_size)
+
+    def _send_common_headers(self, content_type: str, etag: str, last_modified: str):
+        if content_type.startswith('text/'):
+            content_type += '; charset=utf-8'
+        self.send_header('Content-Type', content_type)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Cache-Control', 'no-cache')
+
+    def _not_modified(self, etag: str, mtime: float) -> bool:
+        """If-None-Match / If-Modified-Since を判定"""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags or f'{etag[:-1]}-gz"' in tags
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _text_body(self, path: Path, stat, inject: bool, compress: bool) -> bytes:
+        """本文（ライブリロードの挿入・gzip 圧縮）。圧縮結果はファイルが変わるまで使い回す"""
+        key = (str(path), stat.st_mtime_ns, stat.st_size, inject)
+        if compress:
+            with self._gzip_lock:
+                cached = self._gzip_cache.get(key)
+            if cached is not None:
+                return cached
+
+        body = path.read_bytes()
+        if inject:
+            index = body.rfind(b"</body>")
+            body = body[:index] + LIVERELOAD_SCRIPT + body[index:] if index >= 0 else body + LIVERELOAD_SCRIPT
+        if compress:
+            body = gzip.compress(body, compresslevel=6, mtime=0)
+            with self._gzip_lock:
+                # 古い版を残さないよう同じパスの項目を入れ替える
+                for old_key in [k for k in self._gzip_cache if k[0] == key[0]]:
+                    del self._gzip_cache[old_key]
+                self._gzip_cache[key] = body
+        return body
+
+    def _serve_range(self, path: Path, size: int, range_header: str, content_type: str,
+                     etag: str, last_modified: str):
+        """単一範囲の Range リクエストに 206 で応答"""
+        if_range = self.headers.get('If-Range')
+        match = re.fullmatch(r'bytes=(\d*)-(\d*)', range_header.strip())
+        if (if_range and if_range != etag) or not match or match.groups() == ('', ''):
+            # 複数範囲や条件が合わない場合はファイル全体を返す
+            self.send_response(200)
+            self._send_common_headers(content_type, etag, last_modified)
+            self.send_header('Content-Length', str(size))
+            self.end_headers()
+            if self.command != 'HEAD':
+                self._stream(path, 0, size)
+            return
+
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # bytes=-N は末尾 N バイト
+            start = max(0, size - int(last))
+            end = size - 1
+        if start >= size or start > end:
+            self.send_response(416)
+            self.send_header('Content-Range', f"bytes */{size}")
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(206)
+        self._send_common_headers(content_type, etag, last_modified)
+        self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self._stream(path, start, end - start + 1)
+
+    def _stream(self, path: Path, offset: int, length: int):
+        """ファイルの一部を少しずつ送信"""
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            while length > 0:
+                chunk = f.read(min(STREAM_CHUNK_SIZE, length))
+                if not chunk:
+                    break
+                try:
+                    self.wfile.write(chunk)
+                except (BrokenPipeError, ConnectionResetError):
+                    return  # シーク時にブラウザが接続を切るのは正常
+                length -= len(chunk)
+
+    def _serve_events(self):
+        """ライブリロード用の Server-Sent Events"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.close_connection = True
+        version = self.notifier.version
+        try:
+            while True:
+                current = self.notifier.wait(version, LIVERELOAD_PING)
+                if current != version:
+                    version = current
+                    self.wfile.write(b"data: reload\n\n")
+                else:
+                    self.wfile.write(b": ping\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def make_server(port: int = 8000, root: Path = BASE_DIR, notifier: Optional[ReloadNotifier] = None,
+                livereload: bool = True) -> ThreadingHTTPServer:
+    """
+    プレビューサーバーを作成（serve_forever() は呼び出し側で実行）
+
+    Args:
+        port: 待ち受けポート（0 なら空きポート）
+        root: 公開するディレクトリ
+        notifier: ライブリロードの通知（None ならライブリロードなし）
+        livereload: HTML にライブリロードのスクリプトを挿入するかどうか
+
+    Returns:
+        ThreadingHTTPServer
+    """
+    handler = type('Handler', (PreviewHandler,), {
+        'root': Path(root), 'notifier': notifier, 'livereload': livereload,
+        '_gzip_cache': {}, '_gzip_lock': threading.Lock(),
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    """メイン処理"""
+    from generate import today_str
+
+    parser = argparse.ArgumentParser(description="ローカルプレビューサーバー（変更を監視して再ビルド）")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--date", default=today_str(), help="ビルドする記事の日付（省略時は今日）")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL,
+                        help="ポーリング時に変更を確認する間隔（秒）")
+    parser.add_argument("--jobs", type=int, help="ビルドの並列数")
+    parser.add_argument("--no-watch", action="store_true", help="変更を監視しない（配信のみ）")
+    args = parser.parse_args()
+
+    # generate.py はカレントディレクトリからの相対パスで index.html を読み書きする
+    os.chdir(BASE_DIR)
+
+    notifier = None
+    if not args.no_watch:
+        notifier = ReloadNotifier()
+        rebuild(args.date, args.jobs)
+        Watcher(notifier, args.date, args.interval, args.jobs).start()
+
+    server = make_server(args.port, BASE_DIR, notifier)
+    print(f"プレビュー: http://127.0.0.1:{server.server_port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+スライド動画生成モジュール
+
+記事の内容をスライド（タイトル・本文・買い目）に分け、ナレーションの長さに
+合わせて切り替わる動画を生成します。フレームは Pillow で描画し、RGB の生データを
+ffmpeg の標準入力に直接流し込むため、一時ファイルは作りません。
+"""
+
+import subprocess
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional
+
+from media_config import STILL_X264_PRESET, THUMBNAIL_BG_COLOR, probe_duration, require_capability
+from pipeline import track_process
+
+if TYPE_CHECKING:
+    # youtube_video_generator.py がこのモジュールを読み込むので、実行時にはインポートしない
+    from youtube_video_generator import VideoGenerator
+
+# スライド動画のフレームレート（スライドの切り替え精度 = 1 / SLIDE_FPS 秒）
+SLIDE_FPS = 2
+
+# 1枚のスライドに表示する最大行数
+SLIDE_MAX_LINES = 8
+
+
+class SlideRenderer:
+    """スライド描画・動画生成クラス"""
+
+    def __init__(self, generator: 'VideoGenerator', size: tuple = (1280, 720), fps: int = SLIDE_FPS):
+        """
+        初期化
+
+        Args:
+            generator: サムネイル描画とフォントを共有する VideoGenerator
+            size: フレームサイズ（幅, 高さ）
+            fps: フレームレート
+        """
+        self.generator = generator
+        self.size = size
+        self.fps = fps
+        # スライド内容 → 描画済みフレーム（RGBバイト列）
+        self._frames = {}
+
+    def build_slides(self, text_data: dict) -> List[dict]:
+        """
+        抽出済みの記事情報からスライドの一覧を作成
+
+        各スライドは 'heading'（見出し）, 'lines'（本文の行）,
+        'narration'（対応するナレーション）を持つ辞書。
+
+        Args:
+            text_data: VideoGenerator.extract_text_from_html() の戻り値
+
+        Returns:
+            スライドのリスト
+        """
+        slides = [{
+            'heading': None,  # None はサムネイルと同じタイトルスライド
+            'lines': [text_data['date']],
+            'narration': text_data['title'],
+        }]
+
+        content = text_data.get('content', "")
+        sentences = [s.strip() + "。" for s in content.split("。") if s.strip()]
+        for start in range(0, len(sentences), SLIDE_MAX_LINES):
+            chunk = sentences[start:start + SLIDE_MAX_LINES]
+            slides.append({
+                'heading': text_data['title'],
+                'lines': chunk,
+                'narration': "".join(chunk),
+            })
+
+        # 買い目（抽出できた場合のみ）
+        bets = text_data.get('bets')
+        if bets:
+            slides.append({
+                'heading': "買い目",
+                'lines': list(bets),
+                'narration': "買い目は、" + "、".join(bets) + "です。",
+            })
+        return slides
+
+    def assign_durations(self, slides: List[dict], total_duration: float) -> List[dict]:
+        """
+        ナレーションの文字数に比例して各スライドの表示時間を割り当てる
+
+        Args:
+            slides: スライドのリスト
+            total_duration: 音声全体の長さ（秒）
+
+        Returns:
+            'duration' を設定したスライドのリスト
+        """
+        weights = [max(len(slide.get('narration') or ""), 1) for slide in slides]
+        total_weight = sum(weights)
+        for slide, weight in zip(slides, weights):
+            slide['duration'] = total_duration * weight / total_weight
+        return slides
+
+    def render_frame(self, slide: dict) -> bytes:
+        """
+        スライドを1フレーム分のRGBバイト列として描画（同じ内容は再描画しない）
+
+        Args:
+            slide: スライド
+
+        Returns:
+            幅×高さ×3 バイトのRGBデータ
+        """
+        key = (slide.get('heading'), tuple(slide.get('lines', [])))
+        frame = self._frames.get(key)
+        if frame is not None:
+            return frame
+
+        from PIL import Image, ImageDraw
+
+        width, height = self.size
+        if slide.get('heading') is None:
+            img = self.generator.render_thumbnail(slide['lines'][0], self.size)
+        else:
+            img = Image.new('RGB', self.size, THUMBNAIL_BG_COLOR)
+            draw = ImageDraw.Draw(img)
+            fonts = self.generator.load_fonts()
+            self.generator.draw_centered_text(draw, slide['heading'], 40, fonts['medium'], width)
+
+            y = 140
+            for line in slide.get('lines', []):
+                for wrapped in self._wrap(draw, line, fonts['small'], width - 120):
+                    if y > height - 60:
+                        break
+                    draw.text((60, y), wrapped, fill=(255, 255, 255), font=fonts['small'])
+                    y += 52
+
+        frame = img.convert('RGB').tobytes()
+        self._frames[key] = frame
+        return frame
+
+    @staticmethod
+    def _wrap(draw, text: str, font, max_width: int) -> List[str]:
+        """日本語を含むテキストを文字単位で折り返す"""
+        lines = []
+        current = ""
+        for char in text:
+            candidate = current + char
+            bbox = draw.textbbox((0, 0), candidate, font=font)
+            if current and bbox[2] - bbox[0] > max_width:
+                lines.append(current)
+                current = char
+            else:
+                current = candidate
+        if current:
+            lines.append(current)
+        return lines
+
+    def create_slide_video(self, slides: List[dict], audio_path: Path, output_path: Path,
+                           total_duration: Optional[float] = None) -> bool:
+        """
+        スライドと音声から動画を生成
+
+        フレームは ffmpeg の標準入力に rawvideo として書き込む。連続する同じスライドの
+        フレームは同じバイト列オブジェクトをそのまま書き込むだけで、再描画しない。
+
+        Args:
+            slides: スライドのリスト（'duration' が無ければ音声の長さから割り当てる）
+            audio_path: 音声ファイルパス
+            output_path: 出力動画ファイルパス
+            total_duration: 音声の長さ（秒）。省略時は ffmpeg で取得
+
+        Returns:
+            成功したかどうか
+        """
+        if not require_capability('ffmpeg', "ffmpeg") or not require_capability('pil', "Pillow"):
+            return False
+
+        if any('duration' not in slide for slide in slides):
+            if total_duration is None:
+                total_duration = probe_duration(audio_path)
+            if total_duration is None:
+                print(f"動画生成エラー: 音声の長さを取得できません: {audio_path}")
+                return False
+            self.assign_durations(slides, total_duration)
+
+        width, height = self.size
+        cmd = [
+            'ffmpeg',
+            '-y',
+            '-loglevel', 'error',
+            '-f', 'rawvideo',
+            '-pix_fmt', 'rgb24',
+            '-s', f"{width}x{height}",
+            '-framerate', str(self.fps),
+            '-i', '-',
+            '-i', str(audio_path),
+            '-map', '0:v:0',
+            '-map', '1:a:0',
+            '-c:v', 'libx264',
+            '-preset', STILL_X264_PRESET,
+            '-tune', 'stillimage',
+            '-pix_fmt', 'yuv420p',
+            *self.generator._audio_codec_args(audio_path),
+            '-shortest',
+            '-movflags', '+faststart',
+            *self.generator.thread_args(),
+            str(output_path)
+        ]
+
+        try:
+            process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError as e:
+            print(f"動画生成エラー: {e}")
+            return False
+
+        # パイプラインの他のステージが失敗したら ffmpeg を終了させる（書き込みは BrokenPipeError になる）
+        with track_process(process):
+            # 標準エラー出力が詰まって書き込みが止まらないよう別スレッドで読み捨てる
+            stderr_chunks = []
+            reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()))
+            reader.start()
+
+            try:
+                # 累積時間からフレーム数を決め、丸め誤差が積み重ならないようにする
+                elapsed = 0.0
+                written = 0
+                for slide in slides:
+                    frame = self.render_frame(slide)
+                    elapsed += slide['duration']
+                    end_frame = round(elapsed * self.fps)
+                    for _ in range(end_frame - written):
+                        process.stdin.write(frame)
+                    written = max(written, end_frame)
+                process.stdin.close()
+            except BrokenPipeError:
+                pass  # ffmpeg が先に終了した場合は終了コードで判定する
+            except Exception as e:
+                process.kill()
+                reader.join()
+                print(f"動画生成エラー: {e}")
+                return False
+
+            returncode = process.wait()
+            reader.join()
+        if returncode != 0:
+            stderr = b"".join(stderr_chunks).decode('utf-8', errors='replace')
+            print(f"動画生成エラー: {stderr}")
+            return False
+
+        print(f"動画ファイルを生成しました: {output_path}")
+        return True
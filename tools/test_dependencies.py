@@ -27,14 +27,17 @@ try:
 except Exception as e:
     print(f"   ✗ Pillow エラー: {e}")
 
-# 3. moviepy
-print("\n3. moviepy のテスト...")
+# 3. ffmpeg（動画生成に使用）
+print("\n3. ffmpeg のテスト...")
 try:
-    from moviepy.editor import ImageClip, AudioFileClip
-    print("   ✓ moviepy インポート成功")
-    print("   ✓ moviepy 利用可能")
+    import subprocess
+    result = subprocess.run(['ffmpeg', '-hide_banner', '-version'], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or "ffmpeg -version が失敗しました")
+    print("   ✓ ffmpeg 実行成功")
+    print(f"   ✓ {result.stdout.splitlines()[0]}")
 except Exception as e:
-    print(f"   ✗ moviepy エラー: {e}")
+    print(f"   ✗ ffmpeg エラー: {e}")
 
 # 4. Google API Client
 print("\n4. Google API Client のテスト...")
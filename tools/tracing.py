@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+計測モジュール（スパン・カウンタ・プロファイル）
+
+各ツールの処理を「スパン」（名前付きの区間の所要時間）と「カウンタ」（書き込んだバイト数・
+スキップしたファイル数など）で記録し、終了時に次の形式で書き出します。
+
+- Chrome トレース形式の JSON（chrome://tracing や https://ui.perfetto.dev で表示）
+- Prometheus の textfile 形式（node_exporter の textfile collector で収集）
+
+環境変数を設定したときだけ有効になり、設定しなければ記録はほぼ無処理です。
+
+    TRACE_DIR=.cache/trace python tools/build.py              # .cache/trace/build.trace.json と build.prom
+    METRICS_DIR=/var/lib/node_exporter python tools/build.py  # .prom だけを別の場所に
+    TRACE_DIR=.cache/trace TRACE_PROFILE='video.thumbnail,tts.*' python tools/youtube_video_generator.py
+                                                              # 該当スパンの cProfile を profiles/ に保存
+
+スパン名の ':' 以降は個別の対象（'tts.chunk:gtts' など）を表し、
+Prometheus へは ':' より前の名前で集計して書き出します。
+
+使い方:
+    python tools/tracing.py summary .cache/trace/build.trace.json   # スパンごとの合計時間
+"""
+
+import argparse
+import atexit
+import contextlib
+import fnmatch
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 設定
+TRACE_DIR_ENV = "TRACE_DIR"
+METRICS_DIR_ENV = "METRICS_DIR"
+PROFILE_ENV = "TRACE_PROFILE"
+METRIC_PREFIX = "tools"
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def _label_value(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    return ",".join(f'{_metric_name(key)}="{_label_value(value)}"' for key, value in sorted(labels.items()))
+
+
+class Tracer:
+    """スパンとカウンタの記録"""
+
+    def __init__(self, tool: str, trace_dir: Optional[Path] = None, metrics_dir: Optional[Path] = None,
+                 profile: Optional[List[str]] = None):
+        """
+        初期化
+
+        Args:
+            tool: ツール名（出力ファイル名と Prometheus の tool ラベルに使う）
+            trace_dir: Chrome トレースとプロファイルの出力先（None なら書き出さない）
+            metrics_dir: Prometheus textfile の出力先（None なら書き出さない）
+            profile: cProfile を取るスパン名のパターン（fnmatch）
+        """
+        self.tool = tool
+        self.trace_dir = Path(trace_dir) if trace_dir else None
+        self.metrics_dir = Path(metrics_dir) if metrics_dir else None
+        self.profile = list(profile or [])
+        self.enabled = bool(self.trace_dir or self.metrics_dir)
+        self.started = time.time()
+        self._events = []
+        self._counters = {}  # (名前, ラベルのタプル) → 値
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profile_seq = 0
+
+    # --- 記録 ---
+
+    @contextlib.contextmanager
+    def _span(self, name: str, args: dict):
+        profiler = self._start_profile(name)
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            if profiler:
+                self._save_profile(name, profiler)
+            event = {'name': name, 'ph': 'X', 'ts': start / 1000, 'dur': (end - start) / 1000,
+                     'pid': os.getpid(), 'tid': threading.get_ident()}
+            if args:
+                event['args'] = args
+            with self._lock:
+                self._events.append(event)
+
+    def span(self, name: str, **args):
+        """
+        区間の所要時間を記録するコンテキストマネージャ
+
+        Args:
+            name: スパン名（'video.thumbnail', 'tts.chunk:gtts' など）
+            **args: トレースに残す付加情報
+
+        Returns:
+            コンテキストマネージャ
+        """
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._span(name, args)
+
+    def count(self, name: str, value: float = 1, **labels):
+        """
+        カウンタに加算
+
+        Args:
+            name: カウンタ名（'bytes_written', 'files_skipped' など）
+            value: 加算する値
+            **labels: Prometheus のラベル
+        """
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            total = self._counters[key]
+            self._events.append({'name': name, 'ph': 'C', 'ts': time.perf_counter_ns() / 1000,
+                                 'pid': os.getpid(), 'args': {_format_labels(dict(key[1])) or name: total}})
+
+    # --- プロファイル ---
+
+    def _start_profile(self, name: str):
+        """name がプロファイル対象なら cProfile を開始（入れ子の内側では取らない）"""
+        if not self.profile or getattr(self._local, 'profiling', False):
+            return None
+        if not any(fnmatch.fnmatch(name, pattern) for pattern in self.profile):
+            return None
+        import cProfile
+
+        profiler = cProfile.Profile()
+        self._local.profiling = True
+        profiler.enable()
+        return profiler
+
+    def _save_profile(self, name: str, profiler):
+        profiler.disable()
+        self._local.profiling = False
+        with self._lock:
+            self._profile_seq += 1
+            seq = self._profile_seq
+        profile_dir = (self.trace_dir or self.metrics_dir) / "profiles"
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        safe_name = re.sub(r'[^\w.-]', '_', name)
+        profiler.dump_stats(str(profile_dir / f"{self.tool}.{safe_name}.{os.getpid()}.{seq}.prof"))
+
+    # --- プロセス間の受け渡し ---
+
+    def mark(self) -> Tuple[int, dict]:
+        """ここまでの記録の位置（snapshot() に渡す）"""
+        with self._lock:
+            return len(self._events), dict(self._counters)
+
+    def snapshot(self, mark: Tuple[int, dict]) -> dict:
+        """mark() 以降の記録を取り出す（取り出した分はこのプロセスから消す）"""
+        start, counters = mark
+        with self._lock:
+            events = self._events[start:]
+            del self._events[start:]
+            deltas = {key: value - counters.get(key, 0) for key, value in self._counters.items()
+                      if value != counters.get(key, 0)}
+            self._counters = counters
+        return {'events': events, 'counters': list(deltas.items())}
+
+    def merge(self, payload: Optional[dict]):
+        """別プロセスで snapshot() した記録を取り込む"""
+        if not payload or not self.enabled:
+            return
+        with self._lock:
+            self._events.extend(payload['events'])
+            for key, value in payload['counters']:
+                key = (key[0], tuple(tuple(label) for label in key[1]))
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    # --- 書き出し ---
+
+    def chrome_trace(self) -> dict:
+        """Chrome トレース形式"""
+        with self._lock:
+            events = list(self._events)
+        pids = sorted({event['pid'] for event in events} | {os.getpid()})
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': pid,
+                     'args': {'name': self.tool if pid == os.getpid() else f"{self.tool} worker {pid}"}}
+                    for pid in pids]
+        return {'traceEvents': metadata + events, 'displayTimeUnit': 'ms',
+                'otherData': {'tool': self.tool, 'started': self.started}}
+
+    def prometheus(self) -> str:
+        """Prometheus の textfile 形式"""
+        with self._lock:
+            events = list(self._events)
+            counters = dict(self._counters)
+
+        span_seconds, span_calls = {}, {}
+        for event in events:
+            if event['ph'] != 'X':
+                continue
+            key = event['name'].split(':', 1)[0]
+            span_seconds[key] = span_seconds.get(key, 0.0) + event['dur'] / 1e6
+            span_calls[key] = span_calls.get(key, 0) + 1
+
+        tool = {'tool': self.tool}
+        lines = []
+
+        def family(name: str, kind: str, help_text: str, samples):
+            metric = f"{METRIC_PREFIX}_{_metric_name(name)}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for labels, value in samples:
+                lines.append(f"{metric}{{{_format_labels({**tool, **labels})}}} {_format_value(value)}")
+
+        family("span_seconds_total", "counter", "Total time spent in spans.",
+               [({'span': key}, value) for key, value in sorted(span_seconds.items())])
+        family("span_calls_total", "counter", "Number of completed spans.",
+               [({'span': key}, value) for key, value in sorted(span_calls.items())])
+        by_name = {}
+        for (name, labels), value in counters.items():
+            by_name.setdefault(name, []).append((dict(labels), value))
+        for name, samples in sorted(by_name.items()):
+            family(f"{name}_total", "counter", f"Counter {name}.",
+                   sorted(samples, key=lambda sample: sorted(sample[0].items())))
+        family("run_duration_seconds", "gauge", "Wall time of the last run.",
+               [({}, time.time() - self.started)])
+        family("last_run_timestamp_seconds", "gauge", "Unix time when the last run finished.",
+               [({}, time.time())])
+        return "\n".join(lines) + "\n"
+
+    def export(self) -> List[Path]:
+        """出力先が設定されていれば書き出す（書き出したパスのリストを返す）"""
+        written = []
+        outputs = []
+        if self.trace_dir:
+            outputs.append((self.trace_dir / f"{self.tool}.trace.json",
+                            lambda: json.dumps(self.chrome_trace(), ensure_ascii=False)))
+        if self.metrics_dir:
+            outputs.append((self.metrics_dir / f"{self.tool}.prom", self.prometheus))
+        for path, render in outputs:
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # textfile collector が書きかけを読まないよう一時ファイルから置き換える
+                tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+                tmp_path.write_text(render(), encoding='utf-8')
+                os.replace(tmp_path, path)
+                written.append(path)
+            except OSError as e:
+                print(f"計測結果の書き出しに失敗しました: {path}: {e}", file=sys.stderr)
+        return written
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """プロセス内で共有する Tracer（初回に環境変数から設定し、有効なら終了時に書き出す）"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            trace_dir = os.environ.get(TRACE_DIR_ENV) or None
+            metrics_dir = os.environ.get(METRICS_DIR_ENV) or trace_dir
+            profile = [p.strip() for p in os.environ.get(PROFILE_ENV, "").split(",") if p.strip()]
+            tool = Path(sys.argv[0]).stem if sys.argv else ""
+            # python -c や標準入力から実行した場合（'-c', '-'）は python とする
+            if not re.fullmatch(r'\w[\w.-]*', tool):
+                tool = "python"
+            _tracer = Tracer(tool, trace_dir, metrics_dir, profile)
+            if _tracer.enabled:
+                atexit.register(_tracer.export)
+        return _tracer
+
+
+def enabled() -> bool:
+    """計測が有効か"""
+    return get_tracer().enabled
+
+
+def span(name: str, **args):
+    """Tracer.span() のショートカット"""
+    return get_tracer().span(name, **args)
+
+
+def count(name: str, value: float = 1, **labels):
+    """Tracer.count() のショートカット"""
+    get_tracer().count(name, value, **labels)
+
+
+def traced(name: str):
+    """関数全体をスパンとして記録するデコレータ"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def call_in_worker(name: str, func: Callable, *args):
+    """
+    プロセスプールで func を実行し、記録を親プロセスに返す
+
+    Args:
+        name: スパン名
+        func: 実行する関数（pickle できること）
+        *args: func の引数
+
+    Returns:
+        (func の結果, 記録)。親プロセスで get_tracer().merge(記録) する
+    """
+    tracer = get_tracer()
+    # fork したワーカーは親の記録を引き継いでいるので、この呼び出しの分だけを返す
+    position = tracer.mark()
+    with tracer.span(name):
+        value = func(*args)
+    return value, tracer.snapshot(position)
+
+
+def summarize(trace: dict) -> List[dict]:
+    """
+    Chrome トレースをスパン名（':' より前）ごとに集計
+
+    Returns:
+        'span', 'calls', 'total', 'max'（秒）の辞書のリスト（合計時間の降順）
+    """
+    rows = {}
+    for event in trace.get('traceEvents', []):
+        if event.get('ph') != 'X':
+            continue
+        key = event['name'].split(':', 1)[0]
+        row = rows.setdefault(key, {'span': key, 'calls': 0, 'total': 0.0, 'max': 0.0})
+        seconds = event['dur'] / 1e6
+        row['calls'] += 1
+        row['total'] += seconds
+        row['max'] = max(row['max'], seconds)
+    return sorted(rows.values(), key=lambda row: row['total'], reverse=True)
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="計測結果の表示")
+    sub = parser.add_subparsers(dest="command", required=True)
+    summary = sub.add_parser("summary", help="スパンごとの合計時間を表示")
+    summary.add_argument("trace", type=Path, help="Chrome トレース形式の JSON")
+    summary.add_argument("--top", type=int, default=20, help="表示する件数")
+    args = parser.parse_args()
+
+    with open(args.trace, 'r', encoding='utf-8') as f:
+        rows = summarize(json.load(f))
+    if not rows:
+        print("スパンが記録されていません")
+        return
+    width = max(len(row['span']) for row in rows[:args.top])
+    print(f"{'スパン':<{width - 3}}  {'回数':>4}  {'合計':>7}  {'最大':>7}")
+    for row in rows[:args.top]:
+        print(f"{row['span']:<{width}}  {row['calls']:>6}  {row['total']:>8.3f}s  {row['max']:>8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
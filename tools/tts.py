@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+音声合成（TTS）モジュール
+
+台本を文単位のチャンクに分け、チャンクごとに (テキスト, 声, バックエンド) の
+ハッシュでキャッシュします。未キャッシュのチャンクだけを並列に合成し、
+再エンコードせずに連結して1つの音声ファイルにします。
+
+バックエンド:
+    gtts   - Google Text-to-Speech（ネットワークが必要、MP3）
+    espeak - espeak-ng / espeak（オフライン、WAV。テスト用）
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+from media_config import CACHE_DIR, require_capability
+from pipeline import cancel_scope, current_cancel, run_command
+from tracing import count, span
+
+TTS_CACHE_DIR = CACHE_DIR / "tts"
+
+# 1チャンクの最大文字数（文の途中で切る場合の上限）
+MAX_CHUNK_CHARS = 200
+
+# 並列に合成するチャンク数
+SYNTH_WORKERS = 4
+
+# 文の区切り（区切り文字は前の文に含める）
+SENTENCE_PATTERN = re.compile(r'[^。．！？!?\n]*[。．！？!?\n]+|[^。．！？!?\n]+$')
+
+
+def split_sentences(text: str, max_chars: int = MAX_CHUNK_CHARS) -> List[str]:
+    """
+    台本を文単位のチャンクに分割
+
+    Args:
+        text: 台本
+        max_chars: 1チャンクの最大文字数（これより長い文は強制的に分割）
+
+    Returns:
+        チャンクのリスト
+    """
+    chunks = []
+    for sentence in SENTENCE_PATTERN.findall(text):
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            chunks.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if sentence:
+            chunks.append(sentence)
+    return chunks
+
+
+class TTSBackend:
+    """TTS バックエンドの基底クラス"""
+
+    name = ""
+    extension = ""
+
+    def __init__(self, voice: str = 'ja'):
+        """
+        初期化
+
+        Args:
+            voice: 声（言語コードなど、バックエンドごとの指定）
+        """
+        self.voice = voice
+
+    def available(self) -> bool:
+        """利用可能か（使えない場合はエラーを表示）"""
+        raise NotImplementedError
+
+    def synthesize(self, text: str, output_path: Path):
+        """1チャンクを合成して output_path に保存（失敗時は例外）"""
+        raise NotImplementedError
+
+    def concatenate(self, chunk_paths: List[Path], output_path: Path):
+        """合成済みのチャンクを再エンコードせずに連結"""
+        raise NotImplementedError
+
+
+class GTTSBackend(TTSBackend):
+    """Google Text-to-Speech（MP3）"""
+
+    name = "gtts"
+    extension = ".mp3"
+
+    def available(self) -> bool:
+        return require_capability('gtts', "gTTS")
+
+    def synthesize(self, text: str, output_path: Path):
+        from gtts import gTTS
+
+        gTTS(text=text, lang=self.voice, slow=False).save(str(output_path))
+
+    def concatenate(self, chunk_paths: List[Path], output_path: Path):
+        # MP3 はフレームの並びなのでバイト列をそのまま連結できる（gTTS 自身も同じ方法）
+        with open(output_path, 'wb') as out:
+            for chunk_path in chunk_paths:
+                with open(chunk_path, 'rb') as f:
+                    shutil.copyfileobj(f, out)
+
+
+class EspeakBackend(TTSBackend):
+    """espeak-ng / espeak（オフライン、WAV）"""
+
+    name = "espeak"
+    extension = ".wav"
+
+    def available(self) -> bool:
+        return require_capability('espeak', "espeak")
+
+    def synthesize(self, text: str, output_path: Path):
+        command = shutil.which('espeak-ng') or shutil.which('espeak')
+        result = run_command([command, '-v', self.voice, '-w', str(output_path), text])
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or "espeak が失敗しました")
+
+    def concatenate(self, chunk_paths: List[Path], output_path: Path):
+        # 同じ設定で合成したPCMなので、サンプルをそのまま連結する
+        with wave.open(str(output_path), 'wb') as out:
+            for i, chunk_path in enumerate(chunk_paths):
+                with wave.open(str(chunk_path), 'rb') as chunk:
+                    if i == 0:
+                        out.setparams(chunk.getparams())
+                    out.writeframes(chunk.readframes(chunk.getnframes()))
+
+
+BACKENDS = {
+    GTTSBackend.name: GTTSBackend,
+    EspeakBackend.name: EspeakBackend,
+}
+
+
+def get_backend(name: Optional[str] = None, voice: str = 'ja') -> TTSBackend:
+    """
+    TTS バックエンドを取得
+
+    Args:
+        name: バックエンド名（省略時は環境変数 TTS_BACKEND、未設定なら gtts）
+        voice: 声
+
+    Returns:
+        TTSBackend
+    """
+    name = name or os.environ.get('TTS_BACKEND') or GTTSBackend.name
+    if name not in BACKENDS:
+        raise ValueError(f"不明な TTS バックエンドです: {name}（{', '.join(BACKENDS)}）")
+    return BACKENDS[name](voice)
+
+
+def chunk_cache_path(backend: TTSBackend, text: str) -> Path:
+    """チャンクのキャッシュファイルのパス（テキスト・声・バックエンドのハッシュ）"""
+    key = "\0".join([backend.name, backend.voice, text])
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return TTS_CACHE_DIR / backend.name / digest[:2] / f"{digest}{backend.extension}"
+
+
+def synthesize(text: str, output_path: Path, backend: TTSBackend,
+               workers: int = SYNTH_WORKERS) -> bool:
+    """
+    台本全体を音声ファイルにする
+
+    Args:
+        text: 台本
+        output_path: 出力ファイルパス
+        backend: TTS バックエンド
+        workers: 並列に合成するチャンク数
+
+    Returns:
+        成功したかどうか
+    """
+    if not backend.available():
+        return False
+
+    chunks = split_sentences(text)
+    if not chunks:
+        print("音声生成エラー: 台本が空です")
+        return False
+
+    chunk_paths = [chunk_cache_path(backend, chunk) for chunk in chunks]
+    # キャッシュにあるチャンクは使ったことを記録し（media_store.py が最後に使った日時として見る）、
+    # 無いもの（media_store.py の整理で消されたものを含む）だけを合成する。同じ文は1回だけ
+    pending = {}
+    for path, chunk in dict(zip(chunk_paths, chunks)).items():
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pending[path] = chunk
+
+    # パイプラインの他のステージが失敗したら、残りのチャンクは合成しない
+    cancel = current_cancel()
+
+    def synthesize_chunk(item):
+        path, chunk = item
+        if cancel is not None and cancel.is_set():
+            raise RuntimeError("キャンセルされました")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 並列実行時に中途半端なファイルをキャッシュとして使わないよう、一時ファイルから置き換える
+        tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp{backend.extension}")
+        try:
+            with cancel_scope(cancel), span(f"tts.chunk:{backend.name}", chars=len(chunk)):
+                backend.synthesize(chunk, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    count("tts_chunks", len(chunks) - len(pending), backend=backend.name, result="cached")
+    count("tts_chunks", len(pending), backend=backend.name, result="synthesized")
+    try:
+        if pending:
+            with span("tts.synthesize", chunks=len(pending)), \
+                    ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                list(pool.map(synthesize_chunk, pending.items()))
+        with span("tts.concatenate", chunks=len(chunk_paths)):
+            backend.concatenate(chunk_paths, output_path)
+    except Exception as e:
+        print(f"音声生成エラー: {e}")
+        return False
+
+    print(f"音声ファイルを生成しました: {output_path}"
+          f"（{len(chunks)}チャンク中 {len(pending)}件を合成）")
+    return True
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+アップロードキュー
+
+複数の動画（レンディション・過去分の一括生成）を SQLite のキューに登録し、
+同時アップロード数と1日の API クォータの範囲内で順に処理します。
+動画は内容のハッシュで重複を除き、結果（動画URL・エラー）を記録します。
+
+使い方:
+    python tools/upload_queue.py add videos/2026-01-29.mp4 --title "..." --description "..."
+    python tools/upload_queue.py run --concurrency 2 --quota 10000
+    python tools/upload_queue.py status
+
+ローカルの代用サーバーに向けて試す場合（認証なし）:
+    YOUTUBE_UPLOAD_URL=http://127.0.0.1:8765/upload/youtube/v3/videos \\
+    YOUTUBE_ACCESS_TOKEN=dummy python tools/upload_queue.py run
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+from resumable_upload import SessionNotStartedError
+
+CACHE_DIR = Path(__file__).parent.parent / ".cache"
+QUEUE_DB = CACHE_DIR / "upload_queue.db"
+
+# videos.insert 1回あたりのクォータ消費量と、1日の上限（YouTube Data API v3 の既定値）。
+# 試行ごとに予約し、API が登録を受け付ける前（認証・セッション開始）に失敗したら戻す
+UPLOAD_QUOTA_COST = 1600
+DEFAULT_DAILY_QUOTA = 10000
+
+# 1件あたりの最大試行回数（超えたら failed）
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    content_hash TEXT NOT NULL UNIQUE,
+    video_path TEXT NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    category_id TEXT NOT NULL,
+    privacy_status TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    video_url TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS uploads_status ON uploads (status, id);
+CREATE TABLE IF NOT EXISTS quota (
+    day TEXT PRIMARY KEY,
+    units INTEGER NOT NULL
+);
+"""
+
+
+def quota_day(now: Optional[datetime] = None) -> str:
+    """クォータの集計日（YouTube のクォータは太平洋時間の0時にリセットされる）"""
+    now = now or datetime.now(timezone.utc)
+    try:
+        from zoneinfo import ZoneInfo
+
+        pacific = ZoneInfo("America/Los_Angeles")
+    except Exception:
+        pacific = timezone(timedelta(hours=-8))  # タイムゾーン情報がない環境では標準時で近似
+    return now.astimezone(pacific).strftime('%Y-%m-%d')
+
+
+def file_hash(path: Path) -> str:
+    """ファイル内容の SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+class UploadQueue:
+    """SQLite に保存するアップロードキュー"""
+
+    def __init__(self, db_path: Path = QUEUE_DB, daily_quota: int = DEFAULT_DAILY_QUOTA,
+                 cost: int = UPLOAD_QUOTA_COST):
+        """
+        初期化
+
+        Args:
+            db_path: データベースのパス
+            daily_quota: 1日に使ってよいクォータ
+            cost: 1回のアップロードで消費するクォータ
+        """
+        self.db_path = Path(db_path)
+        self.daily_quota = daily_quota
+        self.cost = cost
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._db() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # スレッドごとに接続を作る。BEGIN IMMEDIATE で取り出しを排他にする
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @contextmanager
+    def _db(self):
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def add(self, video_path: Path, title: str, description: str,
+            category_id: str = "22", privacy_status: str = "private") -> tuple:
+        """
+        動画をキューに追加（同じ内容の動画が登録済みなら追加しない）
+
+        Returns:
+            (キューのID, 新しく追加したかどうか)
+        """
+        video_path = Path(video_path).resolve()
+        content_hash = file_hash(video_path)
+        now = _now()
+        with self._db() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO uploads (content_hash, video_path, title, description,"
+                " category_id, privacy_status, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (content_hash, str(video_path), title, description, category_id, privacy_status, now, now)
+            )
+            if cursor.rowcount:
+                return cursor.lastrowid, True
+            row = conn.execute("SELECT id FROM uploads WHERE content_hash = ?", (content_hash,)).fetchone()
+            return row['id'], False
+
+    def recover(self) -> int:
+        """前回の実行が途中で終わり 'uploading' のまま残った項目をキューに戻す"""
+        with self._db() as conn:
+            cursor = conn.execute(
+                "UPDATE uploads SET status = 'queued', updated_at = ? WHERE status = 'uploading'",
+                (_now(),)
+            )
+            return cursor.rowcount
+
+    def quota_used(self, day: Optional[str] = None) -> int:
+        """その日に使ったクォータ"""
+        with self._db() as conn:
+            row = conn.execute("SELECT units FROM quota WHERE day = ?", (day or quota_day(),)).fetchone()
+            return row['units'] if row else 0
+
+    def claim(self) -> Optional[dict]:
+        """
+        次の項目を取り出し、クォータを予約する
+
+        Returns:
+            項目の辞書（'quota_day' に予約した集計日）。キューが空、またはクォータが足りない場合はNone
+        """
+        day = quota_day()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM uploads WHERE status = 'queued' ORDER BY id LIMIT 1"
+            ).fetchone()
+            used = conn.execute("SELECT units FROM quota WHERE day = ?", (day,)).fetchone()
+            used = used['units'] if used else 0
+            if row is None or used + self.cost > self.daily_quota:
+                conn.execute("ROLLBACK")
+                return None
+            conn.execute(
+                "INSERT INTO quota (day, units) VALUES (?, ?)"
+                " ON CONFLICT(day) DO UPDATE SET units = units + excluded.units",
+                (day, self.cost)
+            )
+            conn.execute(
+                "UPDATE uploads SET status = 'uploading', attempts = attempts + 1, updated_at = ?"
+                " WHERE id = ?",
+                (_now(), row['id'])
+            )
+            conn.execute("COMMIT")
+            return dict(row, attempts=row['attempts'] + 1, quota_day=day)
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def complete(self, item_id: int, video_url: str):
+        """アップロード成功を記録"""
+        with self._db() as conn:
+            conn.execute(
+                "UPDATE uploads SET status = 'done', video_url = ?, error = NULL, updated_at = ?"
+                " WHERE id = ?",
+                (video_url, _now(), item_id)
+            )
+
+    def fail(self, item_id: int, error: str, attempts: int, refund_day: Optional[str] = None):
+        """
+        アップロード失敗を記録（試行回数が残っていればキューに戻す）
+
+        Args:
+            item_id: 項目のID
+            error: エラーメッセージ
+            attempts: これまでの試行回数
+            refund_day: 予約したクォータを戻す集計日（API が登録を受け付ける前の失敗。None なら戻さない）
+        """
+        status = 'failed' if attempts >= MAX_ATTEMPTS else 'queued'
+        with self._db() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE uploads SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, error, _now(), item_id)
+            )
+            if refund_day is not None:
+                conn.execute(
+                    "UPDATE quota SET units = MAX(units - ?, 0) WHERE day = ?",
+                    (self.cost, refund_day)
+                )
+            conn.execute("COMMIT")
+
+    def items(self) -> list:
+        """全項目（ID順）"""
+        with self._db() as conn:
+            return [dict(row) for row in conn.execute("SELECT * FROM uploads ORDER BY id")]
+
+    def counts(self) -> dict:
+        """状態ごとの件数"""
+        with self._db() as conn:
+            return {row['status']: row['n'] for row in
+                    conn.execute("SELECT status, COUNT(*) AS n FROM uploads GROUP BY status")}
+
+
+def run_queue(queue: UploadQueue, upload_func: Callable[[dict], str], concurrency: int = 2) -> dict:
+    """
+    キューが空になるかクォータを使い切るまで、同時に concurrency 件ずつアップロード
+
+    Args:
+        queue: UploadQueue
+        upload_func: 項目を受け取ってアップロードし、動画URLを返す関数（失敗時は例外。
+            SessionNotStartedError なら API は登録を受け付けていないので、予約したクォータを戻す）
+        concurrency: 同時アップロード数
+
+    Returns:
+        {'done': 成功件数, 'failed': 失敗件数}
+    """
+    recovered = queue.recover()
+    if recovered:
+        print(f"前回中断した {recovered}件をキューに戻しました")
+
+    totals = {'done': 0, 'failed': 0}
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            item = queue.claim()
+            if item is None:
+                return
+            name = Path(item['video_path']).name
+            print(f"アップロード開始: {name}（{item['attempts']}回目）")
+            try:
+                video_url = upload_func(item)
+            except Exception as e:
+                refund_day = item['quota_day'] if isinstance(e, SessionNotStartedError) else None
+                queue.fail(item['id'], str(e), item['attempts'], refund_day)
+                print(f"アップロード失敗: {name}: {e}")
+                with lock:
+                    totals['failed'] += 1
+                continue
+            queue.complete(item['id'], video_url)
+            print(f"アップロード完了: {name} → {video_url}")
+            with lock:
+                totals['done'] += 1
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for future in [pool.submit(worker) for _ in range(max(1, concurrency))]:
+            future.result()
+    return totals
+
+
+def make_upload_func() -> Optional[Callable[[dict], str]]:
+    """
+    アップロード関数を作成
+
+    環境変数 YOUTUBE_ACCESS_TOKEN があればそのトークンで直接送信し（代用サーバーでの確認用）、
+    なければ YouTubeUploader で認証する。
+    """
+    from resumable_upload import ResumableUploader, UploadError
+
+    def metadata(item):
+        return {
+            'snippet': {
+                'title': item['title'],
+                'description': item['description'],
+                'categoryId': item['category_id'],
+            },
+            'status': {'privacyStatus': item['privacy_status']},
+        }
+
+    token = os.environ.get('YOUTUBE_ACCESS_TOKEN')
+    if token:
+        # 全アップロードで1つのクライアントを共有し、接続を使い回す
+        uploader = ResumableUploader(lambda: token)
+
+        def upload_with_token(item):
+            response = uploader.upload(Path(item['video_path']), metadata(item))
+            return f"https://www.youtube.com/watch?v={response['id']}"
+        return upload_with_token
+
+    from youtube_video_generator import YouTubeUploader
+
+    youtube = YouTubeUploader()
+    if not youtube.authenticate():
+        return None
+
+    def upload_with_credentials(item):
+        video_url = youtube.upload_video(Path(item['video_path']), item['title'], item['description'],
+                                         item['category_id'], item['privacy_status'])
+        if not video_url:
+            raise UploadError("アップロードに失敗しました")
+        return video_url
+    return upload_with_credentials
+
+
+def main():
+    """メイン処理"""
+    parser = argparse.ArgumentParser(description="YouTube アップロードキュー")
+    parser.add_argument("--db", type=Path, default=QUEUE_DB, help="キューのデータベース")
+    parser.add_argument("--quota", type=int,
+                        default=int(os.environ.get('YOUTUBE_DAILY_QUOTA') or DEFAULT_DAILY_QUOTA),
+                        help="1日に使ってよいクォータ（環境変数 YOUTUBE_DAILY_QUOTA）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    add = sub.add_parser("add", help="動画をキューに追加")
+    add.add_argument("video", type=Path)
+    add.add_argument("--title", required=True)
+    add.add_argument("--description", default="")
+    add.add_argument("--category", default="22")
+    add.add_argument("--privacy", default="private", choices=["public", "private", "unlisted"])
+
+    run = sub.add_parser("run", help="キューを処理")
+    run.add_argument("--concurrency", type=int, default=2, help="同時アップロード数")
+
+    sub.add_parser("status", help="キューの状態を表示")
+
+    args = parser.parse_args()
+    queue = UploadQueue(args.db, args.quota)
+
+    if args.command == "add":
+        item_id, added = queue.add(args.video, args.title, args.description, args.category, args.privacy)
+        if added:
+            print(f"キューに追加しました: #{item_id} {args.video}")
+        else:
+            print(f"同じ内容の動画が登録済みです: #{item_id}")
+
+    elif args.command == "run":
+        upload_func = make_upload_func()
+        if upload_func is None:
+            print("エラー: YouTube認証に失敗しました")
+            raise SystemExit(1)
+        totals = run_queue(queue, upload_func, args.concurrency)
+        print(f"\n成功: {totals['done']}件 / 失敗: {totals['failed']}件")
+        print(f"本日のクォータ使用量: {queue.quota_used()} / {queue.daily_quota}")
+        if queue.counts().get('queued'):
+            print(f"未処理: {queue.counts()['queued']}件（クォータ回復後に再実行してください）")
+
+    elif args.command == "status":
+        for item in queue.items():
+            result = item['video_url'] or item['error'] or ""
+            print(f"#{item['id']:<4} {item['status']:<10} {Path(item['video_path']).name}  {result}")
+        print(f"\n本日のクォータ使用量: {queue.quota_used()} / {queue.daily_quota}")
+
+
+if __name__ == "__main__":
+    main()
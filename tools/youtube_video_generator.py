@@ -8,67 +8,111 @@ YouTube動画自動生成スクリプト
 import os
 import sys
 from datetime import datetime, timezone, timedelta
+import functools
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
+import hashlib
 import json
-import re
-
-# 外部ライブラリのインポート（インストール後に有効化）
-try:
-    from gtts import gTTS
-    GTTS_AVAILABLE = True
-except ImportError:
-    GTTS_AVAILABLE = False
-    print("警告: gTTS がインストールされていません。音声生成には pip install gtts が必要です。")
-
-# moviepyの代わりにffmpegコマンドを直接使用
-import subprocess
-FFMPEG_AVAILABLE = True
-try:
-    result = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True)
-    if result.returncode != 0:
-        FFMPEG_AVAILABLE = False
-        print("警告: ffmpeg がインストールされていません。動画生成には ffmpeg が必要です。")
-except FileNotFoundError:
-    FFMPEG_AVAILABLE = False
-    print("警告: ffmpeg が見つかりません。動画生成には ffmpeg のインストールが必要です。")
-
-try:
-    from PIL import Image, ImageDraw, ImageFont
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
-    print("警告: Pillow がインストールされていません。画像生成には pip install Pillow が必要です。")
-
-try:
-    from google.oauth2.credentials import Credentials
-    from google_auth_oauthlib.flow import InstalledAppFlow
-    from google.auth.transport.requests import Request
-    from googleapiclient.discovery import build
-    from googleapiclient.http import MediaFileUpload
-    YOUTUBE_API_AVAILABLE = True
-except ImportError:
-    YOUTUBE_API_AVAILABLE = False
-    print("警告: Google API Client がインストールされていません。YouTube アップロードには pip install google-auth-oauthlib google-api-python-client が必要です。")
-
+import threading
+import time
+
+from media_config import (
+    AUDIO_DIR,
+    IMAGE_DIR,
+    STILL_TRACK_DIR,
+    STILL_X264_PRESET,
+    THUMBNAIL_BG_COLOR,
+    VIDEO_DIR,
+    probe_duration,
+    require_capability,
+)
+from pipeline import run_command
+from tracing import count, span, traced
+
+# gTTS・Pillow・Google API Client・ffmpeg は重いため、インポート時には読み込まない。
+# 各ステージで初めて必要になった時点で require_capability() により確認する（media_config.py）。
 
 # 設定
 JST = timezone(timedelta(hours=9))
-VIDEO_DIR = Path(__file__).parent.parent / "videos"
-AUDIO_DIR = Path(__file__).parent.parent / "audio"
-IMAGE_DIR = Path(__file__).parent.parent / "images"
+
+# 静止画動画の高速モード設定
+STILL_FPS = 1  # 静止画なので 1fps で十分
+STILL_SEGMENT_SECONDS = 10  # キャッシュする映像トラックの長さ（ループして使用）
+
+# サムネイルの文字色（背景色は media_config.py）
+THUMBNAIL_TEXT_COLOR = (255, 255, 255)
+
+# サムネイルの静的なレイヤー（毎回同じタイトル）と、出力ごとに変わる日付の位置
+THUMBNAIL_TITLE = "競艇予想"
+THUMBNAIL_TITLE_Y = 200
+THUMBNAIL_DATE_Y = 400
+
+# サムネイルの PNG の圧縮レベル（パレット画像なので 3 でも数KB。既定の 6 より速い）
+THUMBNAIL_PNG_COMPRESS_LEVEL = 3
+
+# サムネイル・スライドに使うフォント（太字, 通常）。先に見つかったものを使う
+FONT_CANDIDATES = [
+    ("/usr/share/fonts/opentype/noto/NotoSansCJK-Bold.ttc",
+     "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc"),
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+     "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"),
+]
+
+# 出力する動画の種類（名前 → 幅, 高さ）。landscape 以外はファイル名に名前が付く
+RENDITIONS = {
+    'landscape': (1280, 720),
+    'shorts': (1080, 1920),
+}
 
 # YouTube API設定
 SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
 CLIENT_SECRETS_FILE = Path(__file__).parent.parent / "client_secrets.json"
 TOKEN_FILE = Path(__file__).parent.parent / "token.json"
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)  # 期限切れの何分前にトークンを更新するか
+
+
+@lru_cache(maxsize=None)
+def _thumbnail_palette(bg: tuple, fg: tuple) -> list:
+    """文字の濃さ 0〜255 → 背景色と文字色を混ぜた色（Pillow が RGB で文字を描くときと同じ丸め）"""
+    palette = []
+    for alpha in range(256):
+        palette += [round(b + (f - b) * alpha / 255) for b, f in zip(bg, fg)]
+    return palette
 
 
 class VideoGenerator:
     """動画生成クラス"""
 
-    def __init__(self):
-        """初期化"""
+    # サムネイルの静的なレイヤー（テンプレートのハッシュ → 描画済みのマスク）。プロセス内で共有する
+    _thumbnail_bases = {}
+    _thumbnail_lock = threading.Lock()
+
+    def __init__(self, renditions: Optional[dict] = None, threads: Optional[int] = None,
+                 tts_backend: Optional[str] = None, slides: bool = False):
+        """
+        初期化
+
+        Args:
+            renditions: create_renditions() で出力する動画の種類（名前 → (幅, 高さ)）。
+                        省略時は RENDITIONS のすべて
+            threads: ffmpeg のエンコードスレッド数（省略時は ffmpeg に任せる）
+            tts_backend: 音声合成のバックエンド名（省略時は環境変数 TTS_BACKEND、なければ gtts）
+            slides: 静止画のサムネイルではなく、ナレーションに合わせて切り替わる
+                    スライド（slide_renderer.py）で動画を作るか
+
+        Raises:
+            ValueError: TTS バックエンド名が不明な場合
+        """
+        import tts
+
+        self.renditions = dict(renditions or RENDITIONS)
+        self.threads = threads
+        # 名前の誤りは記事ごとの処理（audio_extension() など）に入る前にここで検出する
+        self.tts_backend = tts.get_backend(tts_backend).name
+        self.slides = slides
+        self._fonts = None
+        self._font_source = None
         self.video_dir = VIDEO_DIR
         self.audio_dir = AUDIO_DIR
         self.image_dir = IMAGE_DIR
@@ -78,62 +122,154 @@ class VideoGenerator:
         self.audio_dir.mkdir(exist_ok=True)
         self.image_dir.mkdir(exist_ok=True)
 
+    @traced("video.extract")
     def extract_text_from_html(self, html_path: Path) -> dict:
         """
         HTMLファイルからテキストを抽出
 
+        post_parser.parse_post() の解析結果（ファイル内容のハッシュでキャッシュ）を使う。
+
         Args:
             html_path: HTMLファイルのパス
 
         Returns:
-            抽出されたテキスト情報の辞書
+            抽出されたテキスト情報の辞書（'title', 'content', 'date',
+            'points', 'bets', 'disclaimer'）
         """
-        with open(html_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
+        from post_parser import parse_post
 
-        # タイトルを抽出
-        title_match = re.search(r'<h1[^>]*>(.*?)</h1>', html_content)
-        title = title_match.group(1) if title_match else "競艇予想"
-
-        # 本文を抽出（HTMLタグを除去）
-        content = re.sub(r'<[^>]+>', '', html_content)
-        content = re.sub(r'\s+', ' ', content).strip()
-
-        # 日付を抽出
-        date_match = re.search(r'(\d{4}-\d{2}-\d{2})', html_path.name)
-        date_str = date_match.group(1) if date_match else datetime.now(JST).strftime('%Y-%m-%d')
+        post = parse_post(html_path)
 
         return {
-            'title': title,
-            'content': content,
-            'date': date_str
+            'title': post['title'] or "競艇予想",
+            'content': " ".join(post['points']),
+            'date': post['date'] or datetime.now(JST).strftime('%Y-%m-%d'),
+            'points': post['points'],
+            'bets': post['bets'],
+            'disclaimer': post['disclaimer'],
         }
 
     def generate_audio(self, text: str, output_path: Path, lang: str = 'ja') -> bool:
         """
         テキストから音声ファイルを生成
 
+        文単位のチャンクごとにキャッシュし、未キャッシュの部分だけを合成する（tts.py）。
+
         Args:
             text: 音声にするテキスト
-            output_path: 出力ファイルパス
+            output_path: 出力ファイルパス（拡張子は audio_extension() に合わせる）
             lang: 言語コード（デフォルト: 'ja'）
 
         Returns:
             成功したかどうか
         """
-        if not GTTS_AVAILABLE:
-            print("エラー: gTTS が利用できません")
-            return False
+        import tts
 
-        try:
-            tts = gTTS(text=text, lang=lang, slow=False)
-            tts.save(str(output_path))
-            print(f"音声ファイルを生成しました: {output_path}")
-            return True
-        except Exception as e:
-            print(f"音声生成エラー: {e}")
-            return False
+        return tts.synthesize(text, output_path, tts.get_backend(self.tts_backend, voice=lang))
+
+    def audio_extension(self) -> str:
+        """使用する TTS バックエンドが出力する音声ファイルの拡張子"""
+        import tts
+
+        return tts.get_backend(self.tts_backend).extension
+
+    def load_fonts(self) -> dict:
+        """
+        サムネイル・スライド用のフォントを読み込み（初回のみ）
+
+        Returns:
+            'large', 'medium', 'small' をキーとするフォントの辞書
+        """
+        if self._fonts is None:
+            from PIL import ImageFont
+
+            # システムフォントを試す（日本語フォントがあれば優先）
+            for bold_path, regular_path in FONT_CANDIDATES:
+                try:
+                    self._fonts = {
+                        'large': ImageFont.truetype(bold_path, 80),
+                        'medium': ImageFont.truetype(regular_path, 50),
+                        'small': ImageFont.truetype(regular_path, 36),
+                    }
+                    self._font_source = bold_path
+                    break
+                except OSError:
+                    continue
+            else:
+                # フォントが見つからない場合はデフォルトフォント
+                default = ImageFont.load_default()
+                self._fonts = {'large': default, 'medium': default, 'small': default}
+                self._font_source = "default"
+        return self._fonts
+
+    @staticmethod
+    def draw_centered_text(draw, text: str, y: int, font, width: int, fill=THUMBNAIL_TEXT_COLOR):
+        """テキストを横方向の中央に描画"""
+        bbox = draw.textbbox((0, 0), text, font=font)
+        text_w = bbox[2] - bbox[0]
+        draw.text(((width - text_w) // 2, y), text, fill=fill, font=font)
+
+    def thumbnail_template_hash(self, size: tuple = (1280, 720)) -> str:
+        """サムネイルの静的なレイヤーを決める設定のハッシュ"""
+        self.load_fonts()
+        template = {'size': list(size), 'bg': THUMBNAIL_BG_COLOR, 'fg': THUMBNAIL_TEXT_COLOR,
+                    'title': THUMBNAIL_TITLE, 'title_y': THUMBNAIL_TITLE_Y, 'font': self._font_source}
+        return hashlib.sha256(json.dumps(template, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    def render_thumbnail_base(self, size: tuple = (1280, 720)):
+        """
+        サムネイルの静的なレイヤー（タイトル）を描画（テンプレートのハッシュごとに1回だけ）
+
+        単色の背景に白い文字だけなので、文字の濃さ（0〜255）のマスクとして持ちます。
+
+        Args:
+            size: 画像サイズ（幅, 高さ）
+
+        Returns:
+            PIL の Image（モード 'L'。呼び出し側で書き換えないこと）
+        """
+        key = self.thumbnail_template_hash(size)
+        cls = type(self)
+        with cls._thumbnail_lock:
+            base = cls._thumbnail_bases.get(key)
+        if base is not None:
+            count("cache_hits", cache="thumbnail_base")
+            return base
+        count("cache_misses", cache="thumbnail_base")
+
+        from PIL import Image, ImageDraw
+
+        base = Image.new('L', size, 0)
+        self.draw_centered_text(ImageDraw.Draw(base), THUMBNAIL_TITLE, THUMBNAIL_TITLE_Y,
+                                self.load_fonts()['large'], size[0], fill=255)
+        with cls._thumbnail_lock:
+            cls._thumbnail_bases[key] = base
+        return base
+
+    def render_thumbnail(self, date: str, size: tuple = (1280, 720)):
+        """
+        サムネイル画像を描画（保存はしない）
+
+        キャッシュした静的なレイヤーに日付の文字だけを重ね、背景色と文字色の
+        256段階のパレット画像にします（RGB で描画した場合と同じ色になる）。
+
+        Args:
+            date: 日付
+            size: 画像サイズ（幅, 高さ）
+
+        Returns:
+            PIL の Image（モード 'P'）
+        """
+        from PIL import ImageDraw
+
+        # 画像サイズ（YouTube推奨: 1280x720）
+        img = self.render_thumbnail_base(size).copy()
+        self.draw_centered_text(ImageDraw.Draw(img), date, THUMBNAIL_DATE_Y, self.load_fonts()['medium'],
+                                size[0], fill=255)
+        img.putpalette(_thumbnail_palette(THUMBNAIL_BG_COLOR, THUMBNAIL_TEXT_COLOR))
+        return img
 
+    @traced("video.thumbnail")
     def create_thumbnail(self, title: str, date: str, output_path: Path) -> bool:
         """
         サムネイル画像を生成
@@ -146,97 +282,100 @@ class VideoGenerator:
         Returns:
             成功したかどうか
         """
-        if not PIL_AVAILABLE:
-            print("エラー: Pillow が利用できません")
+        if not require_capability('pil', "Pillow"):
             return False
 
         try:
-            # 画像サイズ（YouTube推奨: 1280x720）
-            width, height = 1280, 720
-
-            # 背景色（青系）
-            bg_color = (0, 102, 204)
-
-            # 画像作成
-            img = Image.new('RGB', (width, height), bg_color)
-            draw = ImageDraw.Draw(img)
-
-            # テキスト描画
-            # タイトル
-            title_text = "競艇予想"
-            try:
-                # システムフォントを試す
-                font_large = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 80)
-                font_medium = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 50)
-            except:
-                # フォントが見つからない場合はデフォルトフォント
-                font_large = ImageFont.load_default()
-                font_medium = ImageFont.load_default()
-
-            # タイトルを中央に配置
-            title_bbox = draw.textbbox((0, 0), title_text, font=font_large)
-            title_w = title_bbox[2] - title_bbox[0]
-            title_x = (width - title_w) // 2
-            draw.text((title_x, 200), title_text, fill=(255, 255, 255), font=font_large)
-
-            # 日付を配置
-            date_bbox = draw.textbbox((0, 0), date, font=font_medium)
-            date_w = date_bbox[2] - date_bbox[0]
-            date_x = (width - date_w) // 2
-            draw.text((date_x, 400), date, fill=(255, 255, 255), font=font_medium)
+            with span("video.thumbnail.render"):
+                img = self.render_thumbnail(date)
 
             # 保存
-            img.save(output_path)
+            with span("video.thumbnail.encode"):
+                img.save(output_path, 'PNG', compress_level=THUMBNAIL_PNG_COMPRESS_LEVEL)
             print(f"サムネイル画像を生成しました: {output_path}")
             return True
         except Exception as e:
             print(f"画像生成エラー: {e}")
             return False
 
-    def create_video(self, image_path: Path, audio_path: Path, output_path: Path) -> bool:
+    @traced("video.create_video")
+    def create_video(self, image_path: Path, audio_path: Path, output_path: Path,
+                     fast: bool = True) -> bool:
         """
         画像と音声から動画を生成（ffmpegを使用）
 
+        fast=True の場合は静止画の映像トラックを一度だけエンコードしてキャッシュし、
+        音声とはストリームコピーで多重化する。
+
         Args:
             image_path: 画像ファイルパス
             audio_path: 音声ファイルパス
             output_path: 出力動画ファイルパス
+            fast: 静止画キャッシュを使う高速モードにするか
 
         Returns:
             成功したかどうか
         """
-        if not FFMPEG_AVAILABLE:
-            print("エラー: ffmpeg が利用できません")
+        if not require_capability('ffmpeg', "ffmpeg"):
             return False
 
         try:
-            # ffmpegコマンドで画像と音声を結合
-            # -loop 1: 画像をループ
-            # -i image: 入力画像
-            # -i audio: 入力音声
-            # -c:v libx264: H.264ビデオコーデック
-            # -c:a aac: AACオーディオコーデック
-            # -shortest: 音声の長さに合わせる
-            # -pix_fmt yuv420p: 互換性のあるピクセルフォーマット
-            # -r 24: フレームレート24fps
-            cmd = [
-                'ffmpeg',
-                '-y',  # 既存ファイルを上書き
-                '-loop', '1',
-                '-i', str(image_path),
-                '-i', str(audio_path),
-                '-c:v', 'libx264',
-                '-c:a', 'aac',
-                '-b:a', '192k',
-                '-shortest',
-                '-pix_fmt', 'yuv420p',
-                '-r', '24',
-                str(output_path)
-            ]
-
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            if fast:
+                track_path = self.get_still_track(image_path)
+                if track_path is None:
+                    return False
+                duration = probe_duration(audio_path)
+                if duration is None:
+                    print(f"動画生成エラー: 音声の長さを取得できません: {audio_path}")
+                    return False
+                # -stream_loop -1: 短い映像トラックを無限ループ
+                # -c:v copy: 映像は再エンコードしない
+                # -t: 音声の長さに合わせる（ループした入力に -shortest を使うと
+                #     映像が先に多重化されて音声より長くなるため、長さを明示する）
+                cmd = [
+                    'ffmpeg',
+                    '-y',
+                    '-stream_loop', '-1',
+                    '-i', str(track_path),
+                    '-i', str(audio_path),
+                    '-map', '0:v:0',
+                    '-map', '1:a:0',
+                    '-c:v', 'copy',
+                    *self._audio_codec_args(audio_path),
+                    '-t', f"{duration:.3f}",
+                    '-movflags', '+faststart',
+                    str(output_path)
+                ]
+            else:
+                # ffmpegコマンドで画像と音声を結合
+                # -loop 1: 画像をループ
+                # -i image: 入力画像
+                # -i audio: 入力音声
+                # -c:v libx264: H.264ビデオコーデック
+                # -c:a aac: AACオーディオコーデック
+                # -shortest: 音声の長さに合わせる
+                # -pix_fmt yuv420p: 互換性のあるピクセルフォーマット
+                # -r 24: フレームレート24fps
+                cmd = [
+                    'ffmpeg',
+                    '-y',  # 既存ファイルを上書き
+                    '-loop', '1',
+                    '-i', str(image_path),
+                    '-i', str(audio_path),
+                    '-c:v', 'libx264',
+                    '-c:a', 'aac',
+                    '-b:a', '192k',
+                    '-shortest',
+                    '-pix_fmt', 'yuv420p',
+                    '-r', '24',
+                    *self.thread_args(),
+                    str(output_path)
+                ]
+
+            result = run_command(cmd)
 
             if result.returncode == 0:
+                count("bytes_written", Path(output_path).stat().st_size, kind="video")
                 print(f"動画ファイルを生成しました: {output_path}")
                 return True
             else:
@@ -247,55 +386,263 @@ class VideoGenerator:
             print(f"動画生成エラー: {e}")
             return False
 
+    def get_still_track(self, image_path: Path) -> Optional[Path]:
+        """
+        静止画から短い映像トラックを生成（画像のハッシュでキャッシュ）
+
+        低フレームレート・stillimage チューニングで STILL_SEGMENT_SECONDS 秒分だけ
+        エンコードし、動画生成時にループさせて使う。
+
+        Args:
+            image_path: 画像ファイルパス
+
+        Returns:
+            映像トラックのパス（失敗時はNone）
+        """
+        settings = f"{STILL_FPS}:{STILL_SEGMENT_SECONDS}:{STILL_X264_PRESET}:bf0"
+        digest = hashlib.sha256()
+        digest.update(settings.encode('utf-8'))
+        digest.update(Path(image_path).read_bytes())
+        track_path = STILL_TRACK_DIR / f"{digest.hexdigest()[:32]}.mp4"
+        try:
+            os.utime(track_path)  # media_store.py が最後に使った日時として見る
+            count("cache_hits", cache="still_track")
+            return track_path
+        except FileNotFoundError:
+            pass  # 未作成か、media_store.py の整理で消された
+        count("cache_misses", cache="still_track")
+
+        STILL_TRACK_DIR.mkdir(parents=True, exist_ok=True)
+        # 並列実行時に中途半端なファイルを読まないよう一時ファイルに書いてから置き換える
+        tmp_path = track_path.with_name(f"{track_path.stem}.{os.getpid()}.tmp.mp4")
+        cmd = [
+            'ffmpeg',
+            '-y',
+            '-loop', '1',
+            '-framerate', str(STILL_FPS),
+            '-t', str(STILL_SEGMENT_SECONDS),
+            '-i', str(image_path),
+            '-c:v', 'libx264',
+            '-preset', STILL_X264_PRESET,
+            '-tune', 'stillimage',
+            '-g', str(STILL_FPS * STILL_SEGMENT_SECONDS),
+            # B フレームがなければ表示順 = 格納順になり、ループ後に -t で音声の長さ（1フレーム以内）で切れる
+            '-bf', '0',
+            '-pix_fmt', 'yuv420p',
+            '-r', str(STILL_FPS),
+            '-an',
+            *self.thread_args(),
+            str(tmp_path)
+        ]
+        with span("video.still_track"):
+            result = run_command(cmd)
+        if result.returncode != 0:
+            print(f"映像トラック生成エラー: {result.stderr}")
+            tmp_path.unlink(missing_ok=True)
+            return None
+        os.replace(tmp_path, track_path)
+        return track_path
+
+    @staticmethod
+    def rendition_path(output_path: Path, name: str) -> Path:
+        """レンディション名から出力パスを決める（landscape はそのまま）"""
+        output_path = Path(output_path)
+        if name == 'landscape':
+            return output_path
+        return output_path.with_name(f"{output_path.stem}-{name}{output_path.suffix}")
+
+    @traced("video.renditions")
+    def create_renditions(self, image_path: Path, audio_path: Path,
+                          output_path: Path) -> Optional[dict]:
+        """
+        画像と音声から、設定されたすべてのサイズの動画を1回のffmpeg実行で生成
+
+        split/scale/pad のフィルタグラフで各サイズの映像を作り、
+        tee マルチプレクサで1つの音声ストリームを全出力に共有する。
+
+        Args:
+            image_path: 画像ファイルパス
+            audio_path: 音声ファイルパス
+            output_path: 基準となる出力動画ファイルパス（rendition_path() 参照）
+
+        Returns:
+            レンディション名 → 出力パスの辞書（失敗時はNone）
+        """
+        if not require_capability('ffmpeg', "ffmpeg"):
+            return None
+
+        duration = probe_duration(audio_path)
+        if duration is None:
+            print(f"動画生成エラー: 音声の長さを取得できません: {audio_path}")
+            return None
+
+        names = list(self.renditions)
+        pad_color = "0x{:02X}{:02X}{:02X}".format(*THUMBNAIL_BG_COLOR)
+        filters = [f"[0:v]split={len(names)}" + "".join(f"[s{i}]" for i in range(len(names)))]
+        for i, name in enumerate(names):
+            width, height = self.renditions[name]
+            filters.append(
+                f"[s{i}]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:color={pad_color},"
+                f"setsar=1,format=yuv420p[v{i}]"
+            )
+
+        outputs = {name: self.rendition_path(output_path, name) for name in names}
+        tee_targets = "|".join(
+            f"[select=\\'v:{i},a\\':f=mp4:movflags=+faststart]{outputs[name]}"
+            for i, name in enumerate(names)
+        )
+
+        # -t: -loop した画像に -shortest を使うとフィルタのバッファ分だけ長くなるため、
+        #     音声の長さを明示する
+        cmd = [
+            'ffmpeg',
+            '-y',
+            '-loop', '1',
+            '-framerate', str(STILL_FPS),
+            '-t', f"{duration:.3f}",
+            '-i', str(image_path),
+            '-i', str(audio_path),
+            '-filter_complex', ";".join(filters),
+        ]
+        for i in range(len(names)):
+            cmd += ['-map', f"[v{i}]"]
+        cmd += [
+            '-map', '1:a:0',
+            '-c:v', 'libx264',
+            '-preset', STILL_X264_PRESET,
+            '-tune', 'stillimage',
+            '-g', str(STILL_FPS * STILL_SEGMENT_SECONDS),
+            '-r', str(STILL_FPS),
+            *self._audio_codec_args(audio_path),
+            *self.thread_args(),
+            '-f', 'tee',
+            tee_targets
+        ]
+
+        try:
+            result = run_command(cmd)
+        except Exception as e:
+            print(f"動画生成エラー: {e}")
+            return None
+
+        if result.returncode != 0:
+            print(f"動画生成エラー: {result.stderr}")
+            return None
+
+        for path in outputs.values():
+            count("bytes_written", path.stat().st_size, kind="video")
+            print(f"動画ファイルを生成しました: {path}")
+        return outputs
+
+    def create_slide_videos(self, text_data: dict, audio_path: Path, video_paths: dict) -> bool:
+        """
+        記事の内容のスライド動画をレンディションごとに生成（slide_renderer.py）
+
+        Args:
+            text_data: extract_text_from_html() の戻り値
+            audio_path: 音声ファイルパス
+            video_paths: レンディション名 → 出力動画ファイルパス
+
+        Returns:
+            すべて成功したかどうか
+        """
+        from slide_renderer import SlideRenderer
+
+        # 音声の長さは全サイズで同じなので1回だけ調べる
+        duration = probe_duration(audio_path)
+        for name, output_path in video_paths.items():
+            renderer = SlideRenderer(self, self.renditions[name])
+            slides = renderer.build_slides(text_data)
+            if not renderer.create_slide_video(slides, audio_path, output_path, duration):
+                return False
+        return True
+
+    def thread_args(self) -> list:
+        """ffmpeg のスレッド数指定（並列実行時にCPUを分け合うため）"""
+        if self.threads:
+            return ['-threads', str(self.threads)]
+        return []
+
+    @staticmethod
+    def _audio_codec_args(audio_path: Path) -> list:
+        """MP4 にそのまま格納できる音声はコピーし、それ以外は AAC にエンコード"""
+        if Path(audio_path).suffix.lower() in ('.mp3', '.m4a', '.aac'):
+            return ['-c:a', 'copy']
+        return ['-c:a', 'aac', '-b:a', '192k']
+
 
 class YouTubeUploader:
     """YouTube アップローダークラス"""
 
+    # 認証済みのセッション（認証情報・アップロード用クライアント）をプロセス内で共有し、
+    # バッチやキューで動画ごとに認証・クライアント構築をしないようにする
+    _session = None
+    _session_lock = threading.Lock()
+
     def __init__(self):
         """初期化"""
         self.credentials = None
-        self.youtube = None
+        self.uploader = None
 
     def authenticate(self) -> bool:
         """
-        YouTube API の認証
+        YouTube API の認証（同じプロセスで認証済みならそのセッションを使う）
 
         Returns:
             認証が成功したかどうか
         """
-        if not YOUTUBE_API_AVAILABLE:
-            print("エラー: Google API Client が利用できません")
+        cls = type(self)
+        with cls._session_lock:
+            if cls._session is not None:
+                self.credentials, self.uploader = cls._session
+                return True
+
+        if not require_capability('youtube_api', "Google API Client"):
             return False
 
         try:
-            # トークンファイルがあれば読み込み
-            if TOKEN_FILE.exists():
-                self.credentials = Credentials.from_authorized_user_file(str(TOKEN_FILE), SCOPES)
-
-            # 認証情報がないか、無効な場合は再認証
-            if not self.credentials or not self.credentials.valid:
-                if self.credentials and self.credentials.expired and self.credentials.refresh_token:
-                    self.credentials.refresh(Request())
+            from google.oauth2.credentials import Credentials
+            from google_auth_oauthlib.flow import InstalledAppFlow
+            from google.auth.transport.requests import Request
+            from resumable_upload import ResumableUploader
+
+            with cls._session_lock:
+                if cls._session is None:
+                    # トークンファイルがあれば読み込み
+                    if TOKEN_FILE.exists():
+                        self.credentials = Credentials.from_authorized_user_file(str(TOKEN_FILE), SCOPES)
+
+                    # 認証情報がないか、無効な場合は再認証
+                    if not self.credentials or not self.credentials.valid:
+                        if self.credentials and self.credentials.expired and self.credentials.refresh_token:
+                            self.credentials.refresh(Request())
+                        else:
+                            if not CLIENT_SECRETS_FILE.exists():
+                                print(f"エラー: クライアントシークレットファイルが見つかりません: {CLIENT_SECRETS_FILE}")
+                                return False
+
+                            flow = InstalledAppFlow.from_client_secrets_file(str(CLIENT_SECRETS_FILE), SCOPES)
+                            self.credentials = flow.run_local_server(port=0)
+
+                        self._save_token()
+
+                    # 動画の送信は keep-alive の接続を使い回す1つのクライアントで行う
+                    self.uploader = ResumableUploader(self.access_token)
+                    cls._session = (self.credentials, self.uploader)
+                    print("YouTube API 認証成功")
                 else:
-                    if not CLIENT_SECRETS_FILE.exists():
-                        print(f"エラー: クライアントシークレットファイルが見つかりません: {CLIENT_SECRETS_FILE}")
-                        return False
-
-                    flow = InstalledAppFlow.from_client_secrets_file(str(CLIENT_SECRETS_FILE), SCOPES)
-                    self.credentials = flow.run_local_server(port=0)
-
-                # トークンを保存
-                with open(TOKEN_FILE, 'w') as token:
-                    token.write(self.credentials.to_json())
-
-            # YouTube API クライアントを構築
-            self.youtube = build('youtube', 'v3', credentials=self.credentials)
-            print("YouTube API 認証成功")
+                    self.credentials, self.uploader = cls._session
             return True
         except Exception as e:
             print(f"認証エラー: {e}")
             return False
 
+    def _save_token(self):
+        """トークンを保存"""
+        with open(TOKEN_FILE, 'w') as token:
+            token.write(self.credentials.to_json())
+
     def upload_video(self, video_path: Path, title: str, description: str,
                     category_id: str = "22", privacy_status: str = "private") -> Optional[str]:
         """
@@ -311,7 +658,7 @@ class YouTubeUploader:
         Returns:
             アップロードされた動画のURL（失敗時はNone）
         """
-        if not self.youtube:
+        if not self.uploader:
             print("エラー: YouTube API が初期化されていません")
             return None
 
@@ -327,19 +674,18 @@ class YouTubeUploader:
                 }
             }
 
-            media = MediaFileUpload(str(video_path), resumable=True)
+            # セッションURIと送信位置を .cache/uploads に保存し、中断しても続きから再開する
+            last_percent = [-1]
 
-            request = self.youtube.videos().insert(
-                part=",".join(body.keys()),
-                body=body,
-                media_body=media
-            )
+            def on_progress(sent, total):
+                percent = int(sent * 100 / total) if total else 100
+                if percent != last_percent[0]:
+                    last_percent[0] = percent
+                    print(f"アップロード進行状況: {percent}%")
 
-            response = None
-            while response is None:
-                status, response = request.next_chunk()
-                if status:
-                    print(f"アップロード進行状況: {int(status.progress() * 100)}%")
+            with span("youtube.upload"):
+                response = self.uploader.upload(video_path, body, on_progress=on_progress)
+            count("bytes_uploaded", Path(video_path).stat().st_size)
 
             video_id = response['id']
             video_url = f"https://www.youtube.com/watch?v={video_id}"
@@ -349,72 +695,364 @@ class YouTubeUploader:
             print(f"アップロードエラー: {e}")
             return None
 
+    def access_token(self) -> str:
+        """
+        有効なアクセストークンを返す
 
-def main():
-    """メイン処理"""
-    print("=== YouTube 動画自動生成スクリプト ===\n")
+        期限切れの TOKEN_REFRESH_MARGIN 前から更新し、長いアップロードの途中で
+        401 になって再送するのを避ける。更新したトークンは token.json に保存する。
+        """
+        with type(self)._session_lock:
+            expiry = self.credentials.expiry  # google-auth は UTC の naive datetime を使う
+            expiring = expiry is not None and \
+                expiry - TOKEN_REFRESH_MARGIN <= datetime.now(timezone.utc).replace(tzinfo=None)
+            if (not self.credentials.valid or expiring) and self.credentials.refresh_token:
+                from google.auth.transport.requests import Request
+
+                self.credentials.refresh(Request())
+                try:
+                    self._save_token()
+                except OSError:
+                    pass  # 保存できなくてもこのプロセスでは使える
+            return self.credentials.token
+
+
+POSTS_DIR = Path(__file__).parent.parent / "posts"
+
+
+def is_output_current(html_path: Path, outputs: list) -> bool:
+    """
+    出力ファイルが記事・このスクリプトより新しければ最新とみなす
+
+    Args:
+        html_path: 記事HTMLのパス
+        outputs: 出力ファイルパスのリスト
+
+    Returns:
+        すべての出力が最新かどうか
+    """
+    source_mtime = max(html_path.stat().st_mtime, Path(__file__).stat().st_mtime)
+    for output in outputs:
+        if not output.exists() or output.stat().st_mtime < source_mtime:
+            return False
+    return True
+
+
+# ステージ名 → 表示名
+STAGE_LABELS = {
+    'extract': "HTMLからテキストを抽出",
+    'audio': "音声ファイルを生成",
+    'thumbnail': "サムネイル画像を生成",
+    'video': "動画を生成",
+}
+
+# プロセスプール内で使い回す VideoGenerator（フォントの読み込みを1回にするため）
+_worker_generator = None
+
+
+def _thumbnail_job(image_path: Path, text_data: dict) -> bool:
+    """プロセスプールで実行するサムネイル生成（pickle できるようモジュール関数にする）"""
+    global _worker_generator
+    if _worker_generator is None:
+        _worker_generator = VideoGenerator()
+    return _worker_generator.create_thumbnail(text_data['title'], text_data['date'], image_path)
+
+
+def build_script(text_data: dict) -> str:
+    """音声生成用の台本を作成（チャンク単位でキャッシュされるため全文を読み上げる）"""
+    script_text = f"{text_data['title']}。{text_data['content']}"
+    if text_data['bets']:
+        script_text += f"買い目は、{'、'.join(text_data['bets'])}です。"
+    return script_text
+
+
+def process_post(generator: VideoGenerator, html_path: Path, force: bool = False,
+                 thread_pool=None, process_pool=None) -> dict:
+    """
+    1記事分の動画を生成
+
+    抽出 → (音声 | サムネイル) → 動画 の依存グラフとして実行し、
+    互いに独立な音声生成とサムネイル生成は並行に進める（pipeline.py）。
+
+    Args:
+        generator: VideoGenerator
+        html_path: 記事HTMLのパス
+        force: 出力が最新でも作り直すか
+        thread_pool: I/O待ちのステージを実行するプール（省略時はこの記事用に作る）
+        process_pool: サムネイル生成を実行するプロセスプール（省略時はスレッドで実行）
+
+    Returns:
+        'date', 'status'（'ok', 'skipped', 'failed'）, 'text_data', 'video_path',
+        'video_paths'（レンディション名 → 出力パス）, 'timings'（ステージ名 → 秒）,
+        'wall'（全体の秒数）を持つ辞書
+    """
+    from pipeline import Stage, StageError, run_pipeline
+
+    date = html_path.stem
+    audio_path = generator.audio_dir / f"{date}{generator.audio_extension()}"
+    image_path = generator.image_dir / f"{date}.png"
+    video_path = generator.video_dir / f"{date}.mp4"
+    video_paths = {name: generator.rendition_path(video_path, name) for name in generator.renditions}
+    result = {'date': date, 'status': 'ok', 'text_data': None, 'video_path': video_path,
+              'video_paths': video_paths, 'timings': {}, 'wall': 0.0}
+
+    from media_store import MediaStore
+
+    media = MediaStore()
+    # アップロード済みの動画はローカルのファイルを消しているので作り直さない
+    if not force and (is_output_current(html_path, list(video_paths.values()))
+                      or all(media.is_published(path) for path in video_paths.values())):
+        count("files_skipped", kind="video")
+        result['status'] = 'skipped'
+        return result
+
+    def make_video(text_data, *_):
+        if generator.slides:
+            return generator.create_slide_videos(text_data, audio_path, video_paths)
+        # 横長だけなら静止画トラックのキャッシュを使う create_video()、
+        # Shorts などもあれば1回の ffmpeg 実行で全サイズを出力する create_renditions()
+        if list(video_paths) == ['landscape']:
+            return generator.create_video(image_path, audio_path, video_path)
+        return generator.create_renditions(image_path, audio_path, video_path) is not None
+
+    stages = [
+        Stage('extract', lambda: generator.extract_text_from_html(html_path)),
+        Stage('audio', lambda text_data: generator.generate_audio(build_script(text_data), audio_path),
+              deps=['extract']),
+        Stage('thumbnail', functools.partial(_thumbnail_job, image_path),
+              deps=['extract'], executor='process'),
+        Stage('video', make_video, deps=['extract', 'audio', 'thumbnail']),
+    ]
+
+    start = time.perf_counter()
+    try:
+        outputs = run_pipeline(stages, thread_pool, process_pool, result['timings'],
+                               on_start=lambda name: print(f"[{date}] {STAGE_LABELS[name]}..."))
+        result['text_data'] = outputs['extract']
+        # 同じ内容の音声・サムネイルは実体を共有する
+        media.adopt(audio_path)
+        media.adopt(image_path)
+        media.touch([audio_path, image_path, *video_paths.values()])
+    except StageError as e:
+        print(f"[{date}] {STAGE_LABELS[e.stage]}: 失敗しました" + (f"（{e.cause}）" if e.cause else ""))
+        result['status'] = 'failed'
+    finally:
+        result['wall'] = time.perf_counter() - start
+    return result
+
+
+def upload_text(text_data: dict, rendition: str = 'landscape') -> tuple:
+    """アップロード時のタイトルと説明文（縦長の動画はタイトルに #Shorts を付ける）"""
+    title = f"{text_data['title']} - {text_data['date']}"
+    if rendition != 'landscape':
+        title += " #Shorts"
+    description = f"競艇予想の自動生成動画です。\n日付: {text_data['date']}"
+    return title, description
+
+
+def plan_workers(job_count: int, jobs: Optional[int] = None, cpu_count: Optional[int] = None) -> tuple:
+    """
+    並列ジョブ数と ffmpeg のスレッド数を決める
+
+    ffmpeg は1プロセスで複数コアを使うため、ジョブ数 × スレッド数がコア数を
+    超えないように配分する。
+
+    Args:
+        job_count: 処理する記事数
+        jobs: 並列ジョブ数の指定（省略時はコア数の半分）
+        cpu_count: コア数（省略時は os.cpu_count()）
+
+    Returns:
+        (並列ジョブ数, ジョブあたりの ffmpeg スレッド数)
+    """
+    cores = cpu_count or os.cpu_count() or 1
+    workers = jobs or max(1, cores // 2)
+    workers = max(1, min(workers, job_count, cores))
+    threads = max(1, cores // workers)
+    return workers, threads
+
+
+def run_batch(html_paths: list, jobs: Optional[int] = None, force: bool = False,
+              tts_backend: Optional[str] = None, slides: bool = False) -> list:
+    """
+    複数の記事の動画をワーカープールで並列に生成
+
+    Args:
+        html_paths: 記事HTMLのパスのリスト
+        jobs: 並列ジョブ数
+        force: 出力が最新でも作り直すか
+        tts_backend: 音声合成のバックエンド名
+        slides: スライド動画にするか
+
+    Returns:
+        process_post() の結果のリスト（日付順）
+    """
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    workers, threads = plan_workers(len(html_paths), jobs)
+    print(f"並列ジョブ数: {workers}（ffmpeg スレッド数: {threads}）\n")
+
+    # 重い処理は ffmpeg のサブプロセスとネットワーク待ちなので記事単位はスレッドで十分。
+    # Pillow によるサムネイル生成だけは全記事で共有するプロセスプールで実行する
+    generator = VideoGenerator(threads=threads, tts_backend=tts_backend, slides=slides)
+    with ThreadPoolExecutor(max_workers=workers) as pool, \
+            ProcessPoolExecutor(max_workers=workers) as process_pool:
+        results = list(pool.map(
+            lambda path: process_post(generator, path, force, process_pool=process_pool),
+            html_paths
+        ))
+    return results
+
+
+def print_timings(results: list):
+    """ステージごとの所要時間と全体の経過時間を表形式で表示（ステージは並行するため合計≠経過）"""
+    stages = ['extract', 'audio', 'thumbnail', 'video']
+    print(f"\n{'日付':<12}{'状態':<9}" + "".join(f"{name:>11}" for name in stages) + f"{'経過':>9}")
+    for result in results:
+        timings = result['timings']
+        cells = "".join(
+            f"{timings[name]:>10.2f}s" if name in timings else f"{'-':>11}" for name in stages
+        )
+        print(f"{result['date']:<14}{result['status']:<10}{cells}{result.get('wall', 0.0):>10.2f}s")
+
+
+def parse_args(argv=None):
+    """コマンドライン引数を解析"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="競艇予想の記事から YouTube 動画を生成")
+    parser.add_argument("--date", help="対象の日付（YYYY-MM-DD、省略時は今日）")
+    parser.add_argument("--batch", action="store_true",
+                        help="posts/*.html をまとめて動画化（アップロードはしない）")
+    parser.add_argument("--from", dest="date_from", help="バッチの開始日（YYYY-MM-DD）")
+    parser.add_argument("--to", dest="date_to", help="バッチの終了日（YYYY-MM-DD）")
+    parser.add_argument("--jobs", type=int, help="バッチの並列ジョブ数（省略時はコア数の半分）")
+    parser.add_argument("--force", action="store_true", help="出力が最新でも作り直す")
+    parser.add_argument("--enqueue", action="store_true",
+                        help="バッチで生成した動画をアップロードキューに登録（upload_queue.py run で送信）")
+    parser.add_argument("--tts", choices=["gtts", "espeak"],
+                        help="音声合成のバックエンド（省略時は環境変数 TTS_BACKEND、なければ gtts）")
+    parser.add_argument("--slides", action="store_true",
+                        help="記事の内容をナレーションに合わせて切り替えるスライド動画にする")
+    return parser.parse_args(argv)
+
+
+def main_batch(args):
+    """バッチ処理（日付範囲の記事をまとめて動画化）"""
+    print("=== YouTube 動画一括生成 ===\n")
+
+    html_paths = []
+    for html_path in sorted(POSTS_DIR.glob("*.html")):
+        date = html_path.stem
+        if args.date_from and date < args.date_from:
+            continue
+        if args.date_to and date > args.date_to:
+            continue
+        html_paths.append(html_path)
+
+    if not html_paths:
+        print("対象の記事がありません")
+        return
+
+    results = run_batch(html_paths, args.jobs, args.force, args.tts, args.slides)
+    print_timings(results)
+
+    if args.enqueue:
+        from upload_queue import UploadQueue
+
+        queue = UploadQueue()
+        added = 0
+        for result in results:
+            if result['status'] == 'failed':
+                continue
+            for name, video_path in result['video_paths'].items():
+                if not video_path.exists():
+                    continue
+                title, description = upload_text(
+                    result['text_data'] or {'title': "競艇予想", 'date': result['date']}, name)
+                added += queue.add(video_path, title, description)[1]
+        print(f"\nアップロードキューに {added}件を追加しました")
+
+    from media_store import MediaStore, print_prune_result
+    print()
+    print_prune_result(MediaStore().prune())
+
+    failed = [r['date'] for r in results if r['status'] == 'failed']
+    skipped = sum(1 for r in results if r['status'] == 'skipped')
+    print(f"\n生成: {len(results) - len(failed) - skipped}件 / スキップ: {skipped}件 / 失敗: {len(failed)}件")
+    if failed:
+        print(f"失敗した日付: {', '.join(failed)}")
+        sys.exit(1)
 
-    # 今日の日付
-    today = datetime.now(JST).strftime('%Y-%m-%d')
 
-    # HTMLファイルのパス
-    html_path = Path(__file__).parent.parent / "posts" / f"{today}.html"
+def main(argv=None):
+    """メイン処理"""
+    args = parse_args(argv)
 
-    if not html_path.exists():
-        print(f"エラー: HTMLファイルが見つかりません: {html_path}")
-        print("まず generate.py を実行してHTMLファイルを生成してください。")
+    import tts
+
+    # 環境変数 TTS_BACKEND の誤りは動画の生成を始める前に知らせる
+    try:
+        tts.get_backend(args.tts)
+    except ValueError as e:
+        print(f"エラー: {e}")
         sys.exit(1)
 
-    # 動画生成
-    generator = VideoGenerator()
+    if args.batch:
+        main_batch(args)
+        return
 
-    print("1. HTMLからテキストを抽出...")
-    text_data = generator.extract_text_from_html(html_path)
-    print(f"   タイトル: {text_data['title']}")
-    print(f"   日付: {text_data['date']}")
+    print("=== YouTube 動画自動生成スクリプト ===\n")
 
-    # ファイルパス設定
-    audio_path = generator.audio_dir / f"{today}.mp3"
-    image_path = generator.image_dir / f"{today}.png"
-    video_path = generator.video_dir / f"{today}.mp4"
+    # 対象の日付（省略時は今日）
+    today = args.date or datetime.now(JST).strftime('%Y-%m-%d')
 
-    # 音声生成用のテキストを作成
-    script_text = f"{text_data['title']}。{text_data['content'][:200]}"  # 最初の200文字
+    # HTMLファイルのパス
+    html_path = POSTS_DIR / f"{today}.html"
 
-    print("\n2. 音声ファイルを生成...")
-    if not generator.generate_audio(script_text, audio_path):
-        print("音声生成に失敗しました")
+    if not html_path.exists():
+        print(f"エラー: HTMLファイルが見つかりません: {html_path}")
+        print("まず generate.py を実行してHTMLファイルを生成してください。")
         sys.exit(1)
 
-    print("\n3. サムネイル画像を生成...")
-    if not generator.create_thumbnail(text_data['title'], text_data['date'], image_path):
-        print("画像生成に失敗しました")
+    # 動画生成（単発実行では出力が最新でも作り直す）
+    generator = VideoGenerator(tts_backend=args.tts, slides=args.slides)
+    result = process_post(generator, html_path, force=True)
+    if result['status'] != 'ok':
         sys.exit(1)
+    print_timings([result])
 
-    print("\n4. 動画を生成...")
-    if not generator.create_video(image_path, audio_path, video_path):
-        print("動画生成に失敗しました")
-        sys.exit(1)
+    text_data = result['text_data']
 
     print("\n5. YouTube へのアップロード...")
     uploader = YouTubeUploader()
 
     if uploader.authenticate():
-        video_url = uploader.upload_video(
-            video_path,
-            title=f"{text_data['title']} - {text_data['date']}",
-            description=f"競艇予想の自動生成動画です。\n日付: {text_data['date']}",
-            privacy_status="private"  # デフォルトは非公開
-        )
+        from media_store import MediaStore
+
+        for name, video_path in result['video_paths'].items():
+            title, description = upload_text(text_data, name)
+            video_url = uploader.upload_video(
+                video_path,
+                title=title,
+                description=description,
+                privacy_status="private"  # デフォルトは非公開
+            )
 
-        if video_url:
-            print(f"\n✅ 完了！動画URL: {video_url}")
-        else:
-            print("\n⚠️ 動画は生成されましたが、アップロードに失敗しました")
-            print(f"   ローカルの動画: {video_path}")
+            if video_url:
+                MediaStore().record_published(video_path, video_url, title)
+                print(f"\n✅ 完了！動画URL（{name}）: {video_url}")
+            else:
+                print("\n⚠️ 動画は生成されましたが、アップロードに失敗しました")
+                print(f"   ローカルの動画: {video_path}")
     else:
         print("\n⚠️ YouTube認証に失敗しました。動画はローカルに保存されています")
-        print(f"   ローカルの動画: {video_path}")
+        for video_path in result['video_paths'].values():
+            print(f"   ローカルの動画: {video_path}")
+
+    # アップロード済みの動画・古い生成物を消して容量の上限に収める
+    from media_store import MediaStore, print_prune_result
+    print_prune_result(MediaStore().prune())
 
     print("\n=== 処理完了 ===")
 